@@ -37,17 +37,22 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
+    # Makes runserver serve link_scraper/asgi.py, which the SSE endpoint needs
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
+    'rest_framework.authtoken',
     'scraper',
     'users'
 ]
 
 MIDDLEWARE = [
+    'scraper.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,6 +85,7 @@ LOGIN_URL = 'login'
 AUTH_USER_MODEL = 'users.User'
 
 WSGI_APPLICATION = 'link_scraper.wsgi.application'
+ASGI_APPLICATION = 'link_scraper.asgi.application'
 
 
 # Database
@@ -143,3 +149,173 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+
+# Single-page scrapes mostly wait on the network and go to the 'fetch' queue,
+# served by a worker with a large thread pool. Batch and crawl tasks multiplex
+# their own fetches with asyncio and spend their time parsing and writing, so
+# they go to the 'parse' queue, served by a prefork worker (see
+# docker-compose.yml).
+CELERY_TASK_ROUTES = {
+    'scraper.tasks.create_scraped_page_task': {'queue': 'fetch'},
+    'scraper.tasks.scrape_pages_batch_task': {'queue': 'parse'},
+    'scraper.tasks.crawl_step_task': {'queue': 'parse'},
+}
+# Tasks are idempotent, so a task is acknowledged once it has run and is
+# delivered again if its worker dies. Workers only reserve as many tasks as
+# they have slots, so a long batch cannot hold back tasks other workers
+# could run.
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.environ.get('CELERY_WORKER_PREFETCH_MULTIPLIER', 1))
+# Recycles prefork children, bounding the memory parsers leave behind
+CELERY_WORKER_MAX_TASKS_PER_CHILD = int(os.environ.get('CELERY_WORKER_MAX_TASKS_PER_CHILD', 200))
+
+
+# The scraper cache has a Redis instance of its own (see docker-compose.yml):
+# its eviction policy must not apply to the broker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'scraper': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('SCRAPER_CACHE_URL', 'redis://redis-cache:6379/0'),
+    },
+}
+
+
+# Scraper
+
+SCRAPER_LINK_BATCH_SIZE = int(os.environ.get('SCRAPER_LINK_BATCH_SIZE', 500))
+# One of scraper.parsers.PARSERS: 'stream' (incremental html.parser events),
+# 'html.parser' (BeautifulSoup tree), 'lxml' or 'selectolax'
+SCRAPER_PARSER = os.environ.get('SCRAPER_PARSER', 'stream')
+SCRAPER_CHUNK_SIZE = int(os.environ.get('SCRAPER_CHUNK_SIZE', 64 * 1024))
+# Options of scraper.canonicalize.Canonicalizer applied to every extracted link
+SCRAPER_CANONICALIZE = {
+    'schemes': ('http', 'https'),
+    'drop_fragment': True,
+    'sort_query': True,
+}
+SCRAPER_MAX_BODY_SIZE = int(os.environ.get('SCRAPER_MAX_BODY_SIZE', 10 * 1024 * 1024))
+# 'cursor' (keyset on (created_at, id), see scraper/pagination.py) or 'offset'
+# (numbered pages) for the HTML listings; the JSON API always uses cursors
+SCRAPER_PAGINATION = os.environ.get('SCRAPER_PAGINATION', 'cursor')
+SCRAPER_API_PAGE_SIZE = int(os.environ.get('SCRAPER_API_PAGE_SIZE', 50))
+SCRAPER_API_MAX_PAGE_SIZE = int(os.environ.get('SCRAPER_API_MAX_PAGE_SIZE', 500))
+# Rows fetched per round trip of the server-side cursor of link exports
+SCRAPER_EXPORT_CHUNK_SIZE = int(os.environ.get('SCRAPER_EXPORT_CHUNK_SIZE', 2000))
+
+# REST API under /api/v1/ (see scraper/api.py), for integrations with an API
+# token (`manage.py drf_create_token <username>`) or a browser session.
+# Requests are throttled per user and per anonymous client, and page
+# submissions, which each start scrapes, have a rate of their own.
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.TokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'rest_framework.throttling.AnonRateThrottle',
+        'rest_framework.throttling.UserRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': os.environ.get('SCRAPER_API_ANON_RATE', '30/minute'),
+        'user': os.environ.get('SCRAPER_API_USER_RATE', '600/minute'),
+        'submit': os.environ.get('SCRAPER_API_SUBMIT_RATE', '60/minute'),
+    },
+}
+
+# HTTP client shared by every fetch in a worker process (see scraper/client.py)
+SCRAPER_USER_AGENT = os.environ.get('SCRAPER_USER_AGENT', 'link-scraper/1.0')
+SCRAPER_HTTP_CONNECT_TIMEOUT = float(os.environ.get('SCRAPER_HTTP_CONNECT_TIMEOUT', 5))
+SCRAPER_HTTP_READ_TIMEOUT = float(os.environ.get('SCRAPER_HTTP_READ_TIMEOUT', 15))
+# Whole request, body included, and redirects followed per fetch
+SCRAPER_HTTP_TOTAL_TIMEOUT = float(os.environ.get('SCRAPER_HTTP_TOTAL_TIMEOUT', 30))
+SCRAPER_HTTP_MAX_REDIRECTS = int(os.environ.get('SCRAPER_HTTP_MAX_REDIRECTS', 5))
+# Only responses of these types are parsed
+SCRAPER_ALLOWED_CONTENT_TYPES = os.environ.get(
+    'SCRAPER_ALLOWED_CONTENT_TYPES', 'text/html,application/xhtml+xml'
+).split(',')
+# Number of per-host pools kept alive, and open connections allowed per host
+SCRAPER_HTTP_POOL_CONNECTIONS = int(os.environ.get('SCRAPER_HTTP_POOL_CONNECTIONS', 32))
+SCRAPER_HTTP_POOL_MAXSIZE = int(os.environ.get('SCRAPER_HTTP_POOL_MAXSIZE', 4))
+
+# Bulk submission: URLs per request, URLs per batch task, and the asyncio
+# engine limits used inside each batch task (see scraper/batch.py)
+SCRAPER_BULK_MAX_URLS = int(os.environ.get('SCRAPER_BULK_MAX_URLS', 5000))
+SCRAPER_BULK_TASK_SIZE = int(os.environ.get('SCRAPER_BULK_TASK_SIZE', 200))
+SCRAPER_BATCH_CONCURRENCY = int(os.environ.get('SCRAPER_BATCH_CONCURRENCY', 50))
+SCRAPER_BATCH_PER_HOST_CONCURRENCY = int(os.environ.get('SCRAPER_BATCH_PER_HOST_CONCURRENCY', 2))
+
+# Retries of scrapes that failed on a transient error (see
+# scraper/exceptions.py): how many, and the base and cap in seconds of their
+# exponential backoff, with full jitter
+SCRAPER_TASK_MAX_RETRIES = int(os.environ.get('SCRAPER_TASK_MAX_RETRIES', 5))
+SCRAPER_TASK_RETRY_BACKOFF = int(os.environ.get('SCRAPER_TASK_RETRY_BACKOFF', 2))
+SCRAPER_TASK_RETRY_BACKOFF_MAX = int(os.environ.get('SCRAPER_TASK_RETRY_BACKOFF_MAX', 10 * 60))
+
+# Limits per host shared by every worker (see scraper/politeness.py): request
+# rate and burst, concurrent fetches, and how long a fetch may hold its slot
+SCRAPER_POLITENESS = os.getenv('SCRAPER_POLITENESS', 'True').lower() == 'true'
+SCRAPER_POLITENESS_REDIS_URL = os.environ.get('SCRAPER_POLITENESS_REDIS_URL', CELERY_BROKER_URL)
+SCRAPER_HOST_RATE = float(os.environ.get('SCRAPER_HOST_RATE', 2))
+SCRAPER_HOST_BURST = int(os.environ.get('SCRAPER_HOST_BURST', 4))
+SCRAPER_HOST_CONCURRENCY = int(os.environ.get('SCRAPER_HOST_CONCURRENCY', 2))
+SCRAPER_HOST_LEASE_TIMEOUT = int(os.environ.get('SCRAPER_HOST_LEASE_TIMEOUT', 60))
+SCRAPER_RESPECT_ROBOTS = os.getenv('SCRAPER_RESPECT_ROBOTS', 'True').lower() == 'true'
+# How long robots.txt files are cached, and unreachable ones before a retry
+SCRAPER_ROBOTS_TTL = int(os.environ.get('SCRAPER_ROBOTS_TTL', 24 * 60 * 60))
+SCRAPER_ROBOTS_ERROR_TTL = int(os.environ.get('SCRAPER_ROBOTS_ERROR_TTL', 10 * 60))
+
+# Recursive crawls (see scraper/crawl.py): URLs fetched per step, step chains
+# run in parallel per crawl, seconds before a claimed URL is considered lost
+# with its worker, and the crawl size from which a Redis Bloom filter screens
+# discovered URLs before they reach the database
+SCRAPER_CRAWL_BATCH_SIZE = int(os.environ.get('SCRAPER_CRAWL_BATCH_SIZE', 50))
+SCRAPER_CRAWL_CONCURRENCY = int(os.environ.get('SCRAPER_CRAWL_CONCURRENCY', 4))
+SCRAPER_CRAWL_MAX_DEPTH = int(os.environ.get('SCRAPER_CRAWL_MAX_DEPTH', 10))
+SCRAPER_CRAWL_MAX_PAGES = int(os.environ.get('SCRAPER_CRAWL_MAX_PAGES', 200000))
+SCRAPER_CRAWL_CLAIM_TIMEOUT = int(os.environ.get('SCRAPER_CRAWL_CLAIM_TIMEOUT', 10 * 60))
+SCRAPER_CRAWL_BLOOM_MIN_PAGES = int(os.environ.get('SCRAPER_CRAWL_BLOOM_MIN_PAGES', 10000))
+SCRAPER_CRAWL_BLOOM_ERROR_RATE = float(os.environ.get('SCRAPER_CRAWL_BLOOM_ERROR_RATE', 0.001))
+SCRAPER_CRAWL_REDIS_URL = os.environ.get('SCRAPER_CRAWL_REDIS_URL', CELERY_BROKER_URL)
+
+# Scheduled re-scrapes of monitored pages. Celery beat queues the due pages
+# every SCRAPER_RESCRAPE_TICK seconds, SCRAPER_RESCRAPE_BATCH_SIZE at most.
+# After each scrape, the interval of a page is divided by
+# SCRAPER_RESCRAPE_BACKOFF if its links changed and multiplied by it if not,
+# within the minimum and maximum intervals.
+SCRAPER_RESCRAPE_TICK = int(os.environ.get('SCRAPER_RESCRAPE_TICK', 60))
+SCRAPER_RESCRAPE_BATCH_SIZE = int(os.environ.get('SCRAPER_RESCRAPE_BATCH_SIZE', 500))
+SCRAPER_RESCRAPE_MIN_INTERVAL = int(os.environ.get('SCRAPER_RESCRAPE_MIN_INTERVAL', 15 * 60))
+SCRAPER_RESCRAPE_MAX_INTERVAL = int(os.environ.get('SCRAPER_RESCRAPE_MAX_INTERVAL', 7 * 24 * 60 * 60))
+SCRAPER_RESCRAPE_BACKOFF = float(os.environ.get('SCRAPER_RESCRAPE_BACKOFF', 2))
+SCRAPER_RESCRAPE_CLAIM_TIMEOUT = int(os.environ.get('SCRAPER_RESCRAPE_CLAIM_TIMEOUT', 60 * 60))
+
+CELERY_BEAT_SCHEDULE = {
+    'rescrape-due-pages': {
+        'task': 'scraper.tasks.rescrape_due_pages_task',
+        'schedule': SCRAPER_RESCRAPE_TICK,
+    },
+}
+
+# Parse results shared across users (see scraper/cache.py)
+SCRAPER_CACHE_ALIAS = 'scraper'
+SCRAPER_CACHE_TTL = int(os.environ.get('SCRAPER_CACHE_TTL', 60 * 60))
+SCRAPER_CACHE_MAX_LINKS = int(os.environ.get('SCRAPER_CACHE_MAX_LINKS', 20000))
+
+# Prometheus metrics (see scraper/metrics.py), served at /metrics/ by the web
+# processes, behind a bearer token when SCRAPER_METRICS_TOKEN is set, and on
+# SCRAPER_METRICS_PORT by the Celery workers
+SCRAPER_METRICS = os.getenv('SCRAPER_METRICS', 'True').lower() == 'true'
+SCRAPER_METRICS_TOKEN = os.environ.get('SCRAPER_METRICS_TOKEN', '')
+SCRAPER_METRICS_PORT = int(os.environ.get('SCRAPER_METRICS_PORT', 9808))
+# OpenTelemetry spans across the web process and the workers (see scraper/tracing.py)
+SCRAPER_TRACING = os.getenv('SCRAPER_TRACING', 'False').lower() == 'true'
+
+# Redis pub/sub used to push scrape progress to the browser (see scraper/events.py)
+SCRAPER_EVENTS_URL = os.environ.get('SCRAPER_EVENTS_URL', CELERY_BROKER_URL)
+SCRAPER_EVENTS_HEARTBEAT = int(os.environ.get('SCRAPER_EVENTS_HEARTBEAT', 15))
@@ -0,0 +1,148 @@
+"""
+Versioned REST API under /api/v1/.
+
+Rows are read with `.values()` and serialized by plain serializers. Listings
+are keyset-paginated like the HTML views (see scraper/pagination.py), and GET
+responses carry an ETag of their content, so a client polling a listing that
+did not change gets a 304 Not Modified with no body.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.decorators import api_view, throttle_classes
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+from scraper import services as scraper_services
+from scraper.pagination import InvalidCursor, paginate_by_cursor
+from scraper.serializers import LinkSerializer, PageDetailSerializer, PageSerializer, SubmitPagesSerializer
+
+
+class SubmitRateThrottle(UserRateThrottle):
+    """
+    Rate of page submissions, which each start scrapes, on top of the rate of
+    requests of the user.
+    """
+    scope = 'submit'
+
+    def allow_request(self, request, view):
+        if request.method != 'POST':
+            return True
+        return super().allow_request(request, view)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pages of `?limit=` rows ordered by `(created_at, id)`, linking to the
+    next and previous pages with `?cursor=`.
+    """
+
+    def __init__(self, descending: bool = False):
+        self.descending = descending
+        self.request = None
+        self.page = None
+
+    def get_page_size(self, request):
+        try:
+            limit = int(request.query_params.get('limit', settings.SCRAPER_API_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        return max(1, min(limit, settings.SCRAPER_API_MAX_PAGE_SIZE))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            self.page = paginate_by_cursor(
+                queryset, request.query_params.get('cursor'), self.get_page_size(request), descending=self.descending
+            )
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        return list(self.page)
+
+    def get_link(self, cursor: str):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), 'cursor', cursor)
+
+    def get_paginated_data(self, data):
+        return {
+            'results': data,
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+def conditional_response(request, data):
+    """
+    Returns `data` with a strong ETag of its content, or a 304 Not Modified
+    if the request's If-None-Match already names it.
+    """
+    content = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+    etag = quote_etag(hashlib.sha1(content.encode()).hexdigest())
+    return get_conditional_response(request, etag=etag, response=Response(data, headers={'ETag': etag}))
+
+
+@api_view(['GET', 'POST'])
+@throttle_classes([AnonRateThrottle, UserRateThrottle, SubmitRateThrottle])
+def pages(request):
+    """
+    Lists the user's pages, newest first, or submits a `url`, or a list of
+    `urls`, to scrape.
+    """
+    if request.method == 'POST':
+        serializer = SubmitPagesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            if 'url' in serializer.validated_data:
+                page = scraper_services.create_scraped_page(serializer.validated_data['url'], user_id=request.user.id)
+                return Response({'id': page.id}, status=status.HTTP_202_ACCEPTED)
+            created = scraper_services.create_scraped_pages(serializer.validated_data['urls'], user_id=request.user.id)
+        except DjangoValidationError as e:
+            raise ValidationError(e.messages)
+        return Response({'created': created}, status=status.HTTP_202_ACCEPTED)
+
+    paginator = KeysetPagination(descending=True)
+    rows = paginator.paginate_queryset(scraper_services.get_scraped_page_rows(request.user.id), request)
+    return conditional_response(request, paginator.get_paginated_data(PageSerializer(rows, many=True).data))
+
+
+@api_view(['GET', 'DELETE'])
+def page_detail(request, page_id):
+    """
+    Shows the scrape status of one of the user's pages, or deletes it with
+    its links.
+    """
+    if request.method == 'DELETE':
+        if not scraper_services.delete_scraped_page(page_id, user_id=request.user.id):
+            raise NotFound('Page not found')
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    row = scraper_services.get_scraped_page_row(page_id, request.user.id)
+    if row is None:
+        raise NotFound('Page not found')
+    return conditional_response(request, PageDetailSerializer(row).data)
+
+
+@api_view(['GET'])
+def page_links(request, page_id):
+    """
+    Lists the links of one of the user's pages, in the order they were stored.
+    """
+    if not scraper_services.scraped_page_exists(page_id, request.user.id):
+        raise NotFound('Page not found')
+
+    paginator = KeysetPagination()
+    rows = paginator.paginate_queryset(scraper_services.get_scraped_link_rows(page_id), request)
+    return conditional_response(request, paginator.get_paginated_data(LinkSerializer(rows, many=True).data))
@@ -0,0 +1,127 @@
+"""
+Asyncio engine that fetches and parses many pages concurrently inside one
+worker task.
+
+Concurrency is bounded globally by SCRAPER_BATCH_CONCURRENCY and per host by
+SCRAPER_BATCH_PER_HOST_CONCURRENCY. On top of that, each fetch waits for
+its host's shared rate limit and robots.txt rules (see scraper/politeness.py).
+"""
+import asyncio
+import hashlib
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import httpx
+from django.conf import settings
+
+from scraper import cache, client, metrics, politeness
+from scraper import services as scraper_services
+
+
+async def read_text(response: httpx.Response):
+    decoder = client.get_decoder(response.encoding)
+    max_size = settings.SCRAPER_MAX_BODY_SIZE
+    size = 0
+    chunks = []
+    try:
+        async for chunk in response.aiter_bytes(settings.SCRAPER_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise client.ResponseTooLarge(f"Response body exceeds {max_size} bytes")
+            chunks.append(decoder.decode(chunk))
+    finally:
+        metrics.DOWNLOADED_BYTES.inc(size)
+
+    chunks.append(decoder.decode(b'', final=True))
+    return chunks
+
+
+async def scrape_page(http: httpx.AsyncClient, url: str):
+    total_timeout = settings.SCRAPER_HTTP_TOTAL_TIMEOUT
+    try:
+        async with asyncio.timeout(total_timeout):
+            async with http.stream('GET', url) as response:
+                response.raise_for_status()
+                client.check_content_type(response)
+                chunks = await read_text(response)
+    except TimeoutError:
+        raise client.ResponseTimeout(f"Download took more than {total_timeout:g}s")
+
+    digest = hashlib.sha256()
+    result = scraper_services.PageResult(
+        url=url,
+        etag=response.headers.get('ETag', ''),
+        last_modified=response.headers.get('Last-Modified', '')
+    )
+    with metrics.timed('parse'):
+        scraper_services.parse_page(url, scraper_services.hash_chunks(chunks, digest), result)
+    result.content_hash = digest.hexdigest()
+    return result
+
+
+async def acquire_host_slot(url: str):
+    reserved = False
+    while True:
+        try:
+            return await asyncio.to_thread(politeness.acquire, url, reserved)
+        except politeness.HostBusy as e:
+            reserved = True
+            await asyncio.sleep(e.retry_after)
+
+
+async def scrape_pages(urls, transport: httpx.AsyncBaseTransport = None):
+    """
+    Scrapes every URL and returns one `scraper.services.PageResult` per URL, in order. Fetch
+    and parse errors are reported on the result instead of being raised.
+    """
+    slots = asyncio.Semaphore(settings.SCRAPER_BATCH_CONCURRENCY)
+    hosts = defaultdict(lambda: asyncio.Semaphore(settings.SCRAPER_BATCH_PER_HOST_CONCURRENCY))
+
+    async def scrape(http, url):
+        # Wait for the host first so a throttled host does not hold global slots.
+        async with hosts[urlparse(url).hostname]:
+            lease = None
+            try:
+                lease = await acquire_host_slot(url)
+                async with slots:
+                    return await scrape_page(http, url)
+            except Exception as e:
+                return scraper_services.PageResult(url=url, error=e)
+            finally:
+                if lease is not None:
+                    await asyncio.to_thread(politeness.release, lease)
+
+    async with httpx.AsyncClient(
+        transport=transport,
+        follow_redirects=True,
+        max_redirects=settings.SCRAPER_HTTP_MAX_REDIRECTS,
+        headers={'User-Agent': settings.SCRAPER_USER_AGENT},
+        timeout=httpx.Timeout(settings.SCRAPER_HTTP_READ_TIMEOUT, connect=settings.SCRAPER_HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=settings.SCRAPER_BATCH_CONCURRENCY),
+    ) as http:
+        return await asyncio.gather(*(scrape(http, url) for url in urls))
+
+
+def scrape_pages_cached(urls):
+    """
+    Returns a `scraper.services.PageResult` per URL, taken from the shared
+    cache when possible, fetching the others concurrently.
+    """
+    results = []
+    missing = []
+    for url in urls:
+        result = scraper_services.get_cached_result(url)
+        if result is None:
+            missing.append(url)
+        else:
+            results.append(result)
+
+    if missing:
+        fetched = asyncio.run(scrape_pages(missing))
+        for result in fetched:
+            cache.set_cached_page(result)
+        results.extend(fetched)
+
+    for result in results:
+        metrics.observe_result(result)
+    return results
@@ -0,0 +1,86 @@
+"""
+Fetch/parse cache shared by every user, keyed by normalized URL.
+
+Entries live in the SCRAPER_CACHE_ALIAS cache (Redis in production) for
+SCRAPER_CACHE_TTL seconds. Pages with more than SCRAPER_CACHE_MAX_LINKS links
+are not cached, and Redis evicts the least recently used entries once it
+reaches its memory limit. Hits and misses are counted for monitoring.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from scraper import metrics
+from scraper.canonicalize import normalize_url
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'scraper:page:'
+HITS_KEY = 'scraper:stats:hits'
+MISSES_KEY = 'scraper:stats:misses'
+
+
+def get_cache():
+    return caches[settings.SCRAPER_CACHE_ALIAS]
+
+
+def cache_key(url: str):
+    return KEY_PREFIX + hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+
+def _incr(key: str):
+    cache = get_cache()
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+
+def get_cached_page(url: str):
+    """
+    Returns the cached fields of a `PageResult` for `url` as a dict, or None.
+    Cache errors count as a miss so an unavailable cache never fails a scrape.
+    """
+    try:
+        entry = get_cache().get(cache_key(url))
+        _incr(HITS_KEY if entry is not None else MISSES_KEY)
+    except Exception:
+        logger.warning('Scraper cache unavailable', exc_info=True)
+        metrics.CACHE_LOOKUPS.labels('error').inc()
+        return None
+    metrics.CACHE_LOOKUPS.labels('hit' if entry is not None else 'miss').inc()
+    return entry
+
+
+def set_cached_page(result):
+    if result.error is not None or result.not_modified:
+        return False
+    if len(result.links) > settings.SCRAPER_CACHE_MAX_LINKS:
+        return False
+
+    entry = {
+        'title': result.title,
+        'links': result.links,
+        'etag': result.etag,
+        'last_modified': result.last_modified,
+        'content_hash': result.content_hash,
+    }
+    try:
+        get_cache().set(cache_key(result.url), entry, settings.SCRAPER_CACHE_TTL)
+    except Exception:
+        logger.warning('Scraper cache unavailable', exc_info=True)
+        return False
+    return True
+
+
+def get_cache_stats():
+    stats = get_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = stats.get(HITS_KEY, 0)
+    misses = stats.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
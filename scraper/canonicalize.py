@@ -0,0 +1,121 @@
+"""
+URL canonicalization shared by the scraper.
+
+Extracted links are canonicalized before they are deduplicated and stored,
+so that e.g. `https://Example.com/a`, `https://example.com/a#top` and
+`https://example.com/a?utm_source=x` become a single link. The behaviour is
+configured through the SCRAPER_CANONICALIZE setting.
+"""
+from functools import lru_cache
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+DEFAULT_TRACKING_PARAMS = (
+    'utm_*', 'gclid', 'gclsrc', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok', 'oly_anon_id', 'oly_enc_id',
+)
+
+
+class Canonicalizer:
+    """
+    Turns an absolute URL into its canonical form, or None when the URL
+    cannot be followed (unsupported scheme, no host, malformed).
+
+    Results are memoized, since navigation links repeat across the pages
+    of a site.
+    """
+
+    def __init__(
+            self,
+            schemes=('http', 'https'),
+            drop_fragment: bool = True,
+            sort_query: bool = True,
+            tracking_params=DEFAULT_TRACKING_PARAMS,
+            cache_size: int = 65536
+    ):
+        self.schemes = frozenset(schemes) if schemes else None
+        self.drop_fragment = drop_fragment
+        self.sort_query = sort_query
+        self.tracking_params = frozenset(p for p in tracking_params if not p.endswith('*'))
+        self.tracking_prefixes = tuple(p[:-1] for p in tracking_params if p.endswith('*'))
+        self.canonicalize = lru_cache(maxsize=cache_size)(self._canonicalize)
+
+    def __call__(self, url: str):
+        return self.canonicalize(url)
+
+    def is_tracking_param(self, name: str):
+        name = name.lower()
+        return name in self.tracking_params or name.startswith(self.tracking_prefixes)
+
+    def _canonicalize(self, url: str):
+        try:
+            parts = urlsplit(url.strip())
+            hostname = parts.hostname
+            port = parts.port
+        except ValueError:
+            return None
+
+        scheme = parts.scheme.lower()
+        if (self.schemes is not None and scheme not in self.schemes) or not hostname:
+            return None
+
+        # urlsplit strips the brackets of IPv6 hosts
+        netloc = f'[{hostname}]' if ':' in hostname else hostname
+        if port and port != DEFAULT_PORTS.get(scheme):
+            netloc = f'{netloc}:{port}'
+        if parts.username or parts.password:
+            userinfo = parts.username or ''
+            if parts.password:
+                userinfo = f'{userinfo}:{parts.password}'
+            netloc = f'{userinfo}@{netloc}'
+
+        query = parts.query
+        if query and (self.sort_query or self.tracking_params or self.tracking_prefixes):
+            # The pairs are kept as they were written: decoding and encoding
+            # them again would change their escapes (`%20` to `+`, `/` to `%2F`,
+            # `?a` to `?a=`) and mangle those that are not UTF-8
+            params = [
+                param for param in query.split('&')
+                if param and not self.is_tracking_param(unquote_plus(param.split('=', 1)[0]))
+            ]
+            if self.sort_query:
+                params.sort(key=lambda param: param.split('=', 1))
+            query = '&'.join(params)
+
+        fragment = '' if self.drop_fragment else parts.fragment
+        return urlunsplit((scheme, netloc, parts.path or '/', query, fragment))
+
+
+_canonicalizer = None
+_normalizer = Canonicalizer(schemes=None, sort_query=False, tracking_params=())
+
+
+def get_canonicalizer():
+    global _canonicalizer
+
+    if _canonicalizer is None:
+        _canonicalizer = Canonicalizer(**settings.SCRAPER_CANONICALIZE)
+    return _canonicalizer
+
+
+@receiver(setting_changed)
+def reset_canonicalizer(setting, **kwargs):
+    global _canonicalizer
+
+    if setting == 'SCRAPER_CANONICALIZE':
+        _canonicalizer = None
+
+
+def normalize_url(url: str):
+    """
+    Returns the form of `url` used as a cache key: lowercase scheme and host,
+    no default port, no fragment and a non-empty path. Unlike the
+    canonicalizer, it never drops query parameters or rejects a URL.
+    """
+    return _normalizer(url) or url.strip()
@@ -0,0 +1,197 @@
+"""
+Worker-process-wide HTTP client for the scraper.
+
+All fetches share one pooled `requests.Session`, so repeated requests to the
+same host reuse keep-alive connections instead of paying for a new TCP+TLS
+handshake each time. gzip/deflate are always decoded, and brotli is too when
+the `brotli` package is installed.
+
+Bodies are streamed and a download is aborted once it exceeds
+SCRAPER_MAX_BODY_SIZE bytes or SCRAPER_HTTP_TOTAL_TIMEOUT seconds, so no
+response can exhaust a worker's memory or hold it indefinitely.
+"""
+import codecs
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from scraper import metrics
+
+
+class ResponseTooLarge(requests.RequestException):
+    pass
+
+
+class ResponseTimeout(requests.Timeout):
+    pass
+
+
+class UnsupportedContentType(requests.RequestException):
+    pass
+
+
+_session = None
+_session_pid = None
+_lock = threading.Lock()
+
+
+def build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=settings.SCRAPER_HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.SCRAPER_HTTP_POOL_MAXSIZE,
+        pool_block=True,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = settings.SCRAPER_USER_AGENT
+    session.max_redirects = settings.SCRAPER_HTTP_MAX_REDIRECTS
+    return session
+
+
+def get_session():
+    global _session, _session_pid
+
+    # Celery's prefork pool forks after import; a child must never reuse the
+    # sockets of a session created in its parent.
+    if _session is None or _session_pid != os.getpid():
+        with _lock:
+            if _session is None or _session_pid != os.getpid():
+                _session = build_session()
+                _session_pid = os.getpid()
+    return _session
+
+
+def fetch(url: str, headers: dict = None):
+    """
+    Sends a streamed GET for `url`. The SCRAPER_HTTP_TOTAL_TIMEOUT of the
+    whole request, redirects included, starts now: it is kept on the
+    response as `deadline` for `iter_text`.
+    """
+    deadline = time.monotonic() + settings.SCRAPER_HTTP_TOTAL_TIMEOUT
+    response = get_session().get(
+        url,
+        headers=headers,
+        stream=True,
+        timeout=(settings.SCRAPER_HTTP_CONNECT_TIMEOUT, settings.SCRAPER_HTTP_READ_TIMEOUT),
+    )
+    response.deadline = deadline
+
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit() and int(content_length) > settings.SCRAPER_MAX_BODY_SIZE:
+        response.close()
+        raise ResponseTooLarge(f"Response body of {content_length} bytes exceeds the limit", response=response)
+    return response
+
+
+def check_content_type(response):
+    """
+    Raises `UnsupportedContentType` unless the response is declared as one of
+    SCRAPER_ALLOWED_CONTENT_TYPES. Responses without a Content-Type pass.
+    """
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    if content_type and content_type not in settings.SCRAPER_ALLOWED_CONTENT_TYPES:
+        raise UnsupportedContentType(f"Unsupported content type {content_type}", response=response)
+
+
+def check_response(response):
+    """
+    Raises, closing `response`, for an error status or a content type that
+    is not parsed.
+    """
+    try:
+        response.raise_for_status()
+        check_content_type(response)
+    except requests.RequestException:
+        response.close()
+        raise
+
+
+def get_decoder(encoding: str = None):
+    """
+    Returns an incremental decoder for `encoding`, or for UTF-8 when the
+    server declared a charset Python does not know.
+    """
+    try:
+        return codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+
+def shutdown(response):
+    """
+    Ends the read in progress on `response` from another thread. Closing the
+    socket would not wake a thread blocked in it, shutting it down does.
+    """
+    try:
+        response.raw.shutdown()
+    except (AttributeError, ValueError, RuntimeError):
+        # urllib3 < 2.3, or a response that is not reading from a socket
+        response.close()
+
+
+def iter_chunks(response, chunk_size: int, deadline: float):
+    """
+    Yields the raw body of `response` until `deadline`, when a watchdog
+    shuts the response down, so that a server sending it slowly cannot hold
+    the worker in a read past it.
+    """
+    timed_out = threading.Event()
+
+    def abort():
+        timed_out.set()
+        shutdown(response)
+
+    watchdog = threading.Timer(max(deadline - time.monotonic(), 0), abort)
+    watchdog.daemon = True
+    watchdog.start()
+    try:
+        for chunk in response.iter_content(chunk_size):
+            if timed_out.is_set() or time.monotonic() > deadline:
+                timed_out.set()
+                break
+            yield chunk
+    except Exception:
+        # The shutdown fails the read in progress
+        if not timed_out.is_set():
+            raise
+    finally:
+        watchdog.cancel()
+
+    if timed_out.is_set():
+        raise ResponseTimeout(
+            f"Download took more than {settings.SCRAPER_HTTP_TOTAL_TIMEOUT:g}s", response=response
+        )
+
+
+def iter_text(response, chunk_size: int = None):
+    """
+    Yields the decoded body in chunks, aborting once more than
+    SCRAPER_MAX_BODY_SIZE bytes have been read or the whole request has
+    taken more than SCRAPER_HTTP_TOTAL_TIMEOUT seconds, counted from
+    `fetch` (or from now, for a response it did not send).
+    """
+    decoder = get_decoder(response.encoding)
+    max_size = settings.SCRAPER_MAX_BODY_SIZE
+    deadline = getattr(response, 'deadline', None) or time.monotonic() + settings.SCRAPER_HTTP_TOTAL_TIMEOUT
+    size = 0
+    try:
+        for chunk in iter_chunks(response, chunk_size or settings.SCRAPER_CHUNK_SIZE, deadline):
+            size += len(chunk)
+            if size > max_size:
+                raise ResponseTooLarge(f"Response body exceeds {max_size} bytes", response=response)
+
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
+    finally:
+        metrics.DOWNLOADED_BYTES.inc(size)
+        response.close()
@@ -0,0 +1,295 @@
+"""
+Recursive same-site crawls.
+
+The frontier of a crawl is stored as `CrawlURL` rows, with the unique
+(crawl, url_hash) pair as its visited set. Memory use therefore does not grow
+with the crawl, and a crawl picks up from the database after a restart.
+
+A crawl advances in steps (see `scraper.tasks.crawl_step_task`). Each step:
+- claims the next breadth-first batch of queued URLs;
+- fetches the batch concurrently with the batch engine (scraper/batch.py);
+- stores the pages and their links;
+- queues the in-scope links one level deeper.
+Up to SCRAPER_CRAWL_CONCURRENCY step chains run at once. The frontier never
+holds more than `max_pages` URLs, so every queued URL gets fetched.
+
+For crawls of SCRAPER_CRAWL_BLOOM_MIN_PAGES pages or more, a Bloom filter
+in Redis screens discovered URLs instead of looking each batch up in the
+frontier table.
+"""
+import hashlib
+import logging
+import math
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from scraper import batch, metrics
+from scraper import services as scraper_services
+from scraper import tasks as scraper_tasks
+from scraper.models import Crawl, CrawlURL, LinkTarget, ScrapedPage
+
+
+logger = logging.getLogger(__name__)
+
+_redis = None
+
+
+def get_redis():
+    global _redis
+
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.SCRAPER_CRAWL_REDIS_URL)
+    return _redis
+
+
+class BloomFilter:
+    """
+    Bloom filter in a Redis bitmap, sized for `capacity` items at a false
+    positive rate of `error_rate`. A false positive makes the crawl skip a
+    URL it has not visited.
+    """
+
+    def __init__(self, client: redis.Redis, key: str, capacity: int, error_rate: float = 0.001, ttl: int = None):
+        self.client = client
+        self.key = key
+        self.ttl = ttl
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+
+    def offsets(self, item: str):
+        digest = hashlib.sha256(item.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, items):
+        """
+        Adds `items` and returns, for each of them, whether it was new.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for item in items:
+            for offset in self.offsets(item):
+                pipe.setbit(self.key, offset, 1)
+        if self.ttl:
+            pipe.expire(self.key, self.ttl)
+        bits = pipe.execute()
+
+        k = self.hashes
+        return [not all(bits[i * k:(i + 1) * k]) for i in range(len(items))]
+
+    def delete(self):
+        self.client.delete(self.key)
+
+
+def get_bloom_filter(crawl: Crawl):
+    if crawl.max_pages < settings.SCRAPER_CRAWL_BLOOM_MIN_PAGES:
+        return None
+    return BloomFilter(
+        get_redis(),
+        f'scraper:crawl:{crawl.id}:seen',
+        capacity=crawl.max_pages,
+        error_rate=settings.SCRAPER_CRAWL_BLOOM_ERROR_RATE,
+        ttl=7 * 24 * 60 * 60
+    )
+
+
+def in_scope(crawl: Crawl, url: str):
+    host = urlsplit(url).hostname
+    seed_host = urlsplit(crawl.seed_url).hostname
+    if crawl.scope == Crawl.Scope.HOST:
+        return host == seed_host
+
+    domain = seed_host.removeprefix('www.')
+    return host == domain or host.endswith('.' + domain)
+
+
+def filter_unseen(crawl: Crawl, urls):
+    """
+    Drops the URLs the crawl has already queued, through the Bloom filter
+    when the crawl has one and through the frontier table otherwise.
+    """
+    bloom = get_bloom_filter(crawl)
+    if bloom is not None:
+        try:
+            return [url for url, new in zip(urls, bloom.add(urls)) if new]
+        except redis.RedisError:
+            # The unique constraint still keeps the frontier free of duplicates
+            logger.warning('Crawl Bloom filter unavailable', exc_info=True)
+            return urls
+
+    hashes = {url: LinkTarget.hash_url(url) for url in urls}
+    all_hashes = list(hashes.values())
+    batch_size = settings.SCRAPER_LINK_BATCH_SIZE
+    seen = set()
+    for i in range(0, len(all_hashes), batch_size):
+        seen.update(
+            CrawlURL.objects.filter(crawl=crawl, url_hash__in=all_hashes[i:i + batch_size])
+            .values_list('url_hash', flat=True)
+        )
+    return [url for url in urls if hashes[url] not in seen]
+
+
+def enqueue_urls(crawl: Crawl, urls, depth: int):
+    """
+    Queues the in-scope, unvisited `urls` at `depth`, up to the crawl's page
+    budget, and returns how many were queued.
+    """
+    remaining = crawl.max_pages - CrawlURL.objects.filter(crawl=crawl).count()
+    if remaining <= 0:
+        return 0
+
+    urls = list(dict.fromkeys(url for url in urls if in_scope(crawl, url)))
+    urls = filter_unseen(crawl, urls)[:remaining]
+    CrawlURL.objects.bulk_create(
+        [CrawlURL(crawl=crawl, url_hash=LinkTarget.hash_url(url), url=url, depth=depth) for url in urls],
+        batch_size=settings.SCRAPER_LINK_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    return len(urls)
+
+
+def requeue_stale_urls(crawl_id, timeout: int = None):
+    """
+    Puts back URLs claimed by a step whose worker died before finishing them.
+    """
+    timeout = settings.SCRAPER_CRAWL_CLAIM_TIMEOUT if timeout is None else timeout
+    return CrawlURL.objects.filter(
+        crawl_id=crawl_id,
+        state=CrawlURL.State.FETCHING,
+        claimed_at__lte=timezone.now() - timedelta(seconds=timeout)
+    ).update(state=CrawlURL.State.QUEUED, claimed_at=None)
+
+
+@transaction.atomic
+def claim_urls(crawl: Crawl, limit: int):
+    # SKIP LOCKED lets concurrent steps claim disjoint batches.
+    ids = list(
+        CrawlURL.objects.select_for_update(skip_locked=True)
+        .filter(crawl=crawl, state=CrawlURL.State.QUEUED)
+        .order_by('id')
+        .values_list('id', flat=True)[:limit]
+    )
+    CrawlURL.objects.filter(id__in=ids).update(state=CrawlURL.State.FETCHING, claimed_at=timezone.now())
+    return list(CrawlURL.objects.filter(id__in=ids).order_by('id'))
+
+
+def run_step(crawl_id):
+    """
+    Crawls the next batch of the frontier. Returns False when there was
+    nothing left to claim.
+    """
+    crawl = Crawl.objects.filter(id=crawl_id, status=Crawl.Status.RUNNING).first()
+    if crawl is None:
+        return False
+
+    requeue_stale_urls(crawl.id)
+    claimed = claim_urls(crawl, settings.SCRAPER_CRAWL_BATCH_SIZE)
+    if not claimed:
+        return False
+
+    urls = [crawl_url.url for crawl_url in claimed]
+    ScrapedPage.objects.bulk_create(
+        [ScrapedPage(user_id=crawl.user_id, url=url, title='') for url in urls],
+        ignore_conflicts=True
+    )
+    scraper_services.mark_scraped_pages_fetching(crawl.user_id, urls)
+    try:
+        results = {result.url: result for result in batch.scrape_pages_cached(urls)}
+        with metrics.timed('persist'):
+            scraper_services.save_scraped_pages(crawl.user_id, list(results.values()))
+    except Exception as e:
+        # Fail the batch rather than leave its URLs claimed until they go stale
+        logger.exception('Crawl step of %s failed', crawl.id)
+        results = {url: scraper_services.PageResult(url=url, error=e) for url in urls}
+        scraper_services.save_scraped_pages(crawl.user_id, list(results.values()))
+
+    page_ids = dict(ScrapedPage.objects.filter(user_id=crawl.user_id, url__in=urls).values_list('url', 'id'))
+    discovered = {}
+    for crawl_url in claimed:
+        result = results[crawl_url.url]
+        crawl_url.page_id = page_ids.get(crawl_url.url)
+        if result.error is not None:
+            crawl_url.state = CrawlURL.State.FAILED
+            continue
+
+        crawl_url.state = CrawlURL.State.DONE
+        if crawl_url.depth < crawl.max_depth:
+            discovered.setdefault(crawl_url.depth + 1, []).extend(link_url for link_url, _ in result.links)
+
+    CrawlURL.objects.bulk_update(claimed, ['state', 'page'])
+    failed = sum(crawl_url.state == CrawlURL.State.FAILED for crawl_url in claimed)
+    Crawl.objects.filter(id=crawl.id).update(
+        pages_crawled=F('pages_crawled') + len(claimed) - failed,
+        pages_failed=F('pages_failed') + failed
+    )
+    for depth, links in sorted(discovered.items()):
+        enqueue_urls(crawl, links, depth)
+    return True
+
+
+def reset_lost_steps(crawl_id, timeout: int = None):
+    """
+    Forgets the step chains of a running crawl none of whose steps was
+    queued, started or finished in the last `timeout` seconds. Steps still
+    in flight, e.g. delivered again after their worker restarted, keep the
+    crawl from starting chains on top of theirs.
+    """
+    timeout = settings.SCRAPER_CRAWL_CLAIM_TIMEOUT if timeout is None else timeout
+    return Crawl.objects.filter(id=crawl_id, status=Crawl.Status.RUNNING).filter(
+        Q(last_step_at__isnull=True) | Q(last_step_at__lte=timezone.now() - timedelta(seconds=timeout))
+    ).update(active_steps=0)
+
+
+def schedule_steps(crawl_id):
+    """
+    Starts step chains until SCRAPER_CRAWL_CONCURRENCY of them are running,
+    or one per queued batch, and finishes the crawl once the frontier is
+    exhausted and no step is left.
+    """
+    batch_size = settings.SCRAPER_CRAWL_BATCH_SIZE
+    concurrency = settings.SCRAPER_CRAWL_CONCURRENCY
+    queued = CrawlURL.objects.filter(crawl_id=crawl_id, state=CrawlURL.State.QUEUED).values('id')[
+        :batch_size * concurrency
+    ].count()
+    wanted = min(concurrency, math.ceil(queued / batch_size))
+
+    with transaction.atomic():
+        crawl = Crawl.objects.select_for_update().filter(id=crawl_id, status=Crawl.Status.RUNNING).first()
+        if crawl is None:
+            return 0
+        missing = max(0, wanted - crawl.active_steps)
+        if missing:
+            Crawl.objects.filter(id=crawl_id).update(
+                active_steps=F('active_steps') + missing, last_step_at=timezone.now()
+            )
+        elif crawl.active_steps <= 0:
+            finish_if_idle(crawl)
+
+    for _ in range(missing):
+        scraper_tasks.crawl_step_task.delay(str(crawl_id))
+    return missing
+
+
+def finish_if_idle(crawl: Crawl):
+    pending = CrawlURL.objects.filter(
+        crawl=crawl, state__in=[CrawlURL.State.QUEUED, CrawlURL.State.FETCHING]
+    ).exists()
+    if pending:
+        return False
+
+    Crawl.objects.filter(id=crawl.id, status=Crawl.Status.RUNNING).update(
+        status=Crawl.Status.DONE, finished_at=timezone.now()
+    )
+    bloom = get_bloom_filter(crawl)
+    if bloom is not None:
+        try:
+            bloom.delete()
+        except redis.RedisError:
+            logger.warning('Crawl Bloom filter unavailable', exc_info=True)
+    return True
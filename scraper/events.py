@@ -0,0 +1,72 @@
+"""
+Scrape progress events, pushed from the Celery workers to the browser.
+
+Workers publish a small JSON payload on a per-user Redis pub/sub channel
+whenever a page changes state; the `page_events` view relays the user's
+channel as Server-Sent Events, so the page list never polls the database.
+"""
+import json
+import logging
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_redis = None
+
+
+def get_redis():
+    global _redis
+
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.SCRAPER_EVENTS_URL)
+    return _redis
+
+
+def user_channel(user_id: int):
+    return f'scraper:events:user:{user_id}'
+
+
+def publish_page_event(user_id: int, page_id, **data):
+    """
+    Publishes a progress event for a page. Delivery is best effort: a missing
+    event only delays the UI, so Redis errors never fail the scrape.
+    """
+    payload = json.dumps({'page_id': str(page_id), **data})
+    try:
+        get_redis().publish(user_channel(user_id), payload)
+    except redis.RedisError:
+        logger.warning('Could not publish scrape event', exc_info=True)
+
+
+def format_sse(data: str = None, comment: str = None):
+    if comment is not None:
+        return f': {comment}\n\n'
+    return ''.join(f'data: {line}\n' for line in data.splitlines()) + '\n'
+
+
+async def iter_user_events(user_id: int, client: redis.asyncio.Redis = None):
+    """
+    Yields the user's events formatted as SSE messages, with a comment line
+    every SCRAPER_EVENTS_HEARTBEAT seconds so proxies keep the stream open.
+    """
+    client = client or redis.asyncio.Redis.from_url(settings.SCRAPER_EVENTS_URL)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(user_channel(user_id))
+    try:
+        yield format_sse(comment='connected')
+        while True:
+            message = await pubsub.get_message(timeout=settings.SCRAPER_EVENTS_HEARTBEAT)
+            if message is None:
+                yield format_sse(comment='heartbeat')
+                continue
+
+            data = message['data']
+            yield format_sse(data.decode() if isinstance(data, bytes) else data)
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
@@ -0,0 +1,53 @@
+import httpx
+import requests
+from django.db import OperationalError
+
+
+# HTTP statuses worth retrying: the server may answer differently later
+TRANSIENT_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class ScrapeError(Exception):
+    pass
+
+
+class TransientScrapeError(ScrapeError):
+    """
+    A failure that may not happen again, such as a timeout or a 503. The
+    scrape is retried with backoff.
+    """
+
+
+class PermanentScrapeError(ScrapeError):
+    """
+    A failure that retrying will not fix, such as a 404 or a page too large.
+    """
+
+
+def get_status_code(exc: Exception):
+    response = getattr(exc, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def classify(exc: Exception):
+    """
+    Returns `exc` as a `TransientScrapeError` or `PermanentScrapeError`.
+    """
+    if isinstance(exc, ScrapeError):
+        return exc
+
+    status_code = get_status_code(exc)
+    if status_code is not None and status_code >= 400:
+        transient = status_code in TRANSIENT_STATUS_CODES
+    else:
+        transient = isinstance(exc, (
+            requests.ConnectionError,
+            requests.Timeout,
+            httpx.TransportError,
+            OperationalError,
+        ))
+
+    error_class = TransientScrapeError if transient else PermanentScrapeError
+    error = error_class(f"{type(exc).__name__}: {exc}")
+    error.__cause__ = exc
+    return error
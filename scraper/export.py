@@ -0,0 +1,70 @@
+"""
+Streamed exports of scraped links as CSV or NDJSON.
+
+Rows come from a server-side cursor, SCRAPER_EXPORT_CHUNK_SIZE at a time, and
+are written out in blocks of about BLOCK_SIZE bytes, gzipped on the fly if
+asked, so an export holds the same few blocks in memory whatever its size.
+"""
+import csv
+import io
+import json
+import zlib
+
+
+COLUMNS = ('page_url', 'url', 'name', 'created_at')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+BLOCK_SIZE = 64 * 1024
+
+# Spreadsheets run cells starting with these as formulas, and link names come
+# from the scraped pages
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def format_row(row: dict):
+    return row['page_url'], row['url'], row['name'], row['created_at'].isoformat()
+
+
+def escape_cell(value: str):
+    return f"'{value}" if value.startswith(FORMULA_PREFIXES) else value
+
+
+async def iter_blocks(rows, export_format: str):
+    """
+    Yields the encoded `rows`, an async iterable of dicts of the COLUMNS, in
+    `export_format`.
+    """
+    buffer = io.StringIO()
+    if export_format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNS)
+
+        def write_row(values):
+            writer.writerow([escape_cell(value) for value in values])
+    else:
+        def write_row(values):
+            buffer.write(json.dumps(dict(zip(COLUMNS, values))) + '\n')
+
+    async for row in rows:
+        write_row(format_row(row))
+        if buffer.tell() >= BLOCK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def gzip_blocks(blocks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    async for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def get_filename(name: str, export_format: str, compression: str = None):
+    return f'{name}.{export_format}' + ('.gz' if compression == 'gzip' else '')
@@ -1,9 +1,102 @@
 from django import forms
+from django.conf import settings
+from django.core.validators import URLValidator
+
+from scraper.models import Crawl
+
+
+# Only web pages can be scraped, while URLField also accepts ftp:// URLs
+validate_http_url = URLValidator(schemes=['http', 'https'])
 
 
 class URLForm(forms.Form):
     url = forms.URLField(
         label='Website URL',
+        validators=[validate_http_url],
         widget=forms.URLInput(attrs={'class': 'form-control', 'placeholder': 'https://example.com'}),
         help_text='Enter the full URL of the website you want to scrape.'
     )
+
+
+class BulkURLForm(forms.Form):
+    urls = forms.CharField(
+        label='Website URLs',
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 5}),
+        help_text='One URL per line.'
+    )
+    file = forms.FileField(
+        label='URL list file',
+        required=False,
+        help_text='Plain text file with one URL per line.'
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        lines = (cleaned_data.get('urls') or '').splitlines()
+        upload = cleaned_data.get('file')
+        if upload:
+            lines += upload.read().decode('utf-8', errors='replace').splitlines()
+
+        lines = [line.strip() for line in lines]
+        urls = [line for line in lines if line]
+        if not urls:
+            raise forms.ValidationError('Enter at least one URL.')
+        if len(urls) > settings.SCRAPER_BULK_MAX_URLS:
+            raise forms.ValidationError(f'At most {settings.SCRAPER_BULK_MAX_URLS} URLs can be submitted at once.')
+
+        # Lines are numbered across the text and then the file
+        invalid = []
+        for number, line in enumerate(lines, 1):
+            if not line:
+                continue
+            try:
+                validate_http_url(line)
+            except forms.ValidationError:
+                invalid.append(f'line {number}: {line}')
+        if invalid:
+            more = f' and {len(invalid) - 5} more' if len(invalid) > 5 else ''
+            raise forms.ValidationError(f'Not http(s) URLs: {", ".join(invalid[:5])}{more}')
+
+        cleaned_data['url_list'] = urls
+        return cleaned_data
+
+
+class CrawlForm(forms.Form):
+    url = forms.URLField(
+        label='Seed URL',
+        validators=[validate_http_url],
+        widget=forms.URLInput(attrs={'class': 'form-control', 'placeholder': 'https://example.com'}),
+        help_text='The crawl follows links from this page.'
+    )
+    max_depth = forms.IntegerField(label='Maximum depth', min_value=0, initial=2)
+    max_pages = forms.IntegerField(label='Maximum pages', min_value=1, initial=100)
+    scope = forms.ChoiceField(choices=Crawl.Scope.choices, initial=Crawl.Scope.HOST)
+
+    def clean_max_depth(self):
+        max_depth = self.cleaned_data['max_depth']
+        if max_depth > settings.SCRAPER_CRAWL_MAX_DEPTH:
+            raise forms.ValidationError(f'The depth is limited to {settings.SCRAPER_CRAWL_MAX_DEPTH}.')
+        return max_depth
+
+    def clean_max_pages(self):
+        max_pages = self.cleaned_data['max_pages']
+        if max_pages > settings.SCRAPER_CRAWL_MAX_PAGES:
+            raise forms.ValidationError(f'A crawl is limited to {settings.SCRAPER_CRAWL_MAX_PAGES} pages.')
+        return max_pages
+
+
+class ScheduleForm(forms.Form):
+    interval = forms.IntegerField(
+        label='Re-scrape interval',
+        min_value=0,
+        help_text='Seconds between two scrapes of the page, or 0 to stop monitoring it.'
+    )
+
+    def clean_interval(self):
+        interval = self.cleaned_data['interval']
+        min_interval = settings.SCRAPER_RESCRAPE_MIN_INTERVAL
+        max_interval = settings.SCRAPER_RESCRAPE_MAX_INTERVAL
+        if interval and not min_interval <= interval <= max_interval:
+            raise forms.ValidationError(f'The interval must be between {min_interval} and {max_interval} seconds.')
+        return interval
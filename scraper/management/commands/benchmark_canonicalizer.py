@@ -0,0 +1,56 @@
+import random
+import time
+from urllib.parse import urljoin
+
+from django.core.management.base import BaseCommand
+
+from scraper.canonicalize import Canonicalizer
+
+
+HREFS = [
+    '/',
+    '/about',
+    '/blog/{n}',
+    '/blog/{n}#comments',
+    '/search?q=item-{n}&page={m}',
+    '/product/{n}?utm_source=newsletter&utm_medium=email&ref=home',
+    '?sort=price&filter={m}&gclid=abc{n}',
+    '../category/{m}/',
+    'https://WWW.Example.com:443/offer/{n}',
+    'https://cdn.example.net/static/{n}.js',
+    'mailto:sales{m}@example.com',
+    'javascript:void(0)',
+]
+
+
+class Command(BaseCommand):
+    help = "Measures the per-anchor cost of URL canonicalization on a synthetic set of links."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anchors', type=int, default=200000, help='Anchors to canonicalize')
+        parser.add_argument('--distinct', type=int, default=20000, help='Distinct URLs among them')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        base = 'https://example.com/section/page.html'
+        pool = [
+            urljoin(base, rng.choice(HREFS).format(n=i, m=i % 17))
+            for i in range(options['distinct'])
+        ]
+        urls = [rng.choice(pool) for _ in range(options['anchors'])]
+
+        self.stdout.write(f'{len(urls)} anchors, {len(set(urls))} distinct URLs')
+        self.report('uncached', Canonicalizer(cache_size=0), urls)
+        self.report('memoized', Canonicalizer(), urls)
+
+    def report(self, label, canonicalizer, urls):
+        started = time.perf_counter()
+        canonical = {canonicalizer(url) for url in urls}
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{label:<10}{len(urls) / elapsed:>12,.0f} anchors/sec'
+            f'{elapsed / len(urls) * 1e6:>8.2f} us/anchor'
+            f'{len(canonical) - (None in canonical):>8} canonical URLs'
+        )
@@ -0,0 +1,75 @@
+import time
+from itertools import combinations
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper import parsers
+from scraper import services as scraper_services
+
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / 'tests' / 'fixtures'
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs every parser backend over a corpus of local HTML files and reports "
+        "pages/sec and how much the extracted link sets differ between backends."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', default=str(DEFAULT_CORPUS), help='Directory of *.html files')
+        parser.add_argument('--repeat', type=int, default=5, help='Passes over the corpus per backend')
+        parser.add_argument('--chunk-size', type=int, default=64 * 1024)
+        parser.add_argument('--parser', action='append', dest='parsers', help='Limit to these backends')
+
+    def handle(self, *args, **options):
+        pages = [
+            (path.name, path.read_text(errors='replace'))
+            for path in sorted(Path(options['corpus']).glob('*.html'))
+        ]
+        if not pages:
+            raise CommandError(f"No *.html files in {options['corpus']}")
+
+        chunk_size = options['chunk_size']
+        corpus = [
+            (f'https://example.com/{name}', [html[i:i + chunk_size] for i in range(0, len(html), chunk_size)])
+            for name, html in pages
+        ]
+
+        results = {}
+        for name in options['parsers'] or parsers.PARSERS:
+            try:
+                results[name] = self.run_backend(name, corpus, options['repeat'])
+            except ImproperlyConfigured as e:
+                self.stdout.write(self.style.WARNING(f'{name}: skipped ({e})'))
+
+        self.stdout.write(f'{len(pages)} pages x {options["repeat"]} passes')
+        self.stdout.write(f'{"parser":<14}{"pages/sec":>12}{"links":>10}')
+        for name, (pages_per_sec, link_sets) in results.items():
+            links = sum(len(link_set) for link_set in link_sets)
+            self.stdout.write(f'{name:<14}{pages_per_sec:>12.1f}{links:>10}')
+
+        self.stdout.write('')
+        self.stdout.write('Link set difference (symmetric difference / union, over all pages)')
+        for a, b in combinations(results, 2):
+            diff = union = 0
+            for links_a, links_b in zip(results[a][1], results[b][1]):
+                diff += len(links_a ^ links_b)
+                union += len(links_a | links_b)
+            ratio = diff / union if union else 0.0
+            self.stdout.write(f'{a:>12} vs {b:<12}{ratio:>8.2%}  ({diff} links)')
+
+    def run_backend(self, name, corpus, repeat):
+        link_sets = []
+        started = time.perf_counter()
+        for i in range(repeat):
+            for url, chunks in corpus:
+                parser = parsers.get_parser(name)
+                links = set(scraper_services.iter_links(parser, chunks, url))
+                if i == 0:
+                    link_sets.append(links)
+        elapsed = time.perf_counter() - started
+
+        return len(corpus) * repeat / elapsed, link_sets
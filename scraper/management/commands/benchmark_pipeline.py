@@ -0,0 +1,328 @@
+import json
+import math
+import platform
+import resource
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from scraper import services as scraper_services
+from scraper import tasks as scraper_tasks
+from scraper.models import ScrapedPage
+from users.models import User
+
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'benchmarks' / 'pipeline.json'
+
+# Pages per run of each kind of page in the corpus, before --scale
+PROFILES = {
+    'small': 200,
+    'deep': 50,
+    'anchors': 5,
+    'slow': 10,
+    'huge': 3,
+}
+# Environment fields that must match the baseline for the numbers to compare
+COMPARABLE = ('database', 'parser', 'scale')
+POLL_INTERVAL = 0.05
+
+
+def small_page():
+    items = ''.join(f'<li><a href="/about/{i}">Item {i}</a></li>' for i in range(20))
+    return f'<html><head><title>Small page</title></head><body><ul>{items}</ul></body></html>'
+
+
+def deep_page(depth=12):
+    items = ''.join(
+        f'<a href="{"../" * level}section-{level}/{i}.html">Section {level}.{i}</a>'
+        f'<a href="./sibling-{level}-{i}.html#top">Sibling</a>'
+        for level in range(depth)
+        for i in range(8)
+    )
+    return f'<html><head><title>Deep page</title></head><body>{items}</body></html>'
+
+
+def anchors_page(anchors):
+    items = ''.join(f'<p><a href="item/{i}?ref=list">Item {i}</a></p>' for i in range(anchors))
+    return f'<html><head><title>Anchors page</title></head><body>{items}</body></html>'
+
+
+def huge_page(size):
+    block = '<p>' + 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 64 + '</p>'
+    items = []
+    length = i = 0
+    while length < size:
+        item = f'{block}<a href="/archive/{i}">Archive {i}</a>'
+        items.append(item)
+        length += len(item)
+        i += 1
+    return f'<html><head><title>Huge page</title></head><body>{"".join(items)}</body></html>'
+
+
+class CorpusHandler(BaseHTTPRequestHandler):
+    """
+    Serves the corpus page of the kind named by the second segment of the
+    path, /<run>/<kind>/..., whatever follows it.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        parts = self.path.split('/')
+        body = self.server.bodies.get(parts[2] if len(parts) > 2 else '')
+        if body is None:
+            self.send_error(404)
+            return
+
+        slow = parts[2] == 'slow'
+        if slow:
+            # Half the delay before the headers, the other half dribbling the body
+            time.sleep(self.server.slow_delay / 2)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not slow:
+            self.wfile.write(body)
+            return
+        step = math.ceil(len(body) / 8)
+        for i in range(0, len(body), step):
+            self.wfile.write(body[i:i + step])
+            self.wfile.flush()
+            time.sleep(self.server.slow_delay / 16)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Scrapes a synthetic corpus served by a local HTTP server through the full pipeline "
+        "(create_scraped_page, the scrape task and the database), with eager tasks or real "
+        "Celery workers, and reports pages/sec, p50/p99 latency, queries per page and peak RSS "
+        "against a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=('eager', 'workers'), default='eager',
+                            help='Run the tasks in this process, or send them to running workers')
+        parser.add_argument('--profile', action='append', dest='profiles', choices=list(PROFILES),
+                            help='Limit to these kinds of pages')
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiplies the pages per kind')
+        parser.add_argument('--anchors', type=int, default=10000, help='Anchors of the anchors pages')
+        parser.add_argument('--huge-size', type=int, default=8 * 1024 * 1024, help='Bytes of the huge pages')
+        parser.add_argument('--slow-delay', type=float, default=1.0, help='Seconds each slow page takes')
+        parser.add_argument('--host', default='127.0.0.1', help='Address the corpus server listens on')
+        parser.add_argument('--port', type=int, default=0, help='Port of the corpus server, any free one by default')
+        parser.add_argument('--url-host', help='Host the workers reach the corpus server at, --host by default')
+        parser.add_argument('--politeness', action='store_true',
+                            help='Keep the per-host limits in eager mode, which would mostly measure them')
+        parser.add_argument('--timeout', type=float, default=600, help='Seconds to wait for workers per kind')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--save', action='store_true', help='Record the results as the new baseline')
+        parser.add_argument('--check', action='store_true', help='Fail if the results regressed from the baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Relative change of speed, latency and memory counted as a regression')
+
+    def handle(self, *args, **options):
+        mode = options['mode']
+        if mode == 'workers':
+            self.get_workers_peak_rss()
+            if settings.SCRAPER_POLITENESS:
+                self.stdout.write(self.style.WARNING(
+                    'SCRAPER_POLITENESS is on: unless the workers run with it off, '
+                    'the per-host limits cap the throughput'
+                ))
+
+        server = ThreadingHTTPServer((options['host'], options['port']), CorpusHandler)
+        server.daemon_threads = True
+        server.slow_delay = options['slow_delay']
+        server.bodies = {
+            'small': small_page().encode(),
+            'deep': deep_page().encode(),
+            'anchors': anchors_page(options['anchors']).encode(),
+            'slow': small_page().encode(),
+            'huge': huge_page(options['huge_size']).encode(),
+        }
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        # Every run scrapes URLs of its own, so nothing comes from the shared cache
+        base_url = f'http://{options["url_host"] or options["host"]}:{server.server_address[1]}/{uuid.uuid4().hex}'
+        user, _ = User.objects.get_or_create(username='benchmark')
+        profiles = {}
+        try:
+            for name in options['profiles'] or PROFILES:
+                pages = max(1, round(PROFILES[name] * options['scale']))
+                if name == 'deep':
+                    urls = [f'{base_url}/deep/{i}/' + 'level/' * 12 + 'index.html' for i in range(pages)]
+                else:
+                    urls = [f'{base_url}/{name}/{i}.html' for i in range(pages)]
+
+                if mode == 'eager':
+                    elapsed, latencies, queries = self.run_eager(urls, user, options['politeness'])
+                    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                else:
+                    elapsed, latencies, queries = self.run_workers(urls, user, options['timeout'])
+                    peak_rss = self.get_workers_peak_rss()
+
+                profiles[name] = {
+                    'pages': pages,
+                    'failed': ScrapedPage.objects.filter(
+                        user=user, url__in=urls, status=ScrapedPage.Status.FAILED
+                    ).count(),
+                    'pages_per_sec': round(pages / elapsed, 1),
+                    'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+                    'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+                    'queries_per_page': round(queries / pages, 1) if queries is not None else None,
+                    'peak_rss_mb': round(peak_rss, 1),
+                }
+        finally:
+            server.shutdown()
+            server.server_close()
+            ScrapedPage.objects.filter(user=user, url__startswith=base_url).delete()
+
+        results = {
+            'environment': {
+                'database': connection.vendor,
+                'parser': settings.SCRAPER_PARSER,
+                'scale': options['scale'],
+                'python': platform.python_version(),
+            },
+            'profiles': profiles,
+        }
+        self.report(results)
+
+        baseline_path = Path(options['baseline'])
+        baselines = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        regressions = self.compare(results, baselines.get(mode), options['tolerance'])
+
+        if options['save']:
+            baselines[mode] = results
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(f'Saved the {mode} baseline to {baseline_path}')
+
+        if options['check'] and regressions is None and not options['save']:
+            # A check that compares nothing must not pass
+            raise CommandError(f'No {mode} baseline taken in this environment to check against')
+        if options['check'] and regressions:
+            raise CommandError(f'{len(regressions)} regressions from the {mode} baseline')
+
+    def run_eager(self, urls, user, politeness):
+        latencies = []
+        # Celery reads its CELERY_* settings from the Django settings as they are
+        with override_settings(
+            CELERY_TASK_ALWAYS_EAGER=True,
+            SCRAPER_POLITENESS=settings.SCRAPER_POLITENESS and politeness
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for url in urls:
+                    page_started = time.perf_counter()
+                    scraper_services.create_scraped_page(url, user_id=user.id)
+                    latencies.append(time.perf_counter() - page_started)
+                elapsed = time.perf_counter() - started
+        return elapsed, latencies, len(queries)
+
+    def run_workers(self, urls, user, timeout):
+        """
+        Sends the pages to the workers and polls the database until they are
+        all done or failed. The latency of a page runs from its submission
+        to the poll that sees it finished, so it is POLL_INTERVAL coarse.
+        Queries run in the workers and are not counted.
+        """
+        submitted = {}
+        started = time.perf_counter()
+        for url in urls:
+            submitted[url] = time.perf_counter()
+            scraper_services.create_scraped_page(url, user_id=user.id)
+
+        pending = dict(ScrapedPage.objects.filter(user=user, url__in=urls).values_list('id', 'url'))
+        latencies = []
+        while pending:
+            if time.perf_counter() - started > timeout:
+                raise CommandError(f'{len(pending)} pages were not scraped within {timeout}s')
+            time.sleep(POLL_INTERVAL)
+            finished = ScrapedPage.objects.filter(
+                id__in=list(pending), status__in=[ScrapedPage.Status.DONE, ScrapedPage.Status.FAILED]
+            ).values_list('id', flat=True)
+            now = time.perf_counter()
+            for page_id in finished:
+                latencies.append(now - submitted[pending.pop(page_id)])
+        return time.perf_counter() - started, latencies, None
+
+    def get_workers_peak_rss(self):
+        """
+        Peak RSS in MB of the largest worker process replying. Prefork
+        workers report their main process only, so it is only telling for
+        the thread pool workers of the 'fetch' queue.
+        """
+        stats = scraper_tasks.create_scraped_page_task.app.control.inspect(timeout=2).stats()
+        if not stats:
+            raise CommandError('No Celery worker replied')
+        return max(worker['rusage']['maxrss'] for worker in stats.values()) / 1024
+
+    def report(self, results):
+        self.stdout.write(', '.join(f'{key}: {value}' for key, value in results['environment'].items()))
+        self.stdout.write(
+            f'{"profile":<10}{"pages":>7}{"failed":>8}{"pages/sec":>11}{"p50 ms":>10}{"p99 ms":>10}'
+            f'{"queries/page":>14}{"peak RSS MB":>13}'
+        )
+        for name, result in results['profiles'].items():
+            queries = result['queries_per_page']
+            self.stdout.write(
+                f'{name:<10}{result["pages"]:>7}{result["failed"]:>8}{result["pages_per_sec"]:>11.1f}'
+                f'{result["p50_ms"]:>10.1f}{result["p99_ms"]:>10.1f}'
+                f'{"-" if queries is None else f"{queries:.1f}":>14}{result["peak_rss_mb"]:>13.1f}'
+            )
+
+    def compare(self, results, baseline, tolerance):
+        """
+        Lists and returns the regressions from `baseline`: a drop in pages/sec
+        or a rise in p99 latency or peak RSS beyond `tolerance`, or any rise
+        in queries per page. Returns None when there is no baseline taken in
+        the same environment to compare with.
+        """
+        if baseline is None:
+            self.stdout.write('No baseline to compare with')
+            return None
+        differences = [
+            key for key in COMPARABLE
+            if baseline['environment'].get(key) != results['environment'][key]
+        ]
+        if differences:
+            self.stdout.write(self.style.WARNING(
+                f'Not compared with the baseline, which differs in {", ".join(differences)}'
+            ))
+            return None
+
+        regressions = []
+        for name, result in results['profiles'].items():
+            base = baseline['profiles'].get(name)
+            if base is None:
+                continue
+            if result['pages_per_sec'] < base['pages_per_sec'] * (1 - tolerance):
+                regressions.append(f'{name}: {result["pages_per_sec"]} pages/sec, was {base["pages_per_sec"]}')
+            if result['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+                regressions.append(f'{name}: p99 {result["p99_ms"]} ms, was {base["p99_ms"]}')
+            if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+                regressions.append(f'{name}: peak RSS {result["peak_rss_mb"]} MB, was {base["peak_rss_mb"]}')
+            if (result['queries_per_page'] or 0) > (base['queries_per_page'] or 0):
+                regressions.append(f'{name}: {result["queries_per_page"]} queries/page, was {base["queries_per_page"]}')
+
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(f'Regression: {regression}'))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('No regression from the baseline'))
+        return regressions
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from scraper import services as scraper_services
+from scraper.models import FailedScrape
+
+
+class Command(BaseCommand):
+    help = "Queues the scrapes of the dead-letter store again, oldest failures first."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            choices=FailedScrape.Kind.values,
+            default=None,
+            help='Only re-drive failures of this kind'
+        )
+        parser.add_argument('--limit', type=int, default=None, help='Maximum number of pages to queue')
+
+    def handle(self, *args, **options):
+        queued = scraper_services.redrive_failed_scrapes(options['kind'], options['limit'])
+        self.stdout.write(f"{queued} pages queued again")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from scraper import services as scraper_services
+from scraper.models import Crawl
+
+
+class Command(BaseCommand):
+    help = "Restarts the step chains of running crawls, e.g. after the workers were restarted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=None,
+            help='Seconds after which a claimed URL is queued again (defaults to SCRAPER_CRAWL_CLAIM_TIMEOUT)'
+        )
+
+    def handle(self, *args, **options):
+        crawl_ids = Crawl.objects.filter(status=Crawl.Status.RUNNING).values_list('id', flat=True)
+        for crawl_id in crawl_ids:
+            requeued = scraper_services.resume_crawl(crawl_id, options['timeout'])
+            self.stdout.write(f"{crawl_id}: {requeued} URLs queued again")
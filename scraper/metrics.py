@@ -0,0 +1,177 @@
+"""
+Prometheus metrics of the scrape pipeline.
+
+Recorded for every scrape:
+- the time spent in each stage: waiting in the Celery queue, fetching the
+  response headers, downloading the body, parsing it and persisting the
+  result. The parser runs on the body as it streams in, so the download
+  stage is the time spent waiting for chunks and the parse stage the rest;
+- the bytes downloaded, links found, shared cache lookups and task outcomes
+  (including retries and throttling);
+- the latency of the web views.
+
+Web processes serve the metrics at /metrics/ and Celery workers on
+SCRAPER_METRICS_PORT. Prefork workers and multi-process web servers must set
+PROMETHEUS_MULTIPROC_DIR to a directory shared by their processes, so that
+every process's metrics are aggregated.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+from celery import signals
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess, start_http_server
+
+from scraper import tracing
+
+
+STAGE_DURATION = Histogram(
+    'scraper_stage_duration_seconds',
+    'Time spent in each stage of a scrape',
+    ['stage'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+QUEUE_WAIT = Histogram(
+    'scraper_task_queue_wait_seconds',
+    'Time tasks waited in the queue before a worker started them',
+    ['task'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+)
+TASK_DURATION = Histogram('scraper_task_duration_seconds', 'Run time of tasks', ['task', 'state'])
+DOWNLOADED_BYTES = Counter('scraper_downloaded_bytes', 'Response body bytes downloaded')
+PAGE_LINKS = Histogram(
+    'scraper_page_links',
+    'Links found per scraped page',
+    buckets=(0, 10, 50, 100, 250, 500, 1000, 5000, 20000)
+)
+CACHE_LOOKUPS = Counter('scraper_cache_lookups', 'Lookups in the shared fetch cache', ['result'])
+SCRAPE_OUTCOMES = Counter('scraper_scrape_outcomes', 'Outcomes of page scrapes', ['outcome'])
+REQUEST_DURATION = Histogram('scraper_http_request_duration_seconds', 'Latency of the web views', ['view', 'status'])
+
+PUBLISHED_AT_HEADER = 'scraper_published_at'
+
+_task_started = {}
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+@contextmanager
+def timed(stage: str):
+    with tracing.span(f'scrape.{stage}'):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            STAGE_DURATION.labels(stage).observe(time.perf_counter() - started)
+
+
+class TimedChunks:
+    """
+    Wraps a chunk iterator, adding up the time spent waiting for chunks in
+    `elapsed`.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return next(self.chunks)
+        finally:
+            self.elapsed += time.perf_counter() - started
+
+
+def observe_download_and_parse(chunks: TimedChunks, started: float):
+    """
+    Records the download and parse stages of a body read through `chunks`
+    since `started`.
+    """
+    total = time.perf_counter() - started
+    STAGE_DURATION.labels('download').observe(chunks.elapsed)
+    STAGE_DURATION.labels('parse').observe(max(0.0, total - chunks.elapsed))
+
+
+def observe_result(result):
+    if result.error is not None:
+        SCRAPE_OUTCOMES.labels('failed').inc()
+    elif result.not_modified:
+        SCRAPE_OUTCOMES.labels('unchanged').inc()
+    else:
+        SCRAPE_OUTCOMES.labels('done').inc()
+        PAGE_LINKS.observe(len(result.links))
+
+
+@signals.before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+@signals.task_prerun.connect
+def observe_queue_wait(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+    request = task.request
+    published_at = getattr(request, PUBLISHED_AT_HEADER, None) or (request.headers or {}).get(PUBLISHED_AT_HEADER)
+    # Tasks sent with a countdown wait on purpose
+    if published_at and not request.eta:
+        QUEUE_WAIT.labels(task.name).observe(max(0.0, time.time() - published_at))
+
+
+@signals.task_postrun.connect
+def observe_task_duration(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+
+@signals.worker_init.connect
+def start_worker_server(**kwargs):
+    if settings.SCRAPER_METRICS:
+        start_http_server(settings.SCRAPER_METRICS_PORT, registry=get_registry())
+
+
+@signals.worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def observe_request(request, response, started: float):
+    match = request.resolver_match
+    view = match.view_name if match else 'unmatched'
+    REQUEST_DURATION.labels(view, response.status_code).observe(time.perf_counter() - started)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """
+    Records the latency of every view, up to its response headers for
+    streamed responses.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            response = await get_response(request)
+            observe_request(request, response, started)
+            return response
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            response = get_response(request)
+            observe_request(request, response, started)
+            return response
+    return middleware
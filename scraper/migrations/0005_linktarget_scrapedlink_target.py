@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0004_scrapedpage_validators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkTarget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_hash', models.CharField(max_length=64, unique=True)),
+                ('url', models.URLField(max_length=2000)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='scrapedlink',
+            name='target',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='page_links', to='scraper.linktarget'),
+        ),
+        migrations.AlterField(
+            model_name='scrapedlink',
+            name='url',
+            field=models.URLField(max_length=2000, null=True),
+        ),
+    ]
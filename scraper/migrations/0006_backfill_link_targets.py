@@ -0,0 +1,75 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:02
+
+import hashlib
+
+from django.db import migrations
+
+
+BATCH_SIZE = 2000
+
+
+def link_targets_forward(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        # Hashing and joining in SQL avoids pulling the whole link table
+        # through Python; sha256() matches LinkTarget.hash_url.
+        schema_editor.execute(
+            "INSERT INTO scraper_linktarget (url_hash, url, created_at) "
+            "SELECT DISTINCT ON (h) h, url, NOW() FROM ("
+            "  SELECT encode(sha256(convert_to(url, 'UTF8')), 'hex') AS h, url FROM scraper_scrapedlink"
+            ") AS links "
+            "ON CONFLICT (url_hash) DO NOTHING"
+        )
+        schema_editor.execute(
+            "UPDATE scraper_scrapedlink AS link SET target_id = target.id "
+            "FROM scraper_linktarget AS target "
+            "WHERE target.url_hash = encode(sha256(convert_to(link.url, 'UTF8')), 'hex')"
+        )
+        return
+
+    LinkTarget = apps.get_model('scraper', 'LinkTarget')
+    ScrapedLink = apps.get_model('scraper', 'ScrapedLink')
+    while True:
+        links = list(ScrapedLink.objects.filter(target__isnull=True).only('id', 'url')[:BATCH_SIZE])
+        if not links:
+            break
+
+        hashes = {link.url: hashlib.sha256(link.url.encode('utf-8')).hexdigest() for link in links}
+        LinkTarget.objects.bulk_create(
+            [LinkTarget(url_hash=url_hash, url=url) for url, url_hash in hashes.items()],
+            ignore_conflicts=True
+        )
+        target_ids = dict(LinkTarget.objects.filter(url_hash__in=hashes.values()).values_list('url_hash', 'id'))
+        for link in links:
+            link.target_id = target_ids[hashes[link.url]]
+        ScrapedLink.objects.bulk_update(links, ['target'])
+
+
+def link_targets_backward(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "UPDATE scraper_scrapedlink AS link SET url = target.url "
+            "FROM scraper_linktarget AS target WHERE target.id = link.target_id"
+        )
+        return
+
+    ScrapedLink = apps.get_model('scraper', 'ScrapedLink')
+    while True:
+        links = list(ScrapedLink.objects.filter(url__isnull=True).select_related('target')[:BATCH_SIZE])
+        if not links:
+            break
+        for link in links:
+            link.url = link.target.url
+        ScrapedLink.objects.bulk_update(links, ['url'])
+
+
+class Migration(migrations.Migration):
+    # On its own, so that the deferred foreign key checks of the backfill run
+    # when its transaction commits, before 0007 alters the table
+
+    dependencies = [
+        ('scraper', '0005_linktarget_scrapedlink_target'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_targets_forward, link_targets_backward),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0006_backfill_link_targets'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='scrapedlink',
+            name='url',
+        ),
+        migrations.AlterField(
+            model_name='scrapedlink',
+            name='target',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='page_links', to='scraper.linktarget'),
+        ),
+    ]
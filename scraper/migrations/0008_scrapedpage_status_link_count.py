@@ -0,0 +1,48 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_status_and_link_count(apps, schema_editor):
+    ScrapedPage = apps.get_model('scraper', 'ScrapedPage')
+    ScrapedLink = apps.get_model('scraper', 'ScrapedLink')
+
+    link_counts = ScrapedLink.objects.filter(page=OuterRef('pk')).order_by().values('page').annotate(
+        count=Count('*')
+    ).values('count')
+    ScrapedPage.objects.update(link_count=Coalesce(Subquery(link_counts), 0))
+    # The worker sets the title, so a page with a title or links was scraped
+    ScrapedPage.objects.filter(Q(link_count__gt=0) | ~Q(title='')).update(status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0007_remove_scrapedlink_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapedpage',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapedpage',
+            name='link_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='scrapedpage',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapedpage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('fetching', 'Fetching'), ('parsing', 'Parsing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16),
+        ),
+        migrations.RunPython(backfill_status_and_link_count, migrations.RunPython.noop),
+    ]
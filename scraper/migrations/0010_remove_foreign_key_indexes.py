@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0009_cursor_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    # The foreign keys are the leading columns of the indexes of 0009, which
+    # replace their own indexes
+    operations = [
+        migrations.AlterField(
+            model_name='scrapedlink',
+            name='page',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='links', to='scraper.scrapedpage'),
+        ),
+        migrations.AlterField(
+            model_name='scrapedpage',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:36
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0010_remove_foreign_key_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Crawl',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('seed_url', models.URLField(max_length=2000)),
+                ('scope', models.CharField(choices=[('host', 'Host'), ('domain', 'Domain')], default='host', max_length=16)),
+                ('max_depth', models.PositiveIntegerField()),
+                ('max_pages', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('running', 'Running'), ('done', 'Done'), ('cancelled', 'Cancelled')], default='running', max_length=16)),
+                ('pages_crawled', models.PositiveIntegerField(default=0)),
+                ('pages_failed', models.PositiveIntegerField(default=0)),
+                ('active_steps', models.IntegerField(default=0)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'get_latest_by': 'created_at',
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CrawlURL',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_hash', models.CharField(max_length=64)),
+                ('url', models.URLField(max_length=2000)),
+                ('depth', models.PositiveIntegerField()),
+                ('state', models.CharField(choices=[('queued', 'Queued'), ('fetching', 'Fetching'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('crawl', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='urls', to='scraper.crawl')),
+                ('page', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='scraper.scrapedpage')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['crawl', 'state', 'id'], name='scraper_crawlurl_state_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='crawlurl',
+            constraint=models.UniqueConstraint(fields=('crawl', 'url_hash'), name='scraper_crawlurl_unique_url'),
+        ),
+    ]
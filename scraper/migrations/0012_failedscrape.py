@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:45
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0011_crawl'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailedScrape',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('transient', 'Transient'), ('permanent', 'Permanent')], max_length=16)),
+                ('error', models.TextField()),
+                ('attempts', models.PositiveIntegerField(default=1)),
+                ('page', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='failure', to='scraper.scrapedpage')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'get_latest_by': 'created_at',
+                'abstract': False,
+                'indexes': [models.Index(fields=['kind', 'created_at'], name='scraper_failedscrape_kind_idx')],
+            },
+        ),
+    ]
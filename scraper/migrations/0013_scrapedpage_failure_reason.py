@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0012_failedscrape'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapedpage',
+            name='failure_reason',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
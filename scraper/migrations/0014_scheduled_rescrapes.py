@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0013_scrapedpage_failure_reason'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapedpage',
+            name='next_scrape_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapedpage',
+            name='scrape_interval',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scrapedpage',
+            index=models.Index(condition=models.Q(('next_scrape_at__isnull', False)), fields=['next_scrape_at'], name='scraper_page_next_scrape_idx'),
+        ),
+    ]
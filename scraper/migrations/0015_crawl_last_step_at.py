@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0014_scheduled_rescrapes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crawl',
+            name='last_step_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
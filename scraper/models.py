@@ -1,3 +1,5 @@
+import hashlib
+
 from django.db import models
 from users.models import User
 
@@ -5,15 +7,166 @@ from lib.models.uuid import UUIDModel
 
 
 class ScrapedPage(UUIDModel):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        FETCHING = 'fetching'
+        PARSING = 'parsing'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    # Indexed as the leading column of the indexes in Meta
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     url = models.URLField(max_length=2000)
     title = models.CharField(max_length=255)
+    # Maintained by the scrape workers so listings never aggregate the link table
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    link_count = models.PositiveIntegerField(default=0)
+    # Why the last scrape failed, shown to the user
+    failure_reason = models.CharField(max_length=255, blank=True, default='')
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # HTTP validators of the last fetch, used for conditional re-scrapes
+    etag = models.CharField(max_length=255, blank=True, default='')
+    last_modified = models.CharField(max_length=64, blank=True, default='')
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    # Scheduled re-scrapes: seconds between two scrapes, adapted to how often
+    # the page's links change, and when the next one is due. Both are null
+    # for pages that are not monitored.
+    scrape_interval = models.PositiveIntegerField(null=True, blank=True)
+    next_scrape_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
-        unique_together = ['user', 'url'] 
+        unique_together = ['user', 'url']
+        indexes = [
+            # Finding the monitored pages that are due
+            models.Index(
+                fields=['next_scrape_at'],
+                condition=models.Q(next_scrape_at__isnull=False),
+                name='scraper_page_next_scrape_idx',
+            ),
+            # Keyset pagination of a user's pages, newest first. The listing
+            # columns are included so that listings are index-only scans on
+            # PostgreSQL (other backends ignore `include`).
+            models.Index(
+                fields=['user', '-created_at', '-id'],
+                include=['url', 'title', 'status', 'link_count'],
+                name='scraper_page_user_listing_idx',
+            ),
+        ]
 
 
-class ScrapedLink(UUIDModel):
-    page = models.ForeignKey(ScrapedPage, on_delete=models.CASCADE, related_name='links')
+class LinkTarget(models.Model):
+    """
+    A link destination stored once and shared by every page linking to it.
+    The URL is too long to index, so uniqueness is enforced on its hash.
+    """
+    url_hash = models.CharField(max_length=64, unique=True)
     url = models.URLField(max_length=2000)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @staticmethod
+    def hash_url(url: str):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+class ScrapedLink(UUIDModel):
+    # Indexed as the leading column of scraper_link_page_cursor_idx
+    page = models.ForeignKey(ScrapedPage, on_delete=models.CASCADE, related_name='links', db_index=False)
+    target = models.ForeignKey(LinkTarget, on_delete=models.PROTECT, related_name='page_links')
     name = models.TextField()
+
+    class Meta(UUIDModel.Meta):
+        indexes = [
+            # Keyset pagination of a page's links
+            models.Index(fields=['page', 'created_at', 'id'], name='scraper_link_page_cursor_idx'),
+        ]
+
+    @property
+    def url(self):
+        return self.target.url
+
+
+class Crawl(UUIDModel):
+    """
+    A recursive crawl from a seed URL. Discovered URLs are kept in the
+    `CrawlURL` frontier, so a crawl survives worker restarts.
+    """
+
+    class Scope(models.TextChoices):
+        HOST = 'host'
+        DOMAIN = 'domain'
+
+    class Status(models.TextChoices):
+        RUNNING = 'running'
+        DONE = 'done'
+        CANCELLED = 'cancelled'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    seed_url = models.URLField(max_length=2000)
+    # 'host' follows the seed's host only, 'domain' also its subdomains
+    scope = models.CharField(max_length=16, choices=Scope.choices, default=Scope.HOST)
+    max_depth = models.PositiveIntegerField()
+    max_pages = models.PositiveIntegerField()
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.RUNNING)
+    pages_crawled = models.PositiveIntegerField(default=0)
+    pages_failed = models.PositiveIntegerField(default=0)
+    # Number of crawl step tasks queued or running
+    active_steps = models.IntegerField(default=0)
+    # When a step was last queued, started or finished: the step chains are
+    # only considered lost once it is older than SCRAPER_CRAWL_CLAIM_TIMEOUT
+    last_step_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+
+class CrawlURL(models.Model):
+    """
+    A URL of a crawl frontier. The unique (crawl, url_hash) pair is the
+    crawl's visited set.
+    """
+
+    class State(models.TextChoices):
+        QUEUED = 'queued'
+        FETCHING = 'fetching'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    crawl = models.ForeignKey(Crawl, on_delete=models.CASCADE, related_name='urls', db_index=False)
+    url_hash = models.CharField(max_length=64)
+    url = models.URLField(max_length=2000)
+    depth = models.PositiveIntegerField()
+    state = models.CharField(max_length=16, choices=State.choices, default=State.QUEUED)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    page = models.ForeignKey(ScrapedPage, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['crawl', 'url_hash'], name='scraper_crawlurl_unique_url'),
+        ]
+        indexes = [
+            # Claiming the next breadth-first batch of a crawl
+            models.Index(fields=['crawl', 'state', 'id'], name='scraper_crawlurl_state_idx'),
+        ]
+
+
+class FailedScrape(UUIDModel):
+    """
+    Dead-letter entry of a page whose scrape failed for good, either on a
+    permanent error or once its retries ran out. See
+    `scraper.services.redrive_failed_scrapes`.
+    """
+
+    class Kind(models.TextChoices):
+        TRANSIENT = 'transient'
+        PERMANENT = 'permanent'
+
+    page = models.OneToOneField(ScrapedPage, on_delete=models.CASCADE, related_name='failure')
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    error = models.TextField()
+    attempts = models.PositiveIntegerField(default=1)
+
+    class Meta(UUIDModel.Meta):
+        indexes = [
+            # Re-driving the oldest failures of a kind first
+            models.Index(fields=['kind', 'created_at'], name='scraper_failedscrape_kind_idx'),
+        ]
@@ -0,0 +1,102 @@
+"""
+Keyset (cursor) pagination over `UUIDModel` querysets.
+
+Instead of OFFSET/LIMIT and a COUNT(*), each page is fetched with a range
+condition on `(created_at, id)` starting after the last row of the previous
+page, so with a matching composite index every page costs the same. Cursors
+are opaque URL-safe strings encoding that position and the direction.
+"""
+import base64
+import json
+import uuid
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(obj, reverse: bool = False):
+    # Model instances, or rows of a .values() queryset
+    created_at, pk = (obj['created_at'], obj['id']) if isinstance(obj, dict) else (obj.created_at, obj.id)
+    position = [int(reverse), created_at.isoformat(), str(pk)]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        reverse, created_at, pk = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = parse_datetime(created_at)
+        pk = uuid.UUID(pk)
+    except (TypeError, ValueError):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    if created_at is None:
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return bool(reverse), created_at, pk
+
+
+class CursorPage:
+
+    def __init__(self, object_list, next_cursor: str = None, previous_cursor: str = None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def paginate_by_cursor(queryset, cursor: str = None, per_page: int = 5, descending: bool = False):
+    """
+    Returns the `CursorPage` of `queryset` that follows (or, for a cursor
+    pointing backwards, precedes) `cursor`, ordered by `(created_at, id)`.
+    Raises `InvalidCursor` for a cursor that cannot be decoded.
+    """
+    reverse, created_at, pk = decode_cursor(cursor) if cursor else (False, None, None)
+
+    # Walking backwards is walking forwards in the opposite order.
+    ascending = descending == reverse
+    # The redundant bound on created_at alone is what lets the database seek
+    # straight to the cursor in the index instead of filtering every row of
+    # the preceding pages.
+    if ascending:
+        queryset = queryset.order_by('created_at', 'id')
+        after = Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(id__gt=pk))
+    else:
+        queryset = queryset.order_by('-created_at', '-id')
+        after = Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+    if cursor:
+        queryset = queryset.filter(after)
+
+    rows = list(queryset[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if reverse:
+        rows.reverse()
+    if not rows:
+        return CursorPage(rows)
+
+    if reverse:
+        has_next, has_previous = bool(cursor), has_more
+    else:
+        has_next, has_previous = has_more, bool(cursor)
+    return CursorPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1]) if has_next else None,
+        previous_cursor=encode_cursor(rows[0], reverse=True) if has_previous else None
+    )
@@ -0,0 +1,273 @@
+"""
+HTML parser backends for the scraper services.
+
+Every backend reads the response body as an iterable of text chunks and
+yields the raw (href, text) pair of each `<a href>` in document order. The
+page title is available on `parser.title` once the anchors are consumed, and
+the first `<base href>` on `parser.base_href` as soon as it has been seen.
+Backends are picked by name through the SCRAPER_PARSER setting.
+"""
+from collections import deque
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+# Elements BeautifulSoup treats as self-closing; they are never left open.
+VOID_ELEMENTS = frozenset([
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed',
+    'frame', 'hr', 'image', 'img', 'input', 'isindex', 'keygen', 'link',
+    'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer', 'track', 'wbr',
+])
+# Text inside these is not part of the surrounding tag's `.text` in BeautifulSoup.
+STRING_CONTAINERS = frozenset(['rp', 'rt', 'script', 'style', 'template'])
+PRESERVE_WHITESPACE = frozenset(['pre', 'textarea'])
+ASCII_SPACES = ' \n\t\x0c\r'
+
+
+class BeautifulSoupParser:
+    """
+    Builds the full document tree with BeautifulSoup and walks it.
+    """
+    features = 'html.parser'
+
+    def __init__(self):
+        self.title = None
+        self.base_href = None
+
+    def iter_anchors(self, chunks):
+        soup = BeautifulSoup(''.join(chunks), self.features)
+        self.title = soup.title.string if soup.title else None
+        base = soup.find('base', href=True)
+        self.base_href = base['href'] if base else None
+
+        for a in soup.find_all('a', href=True):
+            yield a['href'], a.text
+
+
+class LxmlParser:
+    """
+    Feeds the chunks to libxml2's HTML parser and walks the resulting tree.
+    """
+
+    def __init__(self):
+        self.title = None
+        self.base_href = None
+
+    def iter_anchors(self, chunks):
+        try:
+            from lxml import etree
+        except ImportError:
+            raise ImproperlyConfigured("The 'lxml' parser requires the lxml package")
+
+        html_parser = etree.HTMLParser()
+        for chunk in chunks:
+            html_parser.feed(chunk)
+        root = html_parser.close()
+        if root is None:
+            return
+
+        etree.strip_elements(root, *STRING_CONTAINERS, with_tail=False)
+        title = root.find('.//title')
+        if title is not None and len(title) == 0:
+            self.title = title.text
+        base = root.find('.//base[@href]')
+        if base is not None:
+            self.base_href = base.get('href')
+
+        for a in root.iter('a'):
+            href = a.get('href')
+            if href is not None:
+                yield href, ''.join(a.itertext())
+
+
+class SelectolaxParser:
+    """
+    Parses with the lexbor engine through selectolax, an HTML5-compliant
+    parser written in C.
+    """
+
+    def __init__(self):
+        self.title = None
+        self.base_href = None
+
+    def iter_anchors(self, chunks):
+        try:
+            from selectolax.lexbor import LexborHTMLParser
+        except ImportError:
+            raise ImproperlyConfigured("The 'selectolax' parser requires the selectolax package")
+
+        tree = LexborHTMLParser(''.join(chunks))
+        tree.strip_tags(list(STRING_CONTAINERS))
+        title = tree.css_first('title')
+        if title is not None:
+            self.title = title.text(deep=False) or None
+        base = tree.css_first('base[href]')
+        if base is not None:
+            self.base_href = base.attributes.get('href') or ''
+
+        for a in tree.css('a[href]'):
+            yield a.attributes.get('href') or '', a.text(deep=True)
+
+
+class _AnchorCollector(HTMLParser):
+    """
+    Event consumer that mirrors how BeautifulSoup's html.parser tree builder
+    opens and closes tags, without keeping the tree around.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.base_href = None
+        self.completed = deque()
+        self._tags = []
+        self._anchors = []
+        self._pending = deque()
+        self._data = []
+        self._containers = 0
+        self._preserve = 0
+        self._title_parts = None
+        self._title_done = False
+
+    def handle_starttag(self, tag, attrs):
+        self._end_data()
+        if self._title_parts is not None:
+            self._title_parts.append(None)
+        if tag == 'base' and self.base_href is None:
+            for name, value in attrs:
+                if name == 'href':
+                    self.base_href = value or ''
+        if tag in VOID_ELEMENTS:
+            return
+
+        self._tags.append(tag)
+        if tag in STRING_CONTAINERS:
+            self._containers += 1
+        if tag in PRESERVE_WHITESPACE:
+            self._preserve += 1
+
+        if tag == 'a':
+            href = None
+            for name, value in attrs:
+                if name == 'href':
+                    href = value or ''
+            anchor = [href, [], False]
+            self._anchors.append(anchor)
+            if href is not None:
+                self._pending.append(anchor)
+        elif tag == 'title' and not self._title_done and self._title_parts is None:
+            self._title_parts = []
+
+    def handle_endtag(self, tag):
+        self._end_data()
+        if tag not in self._tags:
+            return
+
+        while self._tags:
+            popped = self._tags.pop()
+            self._close(popped)
+            if popped == tag:
+                break
+        self._flush()
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_comment(self, data):
+        self._end_data()
+
+    def handle_decl(self, decl):
+        self._end_data()
+
+    def handle_pi(self, data):
+        self._end_data()
+
+    def unknown_decl(self, data):
+        self._end_data()
+
+    def close(self):
+        super().close()
+        self._end_data()
+        while self._tags:
+            self._close(self._tags.pop())
+        self._flush()
+
+    def _close(self, tag):
+        if tag in STRING_CONTAINERS:
+            self._containers -= 1
+        if tag in PRESERVE_WHITESPACE:
+            self._preserve -= 1
+        if tag == 'a':
+            self._anchors.pop()[2] = True
+        elif tag == 'title' and self._title_parts is not None and not self._title_done:
+            parts = self._title_parts
+            if len(parts) == 1 and parts[0] is not None:
+                self.title = parts[0]
+            self._title_parts = None
+            self._title_done = True
+
+    def _end_data(self):
+        if not self._data:
+            return
+        data = ''.join(self._data)
+        self._data = []
+
+        if not data.strip(ASCII_SPACES) and not self._preserve:
+            data = '\n' if '\n' in data else ' '
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        if self._containers:
+            return
+        for anchor in self._anchors:
+            anchor[1].append(data)
+
+    def _flush(self):
+        # Anchors are released in the order they were opened, so nested
+        # anchors come out in the same order as a tree walk would give.
+        while self._pending and self._pending[0][2]:
+            href, parts, _ = self._pending.popleft()
+            self.completed.append((href, ''.join(parts)))
+
+
+class StreamingParser:
+    """
+    Incremental backend: feeds the chunks to an `html.parser.HTMLParser` and
+    yields each anchor as soon as it is closed, so no tree is ever built.
+    """
+
+    def __init__(self):
+        self.title = None
+        self.base_href = None
+
+    def iter_anchors(self, chunks):
+        collector = _AnchorCollector()
+        for chunk in chunks:
+            collector.feed(chunk)
+            self.base_href = collector.base_href
+            while collector.completed:
+                yield collector.completed.popleft()
+
+        collector.close()
+        self.title = collector.title
+        self.base_href = collector.base_href
+        while collector.completed:
+            yield collector.completed.popleft()
+
+
+PARSERS = {
+    'html.parser': BeautifulSoupParser,
+    'lxml': LxmlParser,
+    'selectolax': SelectolaxParser,
+    'stream': StreamingParser,
+}
+
+
+def get_parser(name: str = None):
+    name = name or settings.SCRAPER_PARSER
+    try:
+        return PARSERS[name]()
+    except KeyError:
+        raise ImproperlyConfigured(f"Unknown scraper parser: {name}")
@@ -0,0 +1,202 @@
+"""
+Per-host politeness for every fetch, shared by all workers through Redis.
+
+Before fetching a URL, a worker acquires a slot for its host, which takes:
+- a token from the host's bucket. The bucket refills at SCRAPER_HOST_RATE
+  requests per second, or at the robots.txt Crawl-delay when that is slower,
+  and holds up to SCRAPER_HOST_BURST tokens;
+- one of SCRAPER_HOST_CONCURRENCY fetch leases. A lease expires after
+  SCRAPER_HOST_LEASE_TIMEOUT seconds, so a dead worker cannot hold it.
+
+When the bucket is empty the token is still taken, on credit, and `HostBusy`
+tells the caller when its turn comes. The caller reschedules the work
+instead of blocking, so the worker keeps serving other hosts. When it comes
+back it passes `reserved=True` and only needs a lease.
+
+robots.txt files are cached in the shared scraper cache for
+SCRAPER_ROBOTS_TTL seconds. Redis being unavailable disables the limits
+rather than failing the scrapes.
+"""
+import hashlib
+import logging
+import uuid
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import redis
+import requests
+from django.conf import settings
+
+from scraper import cache, client
+from scraper.exceptions import PermanentScrapeError
+
+
+logger = logging.getLogger(__name__)
+
+ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local concurrency = tonumber(ARGV[3])
+local lease_timeout = tonumber(ARGV[4])
+
+if ARGV[6] ~= '1' then
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or burst)
+    local updated = tonumber(redis.call('HGET', KEYS[1], 'updated') or now)
+    tokens = math.min(burst, tokens + (now - updated) * rate) - 1
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 60)
+    if tokens < 0 then
+        return {0, tostring(-tokens / rate)}
+    end
+end
+
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+if redis.call('ZCARD', KEYS[2]) >= concurrency then
+    return {0, tostring(1 / rate)}
+end
+redis.call('ZADD', KEYS[2], now + lease_timeout, ARGV[5])
+redis.call('EXPIRE', KEYS[2], math.ceil(lease_timeout) + 60)
+return {1, '0'}
+"""
+
+
+class HostBusy(Exception):
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Host busy, retry in {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+class RobotsDisallowed(PermanentScrapeError):
+    pass
+
+
+@dataclass
+class Lease:
+    host: str
+    lease_id: str
+
+
+_redis = None
+_acquire_script = None
+
+
+def get_redis():
+    global _redis
+
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.SCRAPER_POLITENESS_REDIS_URL)
+    return _redis
+
+
+def get_acquire_script():
+    global _acquire_script
+
+    if _acquire_script is None:
+        _acquire_script = get_redis().register_script(ACQUIRE_SCRIPT)
+    return _acquire_script
+
+
+def host_key(host: str, kind: str):
+    return f'scraper:host:{host}:{kind}'
+
+
+def fetch_robots(origin: str):
+    """
+    Returns the robots.txt of `origin` and how long to cache it. A missing
+    file allows everything; an unreachable one does too, but is retried
+    sooner.
+    """
+    try:
+        response = client.fetch(f'{origin}/robots.txt')
+        if response.status_code >= 500:
+            response.close()
+            return '', settings.SCRAPER_ROBOTS_ERROR_TTL
+        if response.status_code >= 400:
+            response.close()
+            return '', settings.SCRAPER_ROBOTS_TTL
+        return ''.join(client.iter_text(response)), settings.SCRAPER_ROBOTS_TTL
+    except requests.RequestException:
+        return '', settings.SCRAPER_ROBOTS_ERROR_TTL
+
+
+def get_robots(url: str):
+    parts = urlsplit(url)
+    origin = f'{parts.scheme}://{parts.netloc}'
+    key = 'scraper:robots:' + hashlib.sha256(origin.encode('utf-8')).hexdigest()
+    try:
+        text = cache.get_cache().get(key)
+    except Exception:
+        logger.warning('Scraper cache unavailable', exc_info=True)
+        text = None
+
+    if text is None:
+        text, ttl = fetch_robots(origin)
+        try:
+            cache.get_cache().set(key, text, ttl)
+        except Exception:
+            logger.warning('Scraper cache unavailable', exc_info=True)
+
+    robots = RobotFileParser()
+    robots.parse(text.splitlines())
+    return robots
+
+
+def get_host_rate(robots: RobotFileParser):
+    rate = settings.SCRAPER_HOST_RATE
+    crawl_delay = robots.crawl_delay(settings.SCRAPER_USER_AGENT)
+    if crawl_delay:
+        rate = min(rate, 1 / float(crawl_delay))
+    return rate
+
+
+def acquire(url: str, reserved: bool = False):
+    """
+    Acquires a fetch slot for the host of `url` and returns its `Lease`, or
+    None when politeness is disabled. Raises `RobotsDisallowed` when
+    robots.txt forbids the URL, and `HostBusy` when the caller must wait.
+    """
+    if not settings.SCRAPER_POLITENESS:
+        return None
+
+    rate = settings.SCRAPER_HOST_RATE
+    if settings.SCRAPER_RESPECT_ROBOTS:
+        robots = get_robots(url)
+        if not robots.can_fetch(settings.SCRAPER_USER_AGENT, url):
+            raise RobotsDisallowed(f"robots.txt disallows {url}")
+        rate = get_host_rate(robots)
+
+    host = urlsplit(url).hostname
+    lease = Lease(host=host, lease_id=uuid.uuid4().hex)
+    try:
+        acquired, wait = get_acquire_script()(
+            keys=[host_key(host, 'bucket'), host_key(host, 'leases')],
+            args=[
+                rate,
+                settings.SCRAPER_HOST_BURST,
+                settings.SCRAPER_HOST_CONCURRENCY,
+                settings.SCRAPER_HOST_LEASE_TIMEOUT,
+                lease.lease_id,
+                int(reserved),
+            ]
+        )
+    except redis.RedisError:
+        logger.warning('Host rate limiter unavailable', exc_info=True)
+        return None
+
+    if not int(acquired):
+        raise HostBusy(float(wait))
+    return lease
+
+
+def release(lease: Lease):
+    if lease is None:
+        return
+    try:
+        get_redis().zrem(host_key(lease.host, 'leases'), lease.lease_id)
+    except redis.RedisError:
+        # The lease expires on its own
+        logger.warning('Host rate limiter unavailable', exc_info=True)
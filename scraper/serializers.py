@@ -0,0 +1,55 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from scraper.forms import validate_http_url
+
+
+class PageSerializer(serializers.Serializer):
+    """
+    A row of `services.get_scraped_page_rows`.
+    """
+    id = serializers.UUIDField()
+    url = serializers.CharField()
+    title = serializers.CharField()
+    status = serializers.CharField()
+    link_count = serializers.IntegerField()
+    created_at = serializers.DateTimeField()
+
+
+class PageDetailSerializer(PageSerializer):
+    """
+    A row of `services.get_scraped_page_row`.
+    """
+    failure_reason = serializers.CharField()
+    scrape_interval = serializers.IntegerField(allow_null=True)
+    next_scrape_at = serializers.DateTimeField(allow_null=True)
+
+
+class LinkSerializer(serializers.Serializer):
+    """
+    A row of `services.get_scraped_link_rows`.
+    """
+    id = serializers.UUIDField()
+    url = serializers.CharField()
+    name = serializers.CharField()
+    created_at = serializers.DateTimeField()
+
+
+class SubmitPagesSerializer(serializers.Serializer):
+    """
+    A page submission: a single `url`, or a list of `urls` scraped in bulk.
+    """
+    url = serializers.URLField(max_length=2000, required=False, validators=[validate_http_url])
+    urls = serializers.ListField(
+        child=serializers.URLField(max_length=2000, validators=[validate_http_url]), allow_empty=False, required=False
+    )
+
+    def validate_urls(self, urls):
+        if len(urls) > settings.SCRAPER_BULK_MAX_URLS:
+            raise serializers.ValidationError(f"At most {settings.SCRAPER_BULK_MAX_URLS} URLs can be submitted at once")
+        return urls
+
+    def validate(self, data):
+        if ('url' in data) == ('urls' in data):
+            raise serializers.ValidationError("Submit either a url or a list of urls")
+        return data
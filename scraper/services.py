@@ -1,63 +1,193 @@
+import hashlib
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
 from urllib.parse import urljoin, urlparse
-from django.db.models import Count
+from django.conf import settings
+from django.utils import timezone
 from django.db import transaction
+from django.db.models import F
 from django.core.paginator import Paginator, EmptyPage
 from django.core.exceptions import ValidationError
 
-import requests
-from bs4 import BeautifulSoup
-
-from scraper.models import ScrapedPage, ScrapedLink
-from scraper.tasks import create_scraped_page_task
+from scraper import cache, client, crawl, events, exceptions, metrics, parsers, tracing
+from scraper.canonicalize import get_canonicalizer
+from scraper.pagination import CursorPage, paginate_by_cursor
+from scraper.models import Crawl, FailedScrape, LinkTarget, ScrapedPage, ScrapedLink
+from scraper import tasks as scraper_tasks
 from users import services as users_services
 
 
+@dataclass
+class PageResult:
+    url: str
+    title: str = ''
+    links: list = field(default_factory=list)
+    error: Exception = None
+    etag: str = ''
+    last_modified: str = ''
+    content_hash: str = ''
+    # True when the server answered 304 or the body hash did not change
+    not_modified: bool = False
+
+
 def is_valid_url(url):
     parsed = urlparse(url)
-    return bool(parsed.netloc) and bool(parsed.scheme)
+    return bool(parsed.netloc) and parsed.scheme in ('http', 'https')
+
+
+def iter_links(parser, chunks, page_url: str):
+    """
+    Yields the canonical (url, name) of every followable anchor the parser
+    finds in `chunks`, once per canonical URL; the first anchor text wins.
+    Relative links are resolved against the page's `<base href>` if it has one.
+    """
+    canonicalize = get_canonicalizer()
+    seen = set()
+    base_href = None
+    base_url = page_url
+    for link_url, link_text in parser.iter_anchors(chunks):
+        if parser.base_href != base_href:
+            base_href = parser.base_href
+            base_url = urljoin(page_url, base_href.strip()) if base_href else page_url
+
+        full_url = canonicalize(urljoin(base_url, link_url.strip()))
+        if full_url is None or full_url in seen:
+            continue
+
+        link_name = link_text.strip()
+        if link_name:
+            seen.add(full_url)
+            yield full_url, link_name[:255]
 
 
 def get_scraped_page_title(url: str):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    return soup.title.string if soup.title else 'No title'
+    title, _ = scrape_page(url)
+    return title
+
+
+def iter_page_links(url: str, parser=None):
+    response = client.fetch(url)
+    client.check_response(response)
+    parser = parser or parsers.get_parser()
+    yield from iter_links(parser, client.iter_text(response), url)
 
 
 def scrape_page_links(url):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    links = []
-    for a in soup.find_all('a', href=True):
-        link_url = a['href']
-        full_url = urljoin(url, link_url)
-        
-        if is_valid_url(full_url) and not full_url.startswith('javascript:'):
-            link_name = a.text.strip()
-            if link_name:
-                links.append((full_url, link_name[:255]))
-    
-    return links
+    return list(iter_page_links(url))
+
+
+def hash_chunks(chunks, digest):
+    for chunk in chunks:
+        digest.update(chunk.encode('utf-8'))
+        yield chunk
+
+
+def parse_page(url: str, chunks, result: PageResult):
+    parser = parsers.get_parser()
+    result.links = list(iter_links(parser, chunks, url))
+    result.title = parser.title or 'No title'
+    return result
+
+
+def fetch_page(
+        url: str,
+        etag: str = '',
+        last_modified: str = '',
+        content_hash: str = '',
+        on_parse=None
+):
+    """
+    Fetches and parses `url`. When the validators of a previous fetch are
+    given, the request is conditional and the page is not parsed again if
+    the server answers 304 or the body hashes to `content_hash`. `on_parse`
+    is called once the response is in and parsing starts.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    with metrics.timed('fetch'):
+        response = client.fetch(url, headers=headers or None)
+    result = PageResult(
+        url=url,
+        etag=response.headers.get('ETag', etag),
+        last_modified=response.headers.get('Last-Modified', last_modified),
+        content_hash=content_hash
+    )
+    if response.status_code == 304:
+        response.close()
+        result.not_modified = True
+        return result
+    client.check_response(response)
+
+    digest = hashlib.sha256()
+    timed_chunks = metrics.TimedChunks(client.iter_text(response))
+    chunks = hash_chunks(timed_chunks, digest)
+    started = time.perf_counter()
+    if content_hash:
+        # The body is capped by SCRAPER_MAX_BODY_SIZE, so reading it before
+        # parsing is bounded and lets an unchanged page skip the parse.
+        chunks = list(chunks)
+        if digest.hexdigest() == content_hash:
+            metrics.STAGE_DURATION.labels('download').observe(timed_chunks.elapsed)
+            result.not_modified = True
+            return result
+
+    if on_parse is not None:
+        on_parse()
+    with tracing.span('scrape.parse'):
+        parse_page(url, chunks, result)
+    metrics.observe_download_and_parse(timed_chunks, started)
+    result.content_hash = digest.hexdigest()
+    return result
+
+
+def get_cached_result(url: str):
+    entry = cache.get_cached_page(url)
+    if entry is None:
+        return None
+    return PageResult(url=url, **entry)
+
+
+def fetch_page_cached(
+        url: str,
+        etag: str = '',
+        last_modified: str = '',
+        content_hash: str = '',
+        on_parse=None
+):
+    """
+    Same as `fetch_page`, but first reuses a recent parse of the same
+    normalized URL made for any user. A cached parse identical to the one the
+    caller already has is ignored, so a refresh still asks the server.
+    """
+    result = get_cached_result(url)
+    if result is not None and not (content_hash and result.content_hash == content_hash):
+        return result
+
+    result = fetch_page(url, etag, last_modified, content_hash, on_parse)
+    cache.set_cached_page(result)
+    return result
 
 
 def scrape_page(url):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    title = soup.title.string if soup.title else 'No title'
-    
-    links = []
-    for a in soup.find_all('a', href=True):
-        link_url = a['href']
-        full_url = urljoin(url, link_url)
-        
-        if is_valid_url(full_url) and not full_url.startswith('javascript:'):
-            link_name = a.text.strip()
-            if link_name:
-                links.append((full_url, link_name[:255]))
-    
-    return title, links
+    result = fetch_page(url)
+    return result.title, result.links
+
+
+# Columns stored in scraper_page_user_listing_idx, so that a listing
+# restricted to them never reads the table
+PAGE_LISTING_FIELDS = ('id', 'user_id', 'created_at', 'url', 'title', 'status', 'link_count')
+PAGE_HEADER_FIELDS = ('id', 'user_id', 'url', 'title', 'status', 'link_count', 'failure_reason')
+PAGE_DETAIL_FIELDS = PAGE_LISTING_FIELDS + ('failure_reason', 'scrape_interval', 'next_scrape_at')
+LINK_LISTING_FIELDS = ('id', 'created_at', 'page_id', 'name', 'target__url')
+# Columns the scrape task reads and writes
+PAGE_SCRAPE_FIELDS = (
+    'id', 'user_id', 'url', 'title', 'link_count', 'etag', 'last_modified', 'content_hash', 'scrape_interval'
+)
 
 
 def get_scraped_pages_by_user_id(
@@ -66,9 +196,7 @@ def get_scraped_pages_by_user_id(
         items_per_page: int = 5
 ):
     try:
-        scraped_pages = ScrapedPage.objects.filter(user_id=user_id).annotate(
-            total_links=Count('links')
-        ).order_by('-created_at')
+        scraped_pages = ScrapedPage.objects.filter(user_id=user_id).order_by('-created_at')
         paginator = Paginator(scraped_pages, items_per_page)
         return paginator.get_page(page_number)
     except ScrapedPage.DoesNotExist:
@@ -89,12 +217,73 @@ def get_scraped_page_by_id(page_id: int):
         return None
 
 
-def get_scraped_links_and_page_by_page_id(page_id: int, page_number: int, items_per_page: int = 5):
-    page = get_scraped_page_by_id(page_id)
+def get_scraped_page_progress(page_id, user_id: int = None):
+    pages = ScrapedPage.objects.filter(id=page_id)
+    if user_id is not None:
+        pages = pages.filter(user_id=user_id)
+    return pages.values('link_count', 'status').first()
+
+
+def get_scraped_page_header(page_id, user_id: int = None):
+    """
+    Returns the page with only the columns its detail header shows, or None.
+    """
+    pages = ScrapedPage.objects.filter(id=page_id)
+    if user_id is not None:
+        pages = pages.filter(user_id=user_id)
+    return pages.only(*PAGE_HEADER_FIELDS).first()
+
+
+def get_page_links(page: ScrapedPage):
+    return ScrapedLink.objects.filter(page_id=page.id).select_related('target').only(*LINK_LISTING_FIELDS)
+
+
+def get_export_links(user_id: int, page_id=None):
+    """
+    Returns the links of one of the user's pages, or of all their pages, as
+    dicts of the scraper.export.COLUMNS, in the order of
+    scraper_link_page_cursor_idx.
+    """
+    links = ScrapedLink.objects.filter(page__user_id=user_id)
+    if page_id is not None:
+        links = links.filter(page_id=page_id)
+    # Not values_list(), whose aiterator() runs the query inside the event loop
+    return links.order_by('page_id', 'created_at', 'id').values(
+        'name', 'created_at', page_url=F('page__url'), url=F('target__url')
+    )
+
+
+def scraped_page_exists(page_id, user_id: int):
+    return ScrapedPage.objects.filter(id=page_id, user_id=user_id).exists()
+
+
+async def ascraped_page_exists(page_id, user_id: int):
+    return await ScrapedPage.objects.filter(id=page_id, user_id=user_id).aexists()
+
+
+def get_scraped_page_rows(user_id: int):
+    return ScrapedPage.objects.filter(user_id=user_id).values(*PAGE_LISTING_FIELDS)
+
+
+def get_scraped_page_row(page_id, user_id: int):
+    return ScrapedPage.objects.filter(id=page_id, user_id=user_id).values(*PAGE_DETAIL_FIELDS).first()
+
+
+def get_scraped_link_rows(page_id):
+    return ScrapedLink.objects.filter(page_id=page_id).values('id', 'created_at', 'name', url=F('target__url'))
+
+
+def get_scraped_links_and_page_by_page_id(
+        page_id,
+        page_number: int,
+        items_per_page: int = 5,
+        user_id: int = None
+):
+    page = get_scraped_page_header(page_id, user_id)
     if page is None:
         return Paginator([], items_per_page).page(1), None
     
-    links = page.links.all()
+    links = get_page_links(page)
     paginator = Paginator(links, items_per_page)
     
     try:
@@ -105,6 +294,298 @@ def get_scraped_links_and_page_by_page_id(page_id: int, page_number: int, items_
     return paginated_links, page
 
 
+def get_scraped_pages_by_cursor(
+        user_id: int,
+        cursor: str = None,
+        items_per_page: int = 5,
+        fields=None
+):
+    scraped_pages = ScrapedPage.objects.filter(user_id=user_id)
+    if fields is not None:
+        scraped_pages = scraped_pages.only(*fields)
+    return paginate_by_cursor(scraped_pages, cursor, items_per_page, descending=True)
+
+
+def get_scraped_links_and_page_by_cursor(
+        page_id,
+        cursor: str = None,
+        items_per_page: int = 5,
+        user_id: int = None
+):
+    page = get_scraped_page_header(page_id, user_id)
+    if page is None:
+        return CursorPage([]), None
+
+    return paginate_by_cursor(get_page_links(page), cursor, items_per_page), page
+
+
+def get_scraped_page_for_scrape(page_id):
+    return ScrapedPage.objects.filter(id=page_id).only(*PAGE_SCRAPE_FIELDS).first()
+
+
+def get_link_target_ids(urls, batch_size: int = None):
+    """
+    Maps each URL to the id of its `LinkTarget`, creating the missing ones.
+    """
+    batch_size = batch_size or settings.SCRAPER_LINK_BATCH_SIZE
+    hashes = {url: LinkTarget.hash_url(url) for url in urls}
+    LinkTarget.objects.bulk_create(
+        [LinkTarget(url_hash=url_hash, url=url) for url, url_hash in hashes.items()],
+        batch_size=batch_size,
+        ignore_conflicts=True
+    )
+
+    all_hashes = list(hashes.values())
+    target_ids = {}
+    for i in range(0, len(all_hashes), batch_size):
+        target_ids.update(
+            LinkTarget.objects.filter(url_hash__in=all_hashes[i:i + batch_size]).values_list('url_hash', 'id')
+        )
+    return {url: target_ids[url_hash] for url, url_hash in hashes.items()}
+
+
+def prune_link_targets():
+    return LinkTarget.objects.filter(page_links__isnull=True).delete()[0]
+
+
+@transaction.atomic
+def save_scraped_links(page: ScrapedPage, links, on_existing: str = 'skip', batch_size: int = None):
+    """
+    Stores the (url, name) pairs of `page` with batched INSERTs in a single
+    transaction. Links the page already has are kept and not duplicated when
+    `on_existing` is 'skip', or brought in line with `links` when it is 'replace'.
+    """
+    created, _, _ = insert_scraped_links(page, links, on_existing, batch_size)
+    ScrapedPage.objects.filter(id=page.id).update(link_count=page.link_count)
+    return created
+
+
+def insert_scraped_links(page: ScrapedPage, links, on_existing: str = 'skip', batch_size: int = None):
+    """
+    Writes the links of `save_scraped_links` and sets `page.link_count`
+    without saving it, for callers that update the page row themselves.
+    Returns how many links were inserted, renamed and deleted. Must run in a
+    transaction.
+
+    With 'replace', only the difference is written: the links the page no
+    longer has are deleted, the new ones inserted, those whose anchor text
+    changed renamed and the others left alone.
+    """
+    if on_existing not in ('skip', 'replace'):
+        raise ValueError(f"Invalid on_existing value: {on_existing}")
+
+    # Two scrapes of the page writing at once would both insert the links
+    # missing from what they read. Locking the page row makes the second one
+    # wait for the first to commit and read its links.
+    ScrapedPage.objects.select_for_update().only('id').get(pk=page.pk)
+
+    batch_size = batch_size or settings.SCRAPER_LINK_BATCH_SIZE
+    links = list(links)
+    target_ids = get_link_target_ids({link_url for link_url, _ in links}, batch_size)
+    existing = ScrapedLink.objects.filter(page_id=page.id).values_list('id', 'target_id', 'name')
+    new_links, renamed, stale, page.link_count = diff_scraped_links(
+        page.id, existing, links, target_ids, replace=on_existing == 'replace'
+    )
+    write_scraped_link_changes(new_links, renamed, stale, batch_size)
+    return len(new_links), len(renamed), len(stale)
+
+
+def diff_scraped_links(page_id, existing, links, target_ids, replace: bool = True):
+    """
+    Compares the (id, target_id, name) rows of a page with the (url, name)
+    pairs scraped from it. Returns the `ScrapedLink`s to insert, the
+    (id, name) of the rows to rename, the ids of the rows to delete and how
+    many links the page has afterwards. Without `replace` the existing rows
+    are all kept as they are.
+    """
+    wanted = {(target_ids[link_url], link_name) for link_url, link_name in links}
+    kept = set()
+    unmatched = {}
+    for link_id, target_id, link_name in existing:
+        if not replace or ((target_id, link_name) in wanted and (target_id, link_name) not in kept):
+            kept.add((target_id, link_name))
+        else:
+            unmatched.setdefault(target_id, []).append(link_id)
+
+    new_links = []
+    renamed = []
+    for link_url, link_name in links:
+        pair = (target_ids[link_url], link_name)
+        if pair in kept:
+            continue
+        kept.add(pair)
+        # A link to the same target whose anchor text changed is renamed
+        # rather than deleted and inserted again
+        if unmatched.get(pair[0]):
+            renamed.append((unmatched[pair[0]].pop(), link_name))
+        else:
+            new_links.append(ScrapedLink(page_id=page_id, target_id=pair[0], name=link_name))
+
+    stale = [link_id for link_ids in unmatched.values() for link_id in link_ids]
+    return new_links, renamed, stale, len(kept)
+
+
+def write_scraped_link_changes(new_links, renamed, stale, batch_size: int = None):
+    batch_size = batch_size or settings.SCRAPER_LINK_BATCH_SIZE
+    for i in range(0, len(stale), batch_size):
+        ScrapedLink.objects.filter(id__in=stale[i:i + batch_size]).delete()
+    now = timezone.now()
+    ScrapedLink.objects.bulk_update(
+        [ScrapedLink(id=link_id, name=link_name, updated_at=now) for link_id, link_name in renamed],
+        ['name', 'updated_at'],
+        batch_size=batch_size
+    )
+    ScrapedLink.objects.bulk_create(new_links, batch_size=batch_size)
+
+
+def set_scraped_page_status(page: ScrapedPage, status: str, **fields):
+    """
+    Moves `page` to `status` with a single UPDATE, stamping the timing fields,
+    and pushes the change to the user's progress stream once committed.
+    """
+    now = timezone.now()
+    fields['status'] = status
+    if status == ScrapedPage.Status.FETCHING:
+        fields.update(started_at=now, finished_at=None, failure_reason='')
+    elif status in (ScrapedPage.Status.DONE, ScrapedPage.Status.FAILED):
+        fields['finished_at'] = now
+
+    ScrapedPage.objects.filter(id=page.id).update(**fields)
+    for name, value in fields.items():
+        setattr(page, name, value)
+
+    event = {'status': status}
+    if status == ScrapedPage.Status.DONE:
+        event.update(title=page.title, link_count=page.link_count)
+    elif status == ScrapedPage.Status.FAILED:
+        event['failure_reason'] = page.failure_reason
+    transaction.on_commit(lambda: events.publish_page_event(page.user_id, page.id, **event))
+
+
+@transaction.atomic
+def save_page_result(page: ScrapedPage, result: PageResult, on_existing: str = 'replace'):
+    created, renamed, deleted = insert_scraped_links(page, result.links, on_existing=on_existing)
+    set_scraped_page_status(
+        page,
+        ScrapedPage.Status.DONE,
+        updated_at=timezone.now(),
+        link_count=page.link_count,
+        title=result.title[:255],
+        etag=result.etag,
+        last_modified=result.last_modified,
+        content_hash=result.content_hash,
+        **get_schedule_fields(page, links_changed=bool(created or renamed or deleted))
+    )
+
+
+def get_next_scrape_interval(interval: int, links_changed: bool = None):
+    """
+    Tightens the re-scrape interval of a page whose links changed and backs
+    off on one whose links did not, by SCRAPER_RESCRAPE_BACKOFF, within
+    SCRAPER_RESCRAPE_MIN_INTERVAL and SCRAPER_RESCRAPE_MAX_INTERVAL.
+    """
+    if links_changed is True:
+        interval /= settings.SCRAPER_RESCRAPE_BACKOFF
+    elif links_changed is False:
+        interval *= settings.SCRAPER_RESCRAPE_BACKOFF
+    return round(min(max(interval, settings.SCRAPER_RESCRAPE_MIN_INTERVAL), settings.SCRAPER_RESCRAPE_MAX_INTERVAL))
+
+
+def get_schedule_fields(page: ScrapedPage, links_changed: bool = None):
+    """
+    Returns the fields scheduling the next scrape of a monitored page after
+    one that did (or did not, or, for None, failed to tell whether its)
+    links changed. Empty for pages that are not monitored.
+    """
+    if not page.scrape_interval:
+        return {}
+    interval = get_next_scrape_interval(page.scrape_interval, links_changed)
+    return {'scrape_interval': interval, 'next_scrape_at': timezone.now() + timedelta(seconds=interval)}
+
+
+def set_scrape_interval(page_id, user_id: int, interval: int = None):
+    """
+    Monitors the page, scraping it every `interval` seconds from now on
+    (adapted as it goes), or stops monitoring it when `interval` is None.
+    Returns False when the user has no such page.
+    """
+    next_scrape_at = timezone.now() + timedelta(seconds=interval) if interval else None
+    return ScrapedPage.objects.filter(id=page_id, user_id=user_id).update(
+        scrape_interval=interval or None,
+        next_scrape_at=next_scrape_at
+    ) > 0
+
+
+def queue_due_rescrapes(limit: int = None):
+    """
+    Queues the scrapes of the monitored pages that are due, the most overdue
+    first, and returns how many were queued. Until its scrape reschedules
+    it, a queued page is due again SCRAPER_RESCRAPE_CLAIM_TIMEOUT seconds
+    later, so a page whose task is lost is not dropped.
+    """
+    limit = limit or settings.SCRAPER_RESCRAPE_BATCH_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        # SKIP LOCKED lets overlapping runs queue disjoint pages.
+        page_ids = list(
+            ScrapedPage.objects.select_for_update(skip_locked=True)
+            .filter(next_scrape_at__lte=now)
+            .order_by('next_scrape_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        ScrapedPage.objects.filter(id__in=page_ids).update(
+            next_scrape_at=now + timedelta(seconds=settings.SCRAPER_RESCRAPE_CLAIM_TIMEOUT)
+        )
+
+    for page_id in page_ids:
+        scraper_tasks.create_scraped_page_task.delay(str(page_id))
+    return len(page_ids)
+
+
+def get_failure_kind(error: Exception):
+    if isinstance(error, exceptions.TransientScrapeError):
+        return FailedScrape.Kind.TRANSIENT
+    return FailedScrape.Kind.PERMANENT
+
+
+@transaction.atomic
+def fail_scraped_page(page: ScrapedPage, error: Exception, attempts: int = 1):
+    """
+    Marks `page` as failed and records it in the dead-letter store.
+    """
+    set_scraped_page_status(
+        page, ScrapedPage.Status.FAILED, failure_reason=str(error)[:255], **get_schedule_fields(page)
+    )
+    FailedScrape.objects.update_or_create(
+        page_id=page.id,
+        defaults={'kind': get_failure_kind(error), 'error': str(error), 'attempts': attempts}
+    )
+
+
+def redrive_failed_scrapes(kind: str = None, limit: int = None):
+    """
+    Queues the dead-lettered pages for another scrape, oldest failures first,
+    and removes their entries. Entries of pages that have been scraped since
+    are removed without a new scrape. Returns how many pages were queued.
+    """
+    FailedScrape.objects.exclude(page__status=ScrapedPage.Status.FAILED).delete()
+
+    failures = FailedScrape.objects.order_by('created_at')
+    if kind is not None:
+        failures = failures.filter(kind=kind)
+    page_ids = list(failures.values_list('page_id', flat=True)[:limit])
+
+    batch_size = settings.SCRAPER_LINK_BATCH_SIZE
+    for i in range(0, len(page_ids), batch_size):
+        batch_ids = page_ids[i:i + batch_size]
+        with transaction.atomic():
+            FailedScrape.objects.filter(page_id__in=batch_ids).delete()
+            ScrapedPage.objects.filter(id__in=batch_ids).update(status=ScrapedPage.Status.PENDING, finished_at=None)
+        for page_id in batch_ids:
+            scraper_tasks.create_scraped_page_task.delay(str(page_id))
+    return len(page_ids)
+
+
 @transaction.atomic
 def create_scraped_page_LEGACY(url: str, user_id: int):
     try:
@@ -114,8 +595,7 @@ def create_scraped_page_LEGACY(url: str, user_id: int):
             raise ValidationError("Invalid user ID")
 
         page = ScrapedPage.objects.create(url=url, title=title, user=user)
-        for link_url, link_name in links:
-            ScrapedLink.objects.create(page=page, url=link_url, name=link_name)
+        save_scraped_links(page, links)
     except Exception as e:
         raise e
 
@@ -124,11 +604,177 @@ def create_scraped_page(url: str, user_id: int):
     if not is_valid_url(url):
         raise ValidationError("Invalid URL")
     
-    title = get_scraped_page_title(url)
     try:
-        ScrapedPage.objects.create(url=url, title=title, user_id=user_id)
+        # Re-adding a known URL refreshes it with a conditional request
+        page, _ = ScrapedPage.objects.get_or_create(url=url, user_id=user_id, defaults={'title': ''})
 
     except Exception as e:
         raise e
     
-    create_scraped_page_task.delay(url, user_id)
+    scraper_tasks.create_scraped_page_task.delay(str(page.id))
+    return page
+
+
+def refresh_scraped_page(page_id, user_id: int):
+    if not ScrapedPage.objects.filter(id=page_id, user_id=user_id).exists():
+        return False
+
+    scraper_tasks.create_scraped_page_task.delay(str(page_id))
+    return True
+
+
+def delete_scraped_page(page_id, user_id: int):
+    deleted, _ = ScrapedPage.objects.filter(id=page_id, user_id=user_id).delete()
+    return deleted > 0
+
+
+def create_scraped_pages(urls, user_id: int):
+    urls = list(dict.fromkeys(url for url in urls if is_valid_url(url)))
+    if not urls:
+        raise ValidationError("No valid URLs")
+
+    existing = set(
+        ScrapedPage.objects.filter(user_id=user_id, url__in=urls).values_list('url', flat=True)
+    )
+    new_urls = [url for url in urls if url not in existing]
+    ScrapedPage.objects.bulk_create(
+        [ScrapedPage(url=url, title='', user_id=user_id) for url in new_urls],
+        batch_size=settings.SCRAPER_LINK_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+    task_size = settings.SCRAPER_BULK_TASK_SIZE
+    for i in range(0, len(new_urls), task_size):
+        scraper_tasks.scrape_pages_batch_task.delay(new_urls[i:i + task_size], user_id)
+
+    return len(new_urls)
+
+
+def start_crawl(seed_url: str, user_id: int, max_depth: int, max_pages: int, scope: str = Crawl.Scope.HOST):
+    seed_url = get_canonicalizer()(seed_url) if is_valid_url(seed_url) else None
+    if seed_url is None:
+        raise ValidationError("Invalid URL")
+
+    new_crawl = Crawl.objects.create(
+        user_id=user_id,
+        seed_url=seed_url,
+        scope=scope,
+        max_depth=max_depth,
+        max_pages=max_pages
+    )
+    crawl.enqueue_urls(new_crawl, [seed_url], 0)
+    crawl.schedule_steps(new_crawl.id)
+    return new_crawl
+
+
+def get_crawl_by_id_and_user_id(crawl_id, user_id: int):
+    return Crawl.objects.filter(id=crawl_id, user_id=user_id).first()
+
+
+def resume_crawl(crawl_id, timeout: int = None):
+    """
+    Restarts a running crawl whose step chains were lost, e.g. after its
+    workers were restarted. URLs claimed more than `timeout` seconds ago
+    are queued again, and the chains are only started again when no step
+    ran for as long.
+    """
+    requeued = crawl.requeue_stale_urls(crawl_id, timeout)
+    crawl.reset_lost_steps(crawl_id, timeout)
+    crawl.schedule_steps(crawl_id)
+    return requeued
+
+
+def mark_scraped_pages_fetching(user_id: int, urls):
+    now = timezone.now()
+    return ScrapedPage.objects.filter(user_id=user_id, url__in=urls).update(
+        status=ScrapedPage.Status.FETCHING,
+        started_at=now,
+        finished_at=None,
+        failure_reason=''
+    )
+
+
+@transaction.atomic
+def save_scraped_pages(user_id: int, results):
+    """
+    Persists a batch of `PageResult`s: one UPDATE for the page fields and
+    batched writes of the links that changed, diffed against what each page
+    already has as in `insert_scraped_links`. Re-running a batch is
+    idempotent. Returns how many links were inserted.
+    """
+    # The rows are locked, in a fixed order, until the links of their pages
+    # are written, so that concurrent scrapes of a page do not both insert them
+    pages = {
+        page.url: page
+        for page in ScrapedPage.objects.select_for_update().filter(
+            user_id=user_id, url__in=[result.url for result in results]
+        ).order_by('id')
+    }
+    target_ids = get_link_target_ids({
+        link_url
+        for result in results if result.url in pages and result.error is None
+        for link_url, _ in result.links
+    })
+
+    done_ids = [pages[result.url].id for result in results if result.url in pages and result.error is None]
+    existing = {}
+    for page_id, link_id, target_id, link_name in ScrapedLink.objects.filter(page_id__in=done_ids).values_list(
+        'page_id', 'id', 'target_id', 'name'
+    ):
+        existing.setdefault(page_id, []).append((link_id, target_id, link_name))
+
+    now = timezone.now()
+    new_links, renamed, stale = [], [], []
+    failures = []
+    for result in results:
+        page = pages.get(result.url)
+        if page is None:
+            continue
+        page.finished_at = now
+        if result.error is not None:
+            page.status = ScrapedPage.Status.FAILED
+            error = exceptions.classify(result.error)
+            page.failure_reason = str(error)[:255]
+            failures.append(FailedScrape(page=page, kind=get_failure_kind(error), error=str(error)))
+            continue
+
+        page_new, page_renamed, page_stale, page.link_count = diff_scraped_links(
+            page.id, existing.get(page.id, ()), result.links, target_ids
+        )
+        new_links.extend(page_new)
+        renamed.extend(page_renamed)
+        stale.extend(page_stale)
+        page.status = ScrapedPage.Status.DONE
+        page.updated_at = now
+        page.title = result.title[:255]
+        page.etag = result.etag
+        page.last_modified = result.last_modified
+        page.content_hash = result.content_hash
+
+    ScrapedPage.objects.bulk_update(
+        pages.values(),
+        [
+            'status', 'failure_reason', 'link_count', 'title', 'etag', 'last_modified', 'content_hash',
+            'finished_at', 'updated_at'
+        ],
+        batch_size=settings.SCRAPER_LINK_BATCH_SIZE)
+    write_scraped_link_changes(new_links, renamed, stale)
+    # Batches are not retried; transient failures wait for a redrive
+    FailedScrape.objects.bulk_create(
+        failures,
+        batch_size=settings.SCRAPER_LINK_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['page'],
+        update_fields=['kind', 'error', 'attempts', 'updated_at']
+    )
+
+    def publish_events():
+        for page in pages.values():
+            event = {'status': page.status}
+            if page.status == ScrapedPage.Status.DONE:
+                event.update(title=page.title, link_count=page.link_count)
+            else:
+                event['failure_reason'] = page.failure_reason
+            events.publish_page_event(user_id, page.id, **event)
+    transaction.on_commit(publish_events)
+    return len(new_links)
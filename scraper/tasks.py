@@ -1,23 +1,97 @@
-from django.db import transaction
-from django.core.exceptions import ValidationError
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
 
 from celery import shared_task
+from celery.utils.time import get_exponential_backoff_interval
 
-from scraper.models import ScrapedLink
+from scraper import batch, crawl, exceptions, metrics, politeness
+from scraper.models import Crawl, ScrapedPage
 from scraper import services as scraper_services
-from users import services as users_services
 
 
-@shared_task
-def create_scraped_page_task(url: str, user_id: int):
+@shared_task(bind=True, max_retries=settings.SCRAPER_TASK_MAX_RETRIES)
+def create_scraped_page_task(self, page_id, on_existing: str = 'replace', reserved: bool = False):
+    page = scraper_services.get_scraped_page_for_scrape(page_id)
+    if page is None:
+        # Deleted since it was queued
+        return
+
+    lease = None
     try:
-        links = scraper_services.scrape_page_links(url)
-        user = users_services.get_user_by_id(user_id)
-        if not user:
-            raise ValidationError("Invalid user ID")
-
-        page = scraper_services.get_scraped_page_by_url_and_user_id(url, user_id)
-        for link_url, link_name in links:
-            ScrapedLink.objects.create(page=page, url=link_url, name=link_name)
+        lease = politeness.acquire(page.url, reserved)
+        scraper_services.set_scraped_page_status(page, ScrapedPage.Status.FETCHING)
+        result = scraper_services.fetch_page_cached(
+            page.url,
+            page.etag,
+            page.last_modified,
+            page.content_hash,
+            on_parse=lambda: scraper_services.set_scraped_page_status(page, ScrapedPage.Status.PARSING)
+        )
+        metrics.observe_result(result)
+        if result.not_modified:
+            scraper_services.set_scraped_page_status(
+                page, ScrapedPage.Status.DONE, **scraper_services.get_schedule_fields(page, links_changed=False)
+            )
+            return
+
+        with metrics.timed('persist'):
+            scraper_services.save_page_result(page, result, on_existing=on_existing)
+    except politeness.HostBusy as e:
+        metrics.SCRAPE_OUTCOMES.labels('throttled').inc()
+        # Come back when the host's turn is due, leaving the worker to other
+        # hosts. Sent as a new message that keeps the current retry count, so
+        # waiting for a host does not use up the retries of failed fetches.
+        self.apply_async(
+            args=(page_id,),
+            kwargs={'on_existing': on_existing, 'reserved': True},
+            countdown=e.retry_after,
+            retries=self.request.retries
+        )
     except Exception as e:
-        raise e
+        error = exceptions.classify(e)
+        if isinstance(error, exceptions.TransientScrapeError) and self.request.retries < self.max_retries:
+            metrics.SCRAPE_OUTCOMES.labels('retried').inc()
+            scraper_services.set_scraped_page_status(page, ScrapedPage.Status.PENDING)
+            # The retry takes a new host slot like any other fetch
+            raise self.retry(
+                exc=error,
+                args=(page_id,),
+                kwargs={'on_existing': on_existing},
+                countdown=get_exponential_backoff_interval(
+                    factor=settings.SCRAPER_TASK_RETRY_BACKOFF,
+                    retries=self.request.retries,
+                    maximum=settings.SCRAPER_TASK_RETRY_BACKOFF_MAX,
+                    full_jitter=True
+                )
+            )
+        metrics.SCRAPE_OUTCOMES.labels('failed').inc()
+        scraper_services.fail_scraped_page(page, error, attempts=self.request.retries + 1)
+        raise error
+    finally:
+        politeness.release(lease)
+
+
+@shared_task
+def rescrape_due_pages_task():
+    return scraper_services.queue_due_rescrapes()
+
+
+@shared_task
+def scrape_pages_batch_task(urls: list, user_id: int):
+    scraper_services.mark_scraped_pages_fetching(user_id, urls)
+    results = batch.scrape_pages_cached(urls)
+    with metrics.timed('persist'):
+        return scraper_services.save_scraped_pages(user_id, results)
+
+
+@shared_task
+def crawl_step_task(crawl_id):
+    Crawl.objects.filter(id=crawl_id).update(last_step_at=timezone.now())
+    try:
+        crawl.run_step(crawl_id)
+    finally:
+        Crawl.objects.filter(id=crawl_id).update(active_steps=F('active_steps') - 1, last_step_at=timezone.now())
+        # Even after a failed step, or the crawl would be left running with
+        # no step to finish it
+        crawl.schedule_steps(crawl_id)
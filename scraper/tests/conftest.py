@@ -0,0 +1,38 @@
+import pytest
+from unittest.mock import patch
+
+from django.core.cache import caches
+
+
+@pytest.fixture(autouse=True)
+def scraper_cache(settings):
+    """
+    Keeps the shared fetch cache in process memory and empty for every test.
+    """
+    settings.CACHES = {
+        **settings.CACHES,
+        settings.SCRAPER_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'scraper-tests',
+        },
+    }
+    cache = caches[settings.SCRAPER_CACHE_ALIAS]
+    cache.clear()
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def events_redis():
+    """
+    Captures progress events instead of publishing them to Redis.
+    """
+    with patch('scraper.events.get_redis') as mock_redis:
+        yield mock_redis.return_value
+
+
+@pytest.fixture(autouse=True)
+def no_politeness(settings):
+    """
+    Fetches without the shared per-host limits, which need Redis.
+    """
+    settings.SCRAPER_POLITENESS = False
@@ -0,0 +1,186 @@
+"""
+Query-plan regression tests for the scraper schema.
+
+A synthetic dataset large enough for the planner to prefer indexes is seeded
+once per module, then each service function is run, its queries are counted
+and their EXPLAIN plans are checked for the expected index scans. The plans
+are PostgreSQL's, so the module is skipped on other databases.
+"""
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from users.models import User
+from scraper import services as scraper_services
+from scraper.models import ScrapedPage
+from scraper.pagination import encode_cursor
+
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != 'postgresql', reason='Query plans are checked on PostgreSQL only'),
+]
+
+USERS = 20
+PAGES_PER_USER = 1000
+LINKS_PER_PAGE = 20
+BIG_PAGE_LINKS = 50000
+
+SEED_PAGES_SQL = """
+    INSERT INTO scraper_scrapedpage (
+        id, created_at, updated_at, user_id, url, title, status, failure_reason, link_count, etag, last_modified,
+        content_hash
+    )
+    SELECT gen_random_uuid(), now() - make_interval(secs => i), now(), u.id,
+           'https://example.com/' || u.id || '/' || i, 'Page ' || i, 'done', '', %(links)s, '', '', ''
+    FROM unnest(%(user_ids)s::int[]) AS u(id), generate_series(1, %(pages)s) AS i
+"""
+
+SEED_TARGETS_SQL = """
+    INSERT INTO scraper_linktarget (url_hash, url, created_at)
+    SELECT encode(sha256(convert_to(url, 'UTF8')), 'hex'), url, now()
+    FROM (SELECT 'https://target.com/' || i AS url FROM generate_series(1, %(targets)s) AS i) AS targets
+"""
+
+SEED_LINKS_SQL = """
+    INSERT INTO scraper_scrapedlink (id, created_at, updated_at, page_id, target_id, name)
+    SELECT gen_random_uuid(), now() - make_interval(secs => t.id), now(), p.id, t.id, 'Link ' || t.id
+    FROM scraper_scrapedpage AS p
+    CROSS JOIN (SELECT id FROM scraper_linktarget ORDER BY id LIMIT %(links)s) AS t
+    WHERE p.user_id = %(user_id)s
+"""
+
+
+@pytest.fixture(scope='module')
+def dataset(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        users = [User.objects.create_user(username=f'plan-user-{i}') for i in range(USERS)]
+        big_user = User.objects.create_user(username='plan-user-big')
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_PAGES_SQL, {
+                'user_ids': [user.id for user in users], 'pages': PAGES_PER_USER, 'links': LINKS_PER_PAGE
+            })
+            cursor.execute(SEED_PAGES_SQL, {'user_ids': [big_user.id], 'pages': 1, 'links': BIG_PAGE_LINKS})
+            cursor.execute(SEED_TARGETS_SQL, {'targets': BIG_PAGE_LINKS})
+            cursor.execute(SEED_LINKS_SQL, {'user_id': users[0].id, 'links': LINKS_PER_PAGE})
+            cursor.execute(SEED_LINKS_SQL, {'user_id': big_user.id, 'links': BIG_PAGE_LINKS})
+            # Outside a transaction, so the visibility map allows index-only scans
+            cursor.execute('VACUUM ANALYZE scraper_scrapedpage, scraper_scrapedlink, scraper_linktarget')
+
+        yield {'user': users[0], 'big_page': ScrapedPage.objects.get(user=big_user)}
+
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE scraper_scrapedlink, scraper_linktarget, scraper_scrapedpage CASCADE')
+        User.objects.filter(username__startswith='plan-user-').delete()
+
+
+def capture(func, *args, **kwargs):
+    with CaptureQueriesContext(connection) as context:
+        result = func(*args, **kwargs)
+    return result, [query['sql'] for query in context.captured_queries]
+
+
+def explain(sql: str):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    nodes = [plan[0]['Plan']]
+    for node in nodes:
+        nodes.extend(node.get('Plans', []))
+    return nodes
+
+
+def scans(nodes, table: str):
+    return [node for node in nodes if node.get('Relation Name') == table]
+
+
+def index_names(nodes):
+    return {node['Index Name'] for node in nodes if 'Index Name' in node}
+
+
+def assert_no_seq_scans(queries):
+    for sql in queries:
+        if sql.startswith('SELECT'):
+            assert not [node for node in explain(sql) if node['Node Type'] == 'Seq Scan'], sql
+
+
+def test_deep_page_listing_is_index_only(dataset):
+    user = dataset['user']
+    deep = ScrapedPage.objects.filter(user=user).order_by('-created_at', '-id')[PAGES_PER_USER - 100]
+
+    pages, queries = capture(
+        scraper_services.get_scraped_pages_by_cursor,
+        user.id,
+        encode_cursor(deep),
+        50,
+        fields=scraper_services.PAGE_LISTING_FIELDS
+    )
+
+    assert len(pages) == 50
+    assert len(queries) == 1
+    [scan] = scans(explain(queries[0]), 'scraper_scrapedpage')
+    assert scan['Node Type'] == 'Index Only Scan'
+    assert scan['Index Name'] == 'scraper_page_user_listing_idx'
+    assert 'created_at' in scan['Index Cond']
+
+
+def test_deep_link_page_seeks_cursor_index(dataset):
+    big_page = dataset['big_page']
+    deep = big_page.links.order_by('created_at', 'id')[BIG_PAGE_LINKS - 100]
+
+    (links, page), queries = capture(
+        scraper_services.get_scraped_links_and_page_by_cursor, big_page.id, encode_cursor(deep), 50
+    )
+
+    assert page == big_page
+    assert len(links) == 50
+    assert len(queries) == 2
+    [scan] = scans(explain(queries[1]), 'scraper_scrapedlink')
+    assert scan['Node Type'] in ('Index Scan', 'Index Only Scan')
+    assert scan['Index Name'] == 'scraper_link_page_cursor_idx'
+    assert 'created_at' in scan['Index Cond']
+    assert_no_seq_scans(queries)
+
+
+def test_offset_listing(dataset):
+    # The page of a Paginator only runs its query once it is read
+    pages, queries = capture(lambda: list(scraper_services.get_scraped_pages_by_user_id(dataset['user'].id, 3)))
+
+    assert len(pages) == 5
+    assert len(queries) == 2
+    assert_no_seq_scans(queries)
+
+
+def test_page_lookups_use_indexes(dataset):
+    page = ScrapedPage.objects.filter(user=dataset['user']).first()
+
+    found, queries = capture(scraper_services.get_scraped_page_by_url_and_user_id, page.url, page.user_id)
+    _, id_queries = capture(scraper_services.get_scraped_page_by_id, page.id)
+
+    assert found == page
+    assert len(queries) == len(id_queries) == 1
+    assert_no_seq_scans(queries + id_queries)
+
+
+def test_link_target_lookup_uses_hash_index(dataset):
+    urls = [f'https://target.com/{i}' for i in range(1, 101)]
+
+    target_ids, queries = capture(scraper_services.get_link_target_ids, urls)
+
+    assert len(target_ids) == 100
+    assert len(queries) == 2
+    assert_no_seq_scans(queries)
+
+
+def test_existing_links_lookup_uses_page_index(dataset):
+    page = ScrapedPage.objects.filter(user=dataset['user']).first()
+
+    _, queries = capture(lambda: set(page.links.values_list('target_id', 'name')))
+
+    assert len(queries) == 1
+    assert 'scraper_link_page_cursor_idx' in index_names(explain(queries[0]))
@@ -1,16 +1,84 @@
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
 import pytest
-from unittest.mock import patch
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from urllib.robotparser import RobotFileParser
+from unittest.mock import ANY, AsyncMock, MagicMock, call, patch
 
-from django.db import IntegrityError
-from django.core.exceptions import ValidationError
+import httpx
+import redis
+import requests
+from asgiref.sync import async_to_sync
+from celery.exceptions import Retry
+from prometheus_client import REGISTRY
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from django.core.cache import caches
+from django.db import IntegrityError, OperationalError, connection
+from django.utils import timezone
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import CaptureQueriesContext
 
 from users.models import User
-from scraper.models import ScrapedPage, ScrapedLink
+from scraper.models import Crawl, CrawlURL, FailedScrape, LinkTarget, ScrapedPage, ScrapedLink
 from scraper.services import (
+    PageResult,
+    fetch_page,
+    fetch_page_cached,
     get_scraped_pages_by_user_id,
     create_scraped_page,
-    get_scraped_links_and_page_by_page_id
+    create_scraped_pages,
+    get_scraped_links_and_page_by_page_id,
+    get_scraped_links_and_page_by_cursor,
+    get_scraped_pages_by_cursor,
+    get_scraped_page_progress,
+    iter_links,
+    prune_link_targets,
+    queue_due_rescrapes,
+    redrive_failed_scrapes,
+    refresh_scraped_page,
+    resume_crawl,
+    save_scraped_links,
+    save_scraped_pages,
+    set_scrape_interval,
+    start_crawl
 )
+from scraper.tasks import crawl_step_task, create_scraped_page_task, scrape_pages_batch_task
+from scraper import api, batch, cache, client, events, exceptions, export, metrics, parsers, politeness, tracing
+from scraper import crawl as crawl_module
+from scraper.canonicalize import Canonicalizer, get_canonicalizer, normalize_url
+from scraper.exceptions import PermanentScrapeError, TransientScrapeError
+from scraper.forms import BulkURLForm
+from scraper.pagination import InvalidCursor
+
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def create_link(page, url, name):
+    target, _ = LinkTarget.objects.get_or_create(url_hash=LinkTarget.hash_url(url), defaults={'url': url})
+    return ScrapedLink.objects.create(page=page, target=target, name=name)
+
+
+def make_response(html, encoding='utf-8', status_code=200):
+    response = requests.Response()
+    response.status_code = status_code
+    response.encoding = encoding
+    response._content = html.encode(encoding)
+    response._content_consumed = True
+    return response
 
 
 @pytest.mark.django_db
@@ -27,17 +95,16 @@ class TestGetScrapedPagesByUserId:
             for i in range(3)
         ]
         for i, page in enumerate(pages):
-            for j in range(i+1):
-                ScrapedLink.objects.create(page=page, url=f'https://link{j}.com', name=f'Link {j}')
+            save_scraped_links(page, [(f'https://link{j}.com/', f'Link {j}') for j in range(i+1)])
         return pages
 
     def test_get_scraped_pages_by_user_id_with_pages(self, user, scraped_pages):
         result = get_scraped_pages_by_user_id(user.id, page_number=1, items_per_page=10)
         assert result.number == 1
         assert result.paginator.count == 3
-        assert result.object_list[0].total_links == 3
-        assert result.object_list[1].total_links == 2
-        assert result.object_list[2].total_links == 1
+        assert result.object_list[0].link_count == 3
+        assert result.object_list[1].link_count == 2
+        assert result.object_list[2].link_count == 1
 
     def test_get_scraped_pages_by_user_id_no_pages(self):
         non_existent_user_id = 9999
@@ -71,23 +138,34 @@ class TestCreateScrapedPage:
         return User.objects.create_user(username='testuser', password='12345')
 
     @pytest.mark.django_db
-    @patch('scraper.services.get_scraped_page_title')
+    @patch('scraper.client.get_session')
     @patch('scraper.services.is_valid_url')
     @patch('scraper.tasks.create_scraped_page_task.delay')
-    def test_create_scraped_page_success(self, mock_task, mock_is_valid_url, mock_get_title, user):
+    def test_create_scraped_page_success(self, mock_task, mock_is_valid_url, mock_session, user):
         url = "https://test.com"
         mock_is_valid_url.return_value = True
-        mock_get_title.return_value = "Test Title"
 
         create_scraped_page(url, user.id)
 
         assert ScrapedPage.objects.count() == 1
         created_page = ScrapedPage.objects.first()
         assert created_page.url == url
-        assert created_page.title == "Test Title"
+        assert created_page.title == ""
         assert created_page.user_id == user.id
 
-        mock_task.assert_called_once_with(url, user.id)
+        mock_session.assert_not_called()
+        mock_task.assert_called_once_with(str(created_page.id))
+
+    @pytest.mark.django_db
+    @patch('scraper.tasks.create_scraped_page_task.delay')
+    def test_readding_url_refreshes_page(self, mock_task, user):
+        url = "https://test.com"
+
+        create_scraped_page(url, user.id)
+        create_scraped_page(url, user.id)
+
+        assert ScrapedPage.objects.count() == 1
+        assert mock_task.call_count == 2
 
     @pytest.mark.django_db
     @patch('scraper.services.is_valid_url')
@@ -99,6 +177,775 @@ class TestCreateScrapedPage:
             create_scraped_page(url, user.id)
 
 
+@pytest.mark.django_db
+class TestCreateScrapedPageTask:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='testuser', password='12345')
+
+    @pytest.fixture
+    def scraped_page(self, user):
+        return ScrapedPage.objects.create(user=user, url='https://test.com', title='')
+
+    @patch('scraper.client.get_session')
+    def test_fetches_once_for_title_and_links(self, mock_session, user, scraped_page):
+        mock_get = mock_session.return_value.get
+        mock_get.return_value = make_response(
+            '<html><head><title>Test Title</title></head><body>'
+            '<a href="/about">About</a><a href="https://other.com">Other</a>'
+            '</body></html>'
+        )
+
+        create_scraped_page_task(scraped_page.id)
+
+        mock_get.assert_called_once()
+        assert mock_get.call_args.args == (scraped_page.url,)
+        scraped_page.refresh_from_db()
+        assert scraped_page.title == 'Test Title'
+        assert list(scraped_page.links.values_list('target__url', 'name')) == [
+            ('https://test.com/about', 'About'),
+            ('https://other.com/', 'Other'),
+        ]
+
+    @patch('scraper.client.get_session')
+    def test_refresh_skips_unchanged_page(self, mock_session, user, scraped_page):
+        mock_get = mock_session.return_value.get
+        mock_get.return_value = make_response('<title>T</title><a href="/a">A</a>')
+        create_scraped_page_task(scraped_page.id)
+        updated_at = ScrapedPage.objects.get(id=scraped_page.id).updated_at
+
+        mock_get.return_value = make_response('', status_code=304)
+        create_scraped_page_task(scraped_page.id)
+
+        scraped_page.refresh_from_db()
+        assert scraped_page.updated_at == updated_at
+        assert scraped_page.links.count() == 1
+
+    @patch('scraper.client.get_session')
+    def test_refresh_replaces_links_of_changed_page(self, mock_session, user, scraped_page):
+        mock_get = mock_session.return_value.get
+        mock_get.return_value = make_response('<title>T</title><a href="/a">A</a>')
+        create_scraped_page_task(scraped_page.id)
+
+        mock_get.return_value = make_response('<title>T</title><a href="/b">B</a>')
+        create_scraped_page_task(scraped_page.id)
+
+        scraped_page.refresh_from_db()
+        assert list(scraped_page.links.values_list('target__url', flat=True)) == ['https://test.com/b']
+
+    @patch('scraper.events.publish_page_event')
+    @patch('scraper.client.get_session')
+    def test_publishes_progress_events(
+            self, mock_session, mock_publish, user, scraped_page, django_capture_on_commit_callbacks
+    ):
+        mock_session.return_value.get.return_value = make_response('<title>T</title><a href="/a">A</a>')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            create_scraped_page_task(scraped_page.id)
+
+        assert mock_publish.call_args_list == [
+            call(user.id, scraped_page.id, status='fetching'),
+            call(user.id, scraped_page.id, status='parsing'),
+            call(user.id, scraped_page.id, status='done', title='T', link_count=1),
+        ]
+
+    @patch('scraper.client.get_session')
+    def test_tracks_status_and_link_count(self, mock_session, user, scraped_page):
+        mock_session.return_value.get.return_value = make_response(
+            '<title>T</title><a href="/a">A</a><a href="/b">B</a>'
+        )
+
+        create_scraped_page_task(scraped_page.id)
+
+        scraped_page.refresh_from_db()
+        assert scraped_page.status == ScrapedPage.Status.DONE
+        assert scraped_page.link_count == 2
+        assert scraped_page.started_at <= scraped_page.finished_at
+
+    @patch('scraper.client.get_session')
+    def test_marks_page_failed_on_error(self, mock_session, user, scraped_page):
+        mock_session.return_value.get.return_value = make_response('Not found', status_code=404)
+
+        with pytest.raises(PermanentScrapeError):
+            create_scraped_page_task(scraped_page.id)
+
+        scraped_page.refresh_from_db()
+        assert scraped_page.status == ScrapedPage.Status.FAILED
+        assert scraped_page.finished_at is not None
+        assert scraped_page.link_count == 0
+
+    @patch('scraper.client.get_session')
+    def test_records_failure_reason(self, mock_session, user, scraped_page):
+        response = make_response('')
+        response.headers['Content-Type'] = 'video/mp4'
+        mock_session.return_value.get.return_value = response
+
+        with pytest.raises(PermanentScrapeError):
+            create_scraped_page_task(scraped_page.id)
+
+        scraped_page.refresh_from_db()
+        assert scraped_page.failure_reason == 'UnsupportedContentType: Unsupported content type video/mp4'
+
+        mock_session.return_value.get.return_value = make_response('<title>T</title>')
+        create_scraped_page_task(scraped_page.id)
+
+        scraped_page.refresh_from_db()
+        assert scraped_page.failure_reason == ''
+
+    @patch('scraper.client.get_session')
+    def test_page_without_title(self, mock_session, user, scraped_page):
+        mock_session.return_value.get.return_value = make_response('<html><body><a href="/a">A</a></body></html>')
+
+        create_scraped_page_task(scraped_page.id)
+
+        scraped_page.refresh_from_db()
+        assert scraped_page.title == 'No title'
+
+
+class TestParsers:
+
+    @pytest.fixture(params=sorted(FIXTURES_DIR.glob('*.html')), ids=lambda path: path.name)
+    def html(self, request):
+        return request.param.read_text()
+
+    @staticmethod
+    def parse(name, html, chunk_size):
+        parser = parsers.get_parser(name)
+        chunks = [html[i:i + chunk_size] for i in range(0, len(html), chunk_size)]
+        anchors = list(parser.iter_anchors(chunks))
+        return parser.title, anchors
+
+    @pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+    def test_streaming_matches_beautifulsoup(self, html, chunk_size):
+        expected = self.parse('html.parser', html, len(html))
+        assert expected[1]
+        assert self.parse('stream', html, chunk_size) == expected
+
+    def test_streaming_yields_anchors_as_they_close(self):
+        parser = parsers.get_parser('stream')
+        chunks = iter(['<a href="/a">A</a>', '<a href="/b">B', '</a>'])
+        anchors = parser.iter_anchors(chunks)
+
+        assert next(anchors) == ('/a', 'A')
+        assert list(chunks) == ['<a href="/b">B', '</a>']
+
+    @pytest.mark.parametrize('name, module', [('lxml', 'lxml'), ('selectolax', 'selectolax')])
+    def test_native_backends_extract_same_links(self, name, module):
+        pytest.importorskip(module)
+        html = (FIXTURES_DIR / 'simple.html').read_text()
+
+        assert self.parse(name, html, len(html)) == self.parse('html.parser', html, len(html))
+
+    def test_unknown_parser(self):
+        with pytest.raises(ImproperlyConfigured):
+            parsers.get_parser('regex')
+
+
+class TestClient:
+
+    def test_session_is_shared(self):
+        assert client.get_session() is client.get_session()
+
+    def test_session_pools_connections_per_host(self, settings):
+        settings.SCRAPER_HTTP_POOL_MAXSIZE = 3
+        adapter = client.build_session().get_adapter('https://example.com')
+
+        assert adapter._pool_maxsize == 3
+        assert adapter._pool_block
+
+    @patch('scraper.client.get_session')
+    def test_fetch_uses_timeouts_and_streams(self, mock_session, settings):
+        settings.SCRAPER_HTTP_CONNECT_TIMEOUT = 2
+        settings.SCRAPER_HTTP_READ_TIMEOUT = 7
+        mock_session.return_value.get.return_value = make_response('<html></html>')
+
+        client.fetch('https://example.com')
+
+        mock_session.return_value.get.assert_called_once_with(
+            'https://example.com', headers=None, stream=True, timeout=(2, 7)
+        )
+
+    @patch('scraper.client.get_session')
+    def test_fetch_rejects_large_content_length(self, mock_session, settings):
+        settings.SCRAPER_MAX_BODY_SIZE = 10
+        response = make_response('<html></html>')
+        response.headers['Content-Length'] = '11'
+        mock_session.return_value.get.return_value = response
+
+        with pytest.raises(client.ResponseTooLarge):
+            client.fetch('https://example.com')
+
+    def test_iter_text_stops_past_max_body_size(self, settings):
+        settings.SCRAPER_MAX_BODY_SIZE = 10
+        chunks = client.iter_text(make_response('x' * 25), chunk_size=4)
+
+        assert next(chunks) == 'xxxx'
+        assert next(chunks) == 'xxxx'
+        with pytest.raises(client.ResponseTooLarge):
+            next(chunks)
+
+    def test_iter_text_stops_past_total_timeout(self, settings):
+        settings.SCRAPER_HTTP_TOTAL_TIMEOUT = 10
+        response = make_response('x' * 25)
+        response.deadline = time.monotonic() - 1
+
+        with pytest.raises(client.ResponseTimeout):
+            list(client.iter_text(response, chunk_size=4))
+
+    @patch('scraper.client.get_session')
+    def test_total_timeout_includes_redirects(self, mock_session, settings):
+        settings.SCRAPER_HTTP_TOTAL_TIMEOUT = 0.1
+
+        def get(*args, **kwargs):
+            time.sleep(0.2)
+            return make_response('x' * 25)
+        mock_session.return_value.get.side_effect = get
+        response = client.fetch('https://example.com')
+
+        with pytest.raises(client.ResponseTimeout):
+            list(client.iter_text(response, chunk_size=4))
+
+    def test_iter_text_aborts_slow_reads(self, settings):
+        settings.SCRAPER_HTTP_TOTAL_TIMEOUT = 0.2
+
+        class SlowDrip:
+            """
+            A body whose second read blocks until the socket is shut down.
+            """
+            def __init__(self):
+                self.unblocked = threading.Event()
+                self.reads = 0
+
+            def read(self, amt=None):
+                self.reads += 1
+                if self.reads > 1:
+                    self.unblocked.wait(10)
+                    return b''
+                return b'<a href'
+
+            def shutdown(self):
+                self.unblocked.set()
+
+        response = requests.Response()
+        response.status_code = 200
+        response.encoding = 'utf-8'
+        response.raw = SlowDrip()
+        started = time.monotonic()
+
+        with pytest.raises(client.ResponseTimeout):
+            list(client.iter_text(response, chunk_size=4))
+        assert time.monotonic() - started < 1
+
+    def test_iter_text_falls_back_to_utf8_for_unknown_charsets(self):
+        response = make_response('<a>é</a>')
+        response.encoding = 'x-bogus'
+
+        assert ''.join(client.iter_text(response)) == '<a>é</a>'
+
+    def test_session_limits_redirects(self, settings):
+        settings.SCRAPER_HTTP_MAX_REDIRECTS = 3
+
+        assert client.build_session().max_redirects == 3
+
+
+class TestFetchPage:
+
+    HTML = '<title>T</title><a href="/a">A</a>'
+
+    @patch('scraper.client.get_session')
+    def test_records_validators(self, mock_session):
+        response = make_response(self.HTML)
+        response.headers.update({'ETag': '"v1"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        mock_session.return_value.get.return_value = response
+
+        result = fetch_page('https://test.com')
+
+        assert not result.not_modified
+        assert (result.etag, result.last_modified) == ('"v1"', 'Wed, 21 Oct 2015 07:28:00 GMT')
+        assert len(result.content_hash) == 64
+        assert result.links == [('https://test.com/a', 'A')]
+
+    @patch('scraper.client.get_session')
+    def test_not_modified_response(self, mock_session):
+        mock_session.return_value.get.return_value = make_response('', status_code=304)
+
+        result = fetch_page('https://test.com', etag='"v1"', last_modified='yesterday', content_hash='abc')
+
+        headers = mock_session.return_value.get.call_args.kwargs['headers']
+        assert headers == {'If-None-Match': '"v1"', 'If-Modified-Since': 'yesterday'}
+        assert result.not_modified
+        assert result.content_hash == 'abc'
+
+    @patch('scraper.services.parsers.get_parser')
+    @patch('scraper.client.get_session')
+    def test_unchanged_body_is_not_parsed(self, mock_session, mock_get_parser):
+        mock_session.return_value.get.return_value = make_response(self.HTML)
+        content_hash = hashlib.sha256(self.HTML.encode()).hexdigest()
+
+        result = fetch_page('https://test.com', content_hash=content_hash)
+
+        assert result.not_modified
+        mock_get_parser.assert_not_called()
+
+    @pytest.mark.parametrize('content_type', ['video/mp4', 'application/json; charset=utf-8'])
+    @patch('scraper.client.get_session')
+    def test_rejects_unsupported_content_types(self, mock_session, content_type):
+        response = make_response(self.HTML)
+        response.headers['Content-Type'] = content_type
+        mock_session.return_value.get.return_value = response
+
+        with pytest.raises(client.UnsupportedContentType):
+            fetch_page('https://test.com')
+
+    @patch('scraper.client.get_session')
+    def test_accepts_xhtml(self, mock_session):
+        response = make_response(self.HTML)
+        response.headers['Content-Type'] = 'application/xhtml+xml; charset=utf-8'
+        mock_session.return_value.get.return_value = response
+
+        assert fetch_page('https://test.com').title == 'T'
+
+
+class TestCanonicalizer:
+
+    @pytest.fixture
+    def canonicalize(self):
+        return Canonicalizer()
+
+    @pytest.mark.parametrize('url, expected', [
+        ('https://Example.com/a', 'https://example.com/a'),
+        ('https://example.com/a#top', 'https://example.com/a'),
+        ('https://example.com/a?utm_source=x&UTM_medium=y&fbclid=z', 'https://example.com/a'),
+        ('https://example.com/a?b=2&a=1&utm_campaign=c', 'https://example.com/a?a=1&b=2'),
+        ('https://example.com:443', 'https://example.com/'),
+        ('http://example.com:80/a', 'http://example.com/a'),
+        ('http://example.com:8080/a', 'http://example.com:8080/a'),
+        ('  https://example.com/spaced  ', 'https://example.com/spaced'),
+        ('mailto:hello@example.com', None),
+        ('tel:+123456', None),
+        ('javascript:void(0)', None),
+        ('ftp://example.com/file', None),
+        ('https:///no-host', None),
+        ('http://[::1', None),
+        ('http://[::1]:8080/a', 'http://[::1]:8080/a'),
+        ('http://[2001:DB8::1]/a', 'http://[2001:db8::1]/a'),
+        ('https://example.com/a?a=%E9', 'https://example.com/a?a=%E9'),
+        ('https://example.com/a?foo', 'https://example.com/a?foo'),
+        ('https://example.com/a?q=a%20b&p=a+b', 'https://example.com/a?p=a+b&q=a%20b'),
+        ('https://example.com/a?next=/b/c', 'https://example.com/a?next=/b/c'),
+        ('https://example.com/a?b=1&&a=2&utm%5Fsource=x', 'https://example.com/a?a=2&b=1'),
+        ('https://example.com/a?a=2&a=1&a', 'https://example.com/a?a&a=1&a=2'),
+    ])
+    def test_canonicalize(self, canonicalize, url, expected):
+        assert canonicalize(url) == expected
+
+    def test_configurable(self):
+        canonicalize = Canonicalizer(drop_fragment=False, sort_query=False, tracking_params=('ref',))
+
+        assert canonicalize('https://example.com/?utm_x=1&ref=a&b=1#top') == 'https://example.com/?utm_x=1&b=1#top'
+
+    def test_links_are_deduplicated_per_page(self):
+        html = (
+            '<a href="https://Example.com/a">First</a>'
+            '<a href="/a#top">Second</a>'
+            '<a href="/a?utm_source=x">Third</a>'
+            '<a href="mailto:a@example.com">Mail</a>'
+            '<a href="/b">B</a>'
+        )
+        links = list(iter_links(parsers.get_parser('stream'), [html], 'https://example.com/'))
+
+        assert links == [('https://example.com/a', 'First'), ('https://example.com/b', 'B')]
+
+    @pytest.mark.parametrize('name', ['html.parser', 'stream'])
+    def test_base_href(self, name):
+        html = '<head><base href="https://cdn.example.com/assets/"></head><a href="img/x.png">X</a>'
+        links = list(iter_links(parsers.get_parser(name), [html], 'https://example.com/page'))
+
+        assert links == [('https://cdn.example.com/assets/img/x.png', 'X')]
+
+    def test_setting_changes_apply(self, settings):
+        settings.SCRAPER_CANONICALIZE = {'drop_fragment': False}
+
+        assert get_canonicalizer()('https://example.com/#top') == 'https://example.com/#top'
+
+
+class TestSharedCache:
+
+    @pytest.mark.parametrize('url, expected', [
+        ('HTTPS://Example.COM', 'https://example.com/'),
+        ('https://example.com:443/a?b=1#top', 'https://example.com/a?b=1'),
+        ('http://example.com:8080/a', 'http://example.com:8080/a'),
+    ])
+    def test_normalize_url(self, url, expected):
+        assert normalize_url(url) == expected
+
+    @patch('scraper.client.get_session')
+    def test_reuses_parse_for_equivalent_urls(self, mock_session):
+        mock_session.return_value.get.return_value = make_response('<title>T</title><a href="/a">A</a>')
+
+        first = fetch_page_cached('https://example.com/page')
+        second = fetch_page_cached('https://EXAMPLE.com/page#section')
+
+        mock_session.return_value.get.assert_called_once()
+        assert (second.title, second.links) == (first.title, first.links)
+        assert cache.get_cache_stats() == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+    @patch('scraper.client.get_session')
+    def test_refresh_of_cached_copy_asks_the_server(self, mock_session):
+        mock_session.return_value.get.return_value = make_response('<title>T</title>')
+        content_hash = fetch_page_cached('https://example.com').content_hash
+
+        mock_session.return_value.get.return_value = make_response('<title>T</title>')
+        assert fetch_page_cached('https://example.com', content_hash=content_hash).not_modified
+        assert mock_session.return_value.get.call_count == 2
+
+    def test_large_pages_are_not_cached(self, settings):
+        settings.SCRAPER_CACHE_MAX_LINKS = 1
+        result = PageResult(url='https://example.com', links=[('https://a.com', 'A'), ('https://b.com', 'B')])
+
+        assert not cache.set_cached_page(result)
+        assert cache.get_cached_page('https://example.com') is None
+
+    def test_cache_errors_count_as_miss(self):
+        with patch('scraper.cache.get_cache', side_effect=ConnectionError):
+            assert cache.get_cached_page('https://example.com') is None
+
+
+class TestEvents:
+
+    @patch('scraper.events.get_redis')
+    def test_publish_page_event(self, mock_redis):
+        events.publish_page_event(7, 'abc', status='done', link_count=3)
+
+        mock_redis.return_value.publish.assert_called_once_with(
+            'scraper:events:user:7', json.dumps({'page_id': 'abc', 'status': 'done', 'link_count': 3})
+        )
+
+    @patch('scraper.events.get_redis')
+    def test_publish_errors_are_ignored(self, mock_redis):
+        mock_redis.return_value.publish.side_effect = redis.ConnectionError
+
+        events.publish_page_event(7, 'abc', status='done')
+
+    def test_iter_user_events(self, settings):
+        settings.SCRAPER_EVENTS_HEARTBEAT = 1
+        pubsub = MagicMock()
+        pubsub.subscribe = AsyncMock()
+        pubsub.unsubscribe = AsyncMock()
+        pubsub.aclose = AsyncMock()
+        pubsub.get_message = AsyncMock(side_effect=[None, {'data': b'{"page_id": "abc"}'}])
+        redis_client = MagicMock(aclose=AsyncMock())
+        redis_client.pubsub.return_value = pubsub
+
+        async def collect():
+            stream = events.iter_user_events(7, redis_client)
+            messages = [await stream.__anext__() for _ in range(3)]
+            await stream.aclose()
+            return messages
+
+        assert asyncio.run(collect()) == [': connected\n\n', ': heartbeat\n\n', 'data: {"page_id": "abc"}\n\n']
+        pubsub.subscribe.assert_awaited_once_with('scraper:events:user:7')
+        pubsub.aclose.assert_awaited_once()
+
+    def test_events_require_login(self, client):
+        response = client.get('/events/')
+
+        assert response.status_code == 401
+
+
+@pytest.mark.django_db
+class TestSaveScrapedLinks:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='testuser', password='12345')
+
+    @pytest.fixture
+    def scraped_page(self, user):
+        return ScrapedPage.objects.create(user=user, url='https://testpage.com', title='Test Page')
+
+    @pytest.fixture
+    def links(self):
+        return [(f'https://link{i}.com', f'Link {i}') for i in range(10)]
+
+    def test_inserts_in_batches(self, scraped_page, links, django_assert_num_queries):
+        # SAVEPOINT, page lock, 3 target INSERTs + 3 target id SELECTs, SELECT existing links,
+        # 3 link INSERTs, RELEASE SAVEPOINT
+        with django_assert_num_queries(14):
+            created = save_scraped_links(scraped_page, links, batch_size=4)
+
+        assert created == 10
+        assert scraped_page.links.count() == 10
+
+    def test_skip_existing_is_idempotent(self, scraped_page, links):
+        save_scraped_links(scraped_page, links[:5])
+        created = save_scraped_links(scraped_page, links)
+
+        assert created == 5
+        assert scraped_page.links.count() == 10
+
+    def test_replace_existing(self, scraped_page, links):
+        save_scraped_links(scraped_page, links)
+        created = save_scraped_links(scraped_page, links[:3], on_existing='replace')
+
+        assert created == 0
+        assert sorted(scraped_page.links.values_list('target__url', flat=True)) == [url for url, _ in links[:3]]
+
+    def test_replace_writes_only_the_difference(self, scraped_page, links, django_assert_num_queries):
+        save_scraped_links(scraped_page, links[:6])
+        kept = set(scraped_page.links.filter(name__in=['Link 2', 'Link 3']).values_list('id', flat=True))
+
+        # SAVEPOINT, page lock, target INSERT + SELECT, SELECT existing links, DELETE, INSERT, page UPDATE,
+        # RELEASE SAVEPOINT
+        with django_assert_num_queries(9):
+            created = save_scraped_links(scraped_page, links[2:8], on_existing='replace')
+
+        assert created == 2
+        assert kept <= set(scraped_page.links.values_list('id', flat=True))
+        assert sorted(scraped_page.links.values_list('name', flat=True)) == [f'Link {i}' for i in range(2, 8)]
+        scraped_page.refresh_from_db()
+        assert scraped_page.link_count == 6
+
+    def test_replace_renames_links_whose_text_changed(self, scraped_page, links):
+        save_scraped_links(scraped_page, links[:3])
+        renamed = scraped_page.links.get(name='Link 1').id
+
+        created = save_scraped_links(
+            scraped_page, [links[0], (links[1][0], 'Renamed'), links[2]], on_existing='replace'
+        )
+
+        assert created == 0
+        assert scraped_page.links.get(id=renamed).name == 'Renamed'
+        assert scraped_page.links.count() == 3
+
+    def test_link_targets_are_shared_between_pages(self, user, scraped_page, links):
+        other_page = ScrapedPage.objects.create(user=user, url='https://other.com', title='Other')
+
+        save_scraped_links(scraped_page, links)
+        save_scraped_links(other_page, links[:4] + [(links[0][0], 'Same target, other name')])
+
+        assert LinkTarget.objects.count() == 10
+        assert other_page.links.count() == 5
+        assert list(other_page.links.select_related('target')[:1])[0].url == links[0][0]
+
+    def test_prune_link_targets(self, scraped_page, links):
+        save_scraped_links(scraped_page, links)
+        save_scraped_links(scraped_page, links[:2], on_existing='replace')
+
+        assert prune_link_targets() == 8
+        assert LinkTarget.objects.count() == 2
+
+    @pytest.mark.skipif(not connection.features.has_select_for_update, reason="No row locks on this database")
+    def test_page_is_locked_while_diffing(self, scraped_page, links):
+        with CaptureQueriesContext(connection) as queries:
+            save_scraped_links(scraped_page, links, on_existing='replace')
+
+        assert 'FOR UPDATE' in queries[1]['sql']
+
+    def test_invalid_on_existing(self, scraped_page, links):
+        with pytest.raises(ValueError):
+            save_scraped_links(scraped_page, links, on_existing='merge')
+
+
+@pytest.mark.django_db
+class TestCreateScrapedPages:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='testuser', password='12345')
+
+    @patch('scraper.tasks.scrape_pages_batch_task.delay')
+    def test_creates_pages_and_enqueues_batches(self, mock_task, user, settings):
+        settings.SCRAPER_BULK_TASK_SIZE = 2
+        ScrapedPage.objects.create(user=user, url='https://a.com', title='A')
+        urls = ['https://a.com', 'https://b.com', 'https://c.com', 'https://b.com', 'https://d.com', 'not a url']
+
+        created = create_scraped_pages(urls, user.id)
+
+        assert created == 3
+        assert ScrapedPage.objects.filter(user=user).count() == 4
+        assert mock_task.call_args_list == [
+            call(['https://b.com', 'https://c.com'], user.id),
+            call(['https://d.com'], user.id),
+        ]
+
+    def test_no_valid_urls(self, user):
+        with pytest.raises(ValidationError, match="No valid URLs"):
+            create_scraped_pages(['nope'], user.id)
+
+    def test_save_scraped_pages(self, user):
+        pages = [ScrapedPage.objects.create(user=user, url=f'https://example{i}.com', title='') for i in range(2)]
+        create_link(page=pages[0], url='https://stale.com', name='Stale')
+        results = [
+            PageResult(url=pages[0].url, title='Zero', links=[('https://x.com', 'X'), ('https://y.com', 'Y')]),
+            PageResult(url=pages[1].url, error=requests.ConnectionError()),
+        ]
+
+        assert save_scraped_pages(user.id, results) == 2
+
+        pages[0].refresh_from_db()
+        pages[1].refresh_from_db()
+        assert pages[0].title == 'Zero'
+        assert (pages[0].status, pages[0].link_count) == (ScrapedPage.Status.DONE, 2)
+        assert sorted(pages[0].links.values_list('target__url', flat=True)) == ['https://x.com', 'https://y.com']
+        assert pages[1].status == ScrapedPage.Status.FAILED
+        assert not pages[1].links.exists()
+
+    def test_save_scraped_pages_writes_only_the_difference(self, user, django_assert_num_queries):
+        page = ScrapedPage.objects.create(user=user, url='https://example.com', title='')
+        links = [(f'https://link{i}.com', f'Link {i}') for i in range(4)]
+        save_scraped_pages(user.id, [PageResult(url=page.url, title='Page', links=links)])
+        ids = dict(page.links.values_list('name', 'id'))
+        links = [links[0], (links[1][0], 'Renamed'), links[2], ('https://new.com', 'New')]
+
+        # SAVEPOINT, page lock, target INSERT + SELECT, SELECT existing links, page UPDATE,
+        # link DELETE, link UPDATE, link INSERT, RELEASE SAVEPOINT
+        with django_assert_num_queries(10):
+            created = save_scraped_pages(user.id, [PageResult(url=page.url, title='Page', links=links)])
+
+        assert created == 1
+        assert dict(page.links.values_list('name', 'id')) == {
+            'Link 0': ids['Link 0'], 'Renamed': ids['Link 1'], 'Link 2': ids['Link 2'], 'New': ANY
+        }
+        page.refresh_from_db()
+        assert page.link_count == 4
+
+
+class TestBulkURLForm:
+
+    def test_collects_urls_from_text_and_file(self):
+        upload = SimpleUploadedFile('urls.txt', b'https://b.com\n\nhttps://c.com\n')
+        form = BulkURLForm({'urls': 'https://a.com\n  '}, {'file': upload})
+
+        assert form.is_valid()
+        assert form.cleaned_data['url_list'] == ['https://a.com', 'https://b.com', 'https://c.com']
+
+    def test_rejects_invalid_urls(self):
+        form = BulkURLForm({'urls': 'https://a.com\nnot-a-url'})
+
+        assert not form.is_valid()
+        assert 'not-a-url' in form.errors['__all__'][0]
+
+    def test_reports_rejected_lines(self):
+        form = BulkURLForm({'urls': 'ftp://a.com/x\n\nhttps://b.com\nmailto:c@d.com'})
+
+        assert not form.is_valid()
+        assert form.errors['__all__'] == ['Not http(s) URLs: line 1: ftp://a.com/x, line 4: mailto:c@d.com']
+
+    def test_limits_number_of_urls(self, settings):
+        settings.SCRAPER_BULK_MAX_URLS = 2
+        form = BulkURLForm({'urls': 'https://a.com\nhttps://b.com\nhttps://c.com'})
+
+        assert not form.is_valid()
+
+
+@pytest.mark.django_db
+class TestNonWebURLs:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='testuser', password='12345')
+
+    @pytest.mark.parametrize('path, data', [
+        ('/add/', {'url': 'ftp://example.com/x'}),
+        ('/add/bulk/', {'urls': 'ftp://example.com/x\nftp://example.com/y'}),
+        ('/crawl/', {'url': 'ftp://example.com/x', 'max_depth': 1, 'max_pages': 10, 'scope': 'host'}),
+    ])
+    @patch('scraper.tasks.scrape_pages_batch_task.delay')
+    @patch('scraper.tasks.create_scraped_page_task.delay')
+    def test_rejected_with_400(self, mock_task, mock_batch_task, client, user, path, data):
+        client.force_login(user)
+
+        response = client.post(path, data)
+
+        assert response.status_code == 400
+        assert response.json()['status'] == 'error'
+        assert not ScrapedPage.objects.exists()
+        assert not Crawl.objects.exists()
+
+    def test_bulk_json_of_non_web_urls(self, client, user):
+        client.force_login(user)
+
+        response = client.post('/add/bulk/', {'urls': ['ftp://example.com/x']}, content_type='application/json')
+
+        assert response.status_code == 400
+        assert 'line 1: ftp://example.com/x' in response.json()['errors']['__all__'][0]
+
+    def test_service_errors_are_reported(self, client, user):
+        client.force_login(user)
+
+        with patch('scraper.services.create_scraped_page', side_effect=ValidationError('Invalid URL')):
+            response = client.post('/add/', {'url': 'https://example.com/'})
+
+        assert response.status_code == 400
+        assert response.json() == {'status': 'error', 'message': 'Invalid URL'}
+
+
+class TestBatchScraper:
+
+    def test_scrapes_pages_concurrently(self):
+        def handler(request):
+            if request.url.host == 'down.com':
+                raise httpx.ConnectError('refused')
+            return httpx.Response(200, html=f'<title>{request.url.host}</title><a href="/x">X</a>')
+
+        urls = ['https://a.com/', 'https://down.com/', 'https://b.com/']
+        results = asyncio.run(batch.scrape_pages(urls, transport=httpx.MockTransport(handler)))
+
+        assert [result.url for result in results] == urls
+        assert (results[0].title, results[0].links) == ('a.com', [('https://a.com/x', 'X')])
+        assert isinstance(results[1].error, httpx.ConnectError)
+        assert results[2].title == 'b.com'
+
+    def test_limits_concurrency_per_host(self, settings):
+        settings.SCRAPER_BATCH_PER_HOST_CONCURRENCY = 2
+        in_flight = {}
+        peak = {}
+
+        async def handler(request):
+            host = request.url.host
+            in_flight[host] = in_flight.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), in_flight[host])
+            await asyncio.sleep(0.01)
+            in_flight[host] -= 1
+            return httpx.Response(200, html='<title>t</title>')
+
+        urls = [f'https://a.com/{i}' for i in range(6)] + [f'https://b.com/{i}' for i in range(6)]
+        asyncio.run(batch.scrape_pages(urls, transport=httpx.MockTransport(handler)))
+
+        assert peak == {'a.com': 2, 'b.com': 2}
+
+    def test_rejects_large_bodies(self, settings):
+        settings.SCRAPER_MAX_BODY_SIZE = 10
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, html='x' * 100))
+
+        results = asyncio.run(batch.scrape_pages(['https://a.com/'], transport=transport))
+
+        assert isinstance(results[0].error, client.ResponseTooLarge)
+
+    def test_applies_fetch_guards(self, settings):
+        settings.SCRAPER_HTTP_TOTAL_TIMEOUT = 0.05
+        settings.SCRAPER_HTTP_MAX_REDIRECTS = 2
+
+        async def handler(request):
+            if request.url.path == '/slow':
+                await asyncio.sleep(1)
+            if request.url.path.startswith('/loop'):
+                return httpx.Response(302, headers={'Location': request.url.path + '/x'})
+            if request.url.path == '/video':
+                return httpx.Response(200, content=b'\x00' * 100, headers={'Content-Type': 'video/mp4'})
+            return httpx.Response(200, html='<title>t</title>')
+
+        urls = ['https://a.com/slow', 'https://a.com/loop', 'https://a.com/video', 'https://a.com/']
+        results = asyncio.run(batch.scrape_pages(urls, transport=httpx.MockTransport(handler)))
+
+        assert isinstance(results[0].error, client.ResponseTimeout)
+        assert isinstance(results[1].error, httpx.TooManyRedirects)
+        assert isinstance(results[2].error, client.UnsupportedContentType)
+        assert results[3].title == 't'
+
+
 @pytest.mark.django_db
 class TestGetScrapedLinksAndPageByPageId:
 
@@ -113,7 +960,7 @@ class TestGetScrapedLinksAndPageByPageId:
     @pytest.fixture
     def scraped_links(self, scraped_page):
         links = [
-            ScrapedLink.objects.create(page=scraped_page, url=f'https://link{i}.com', name=f'Link {i}')
+            create_link(page=scraped_page, url=f'https://link{i}.com', name=f'Link {i}')
             for i in range(10)
         ]
         return links
@@ -164,3 +1011,1048 @@ class TestGetScrapedLinksAndPageByPageId:
         assert paginated_links.number == 4
         assert not paginated_links.has_next()
         assert paginated_links.has_previous()
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='testuser', password='12345')
+
+    @pytest.fixture
+    def scraped_page(self, user):
+        return ScrapedPage.objects.create(user=user, url='https://testpage.com', title='Test Page')
+
+    @pytest.fixture
+    def scraped_links(self, scraped_page):
+        save_scraped_links(scraped_page, [(f'https://link{i}.com/', f'Link {i}') for i in range(10)])
+        return list(scraped_page.links.order_by('created_at', 'id'))
+
+    def walk(self, fetch):
+        pages = [fetch(None)]
+        while pages[-1].has_next():
+            pages.append(fetch(pages[-1].next_cursor))
+        return pages
+
+    def test_walks_links_forward_and_back(self, scraped_page, scraped_links):
+        fetch = lambda cursor: get_scraped_links_and_page_by_cursor(scraped_page.id, cursor, 3)[0]
+
+        pages = self.walk(fetch)
+
+        assert [len(page) for page in pages] == [3, 3, 3, 1]
+        assert [link for page in pages for link in page] == scraped_links
+        assert not pages[0].has_previous()
+        assert list(fetch(pages[-1].previous_cursor)) == list(pages[-2])
+        assert list(fetch(pages[1].previous_cursor)) == list(pages[0])
+        assert not fetch(pages[1].previous_cursor).has_previous()
+
+    def test_orders_pages_newest_first(self, user):
+        for i in range(4):
+            ScrapedPage.objects.create(user=user, url=f'https://example{i}.com', title='')
+        expected = list(ScrapedPage.objects.order_by('-created_at', '-id'))
+
+        pages = self.walk(lambda cursor: get_scraped_pages_by_cursor(user.id, cursor, 3))
+
+        assert [page for cursor_page in pages for page in cursor_page] == expected
+
+    def test_missing_page(self):
+        links, page = get_scraped_links_and_page_by_cursor(9999)
+
+        assert page is None
+        assert len(links) == 0
+
+    def test_invalid_cursor(self, user):
+        with pytest.raises(InvalidCursor):
+            get_scraped_pages_by_cursor(user.id, 'not-a-cursor')
+
+    def test_deep_pages_do_not_count_or_offset(self, scraped_page, scraped_links, django_assert_num_queries):
+        links, _ = get_scraped_links_and_page_by_cursor(scraped_page.id, None, 3)
+
+        with django_assert_num_queries(2) as context:
+            get_scraped_links_and_page_by_cursor(scraped_page.id, links.next_cursor, 3)
+
+        sql = context.captured_queries[-1]['sql']
+        assert 'COUNT(' not in sql and 'OFFSET' not in sql
+
+
+@pytest.mark.django_db
+class TestQueryCounts:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='testuser', password='12345')
+
+    @pytest.fixture
+    def scraped_page(self, user):
+        page = ScrapedPage.objects.create(user=user, url='https://test.com', title='Test')
+        save_scraped_links(page, [(f'https://link{i}.com/', f'Link {i}') for i in range(12)])
+        return page
+
+    @patch('scraper.client.get_session')
+    def test_scrape_task(self, mock_session, scraped_page, django_assert_num_queries):
+        mock_session.return_value.get.return_value = make_response(
+            '<title>T</title>' + ''.join(f'<a href="/{i}">{i}</a>' for i in range(50))
+        )
+
+        # page, fetching, parsing, savepoint, page lock, targets insert + select, links select + delete + insert,
+        # done, release
+        with django_assert_num_queries(12):
+            create_scraped_page_task(scraped_page.id)
+
+        scraped_page.refresh_from_db()
+        assert scraped_page.link_count == 50
+
+    @patch('scraper.client.get_session')
+    def test_unchanged_scrape_task(self, mock_session, scraped_page, django_assert_num_queries):
+        mock_session.return_value.get.return_value = make_response('', status_code=304)
+
+        # page, fetching, done
+        with django_assert_num_queries(3):
+            create_scraped_page_task(scraped_page.id)
+
+    @patch('scraper.tasks.create_scraped_page_task.delay')
+    def test_readd_page(self, mock_task, user, scraped_page, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            create_scraped_page(scraped_page.url, user.id)
+
+        mock_task.assert_called_once_with(str(scraped_page.id))
+
+    @patch('scraper.tasks.create_scraped_page_task.delay')
+    def test_refresh_page(self, mock_task, user, scraped_page, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            assert refresh_scraped_page(scraped_page.id, user.id)
+
+        mock_task.assert_called_once_with(str(scraped_page.id))
+
+    def test_page_progress(self, scraped_page, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            progress = get_scraped_page_progress(scraped_page.id)
+
+        assert progress == {'link_count': 12, 'status': ScrapedPage.Status.PENDING}
+
+    def test_page_detail_links(self, scraped_page, django_assert_num_queries):
+        with django_assert_num_queries(2):
+            links, page = get_scraped_links_and_page_by_cursor(scraped_page.id, None, 5)
+            rows = [(link.url, link.name, page.title) for link in links]
+
+        assert rows[0] == ('https://link0.com/', 'Link 0', 'Test')
+
+    def test_page_detail_hides_other_users_pages(self, client, scraped_page):
+        client.force_login(User.objects.create_user(username='other', password='12345'))
+
+        response = client.get(f'/page-detail/{scraped_page.id}/')
+
+        assert response.status_code == 302
+
+
+class FakeRedis:
+    """
+    The subset of the Redis client used by the crawl Bloom filter.
+    """
+
+    def __init__(self):
+        self.bits = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def delete(self, key):
+        self.bits = {k: v for k, v in self.bits.items() if k[0] != key}
+
+
+class FakePipeline:
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def setbit(self, key, offset, value):
+        self.commands.append((key, offset, value))
+
+    def expire(self, key, ttl):
+        pass
+
+    def execute(self):
+        results = []
+        for key, offset, value in self.commands:
+            results.append(self.client.bits.get((key, offset), 0))
+            self.client.bits[(key, offset)] = value
+        return results
+
+
+@pytest.mark.django_db
+class TestCrawl:
+
+    SITE = {
+        'https://site.com/': ['https://site.com/a', 'https://site.com/b', 'https://other.com/x'],
+        'https://site.com/a': ['https://site.com/c', 'https://site.com/', 'https://blog.site.com/'],
+        'https://site.com/b': ['https://site.com/a'],
+        'https://site.com/c': ['https://site.com/d'],
+        'https://site.com/d': [],
+        'https://blog.site.com/': ['https://site.com/'],
+    }
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='testuser', password='12345')
+
+    @pytest.fixture(autouse=True)
+    def site(self):
+        async def scrape_pages(urls, transport=None):
+            return [
+                PageResult(url=url, title=url, links=[(link, link) for link in self.SITE[url]])
+                if url in self.SITE else PageResult(url=url, error=requests.ConnectionError())
+                for url in urls
+            ]
+
+        with patch('scraper.batch.scrape_pages', side_effect=scrape_pages) as mock_scrape:
+            yield mock_scrape
+
+    @pytest.fixture
+    def steps(self):
+        with patch('scraper.tasks.crawl_step_task.delay') as mock_delay:
+            yield mock_delay
+
+    def run(self, steps):
+        while steps.call_args_list:
+            crawl_id = steps.call_args_list.pop(0).args[0]
+            crawl_step_task(crawl_id)
+
+    def crawled_urls(self, crawl):
+        return set(crawl.urls.filter(state=CrawlURL.State.DONE).values_list('url', flat=True))
+
+    def test_crawls_host_up_to_max_depth(self, user, steps):
+        crawl = start_crawl('https://site.com', user.id, max_depth=2, max_pages=100)
+        self.run(steps)
+
+        crawl.refresh_from_db()
+        assert crawl.status == Crawl.Status.DONE
+        assert crawl.pages_crawled == 4
+        assert crawl.active_steps == 0
+        assert self.crawled_urls(crawl) == {
+            'https://site.com/', 'https://site.com/a', 'https://site.com/b', 'https://site.com/c'
+        }
+        page = ScrapedPage.objects.get(user=user, url='https://site.com/a')
+        assert page.status == ScrapedPage.Status.DONE
+        assert set(page.links.values_list('target__url', flat=True)) == set(self.SITE['https://site.com/a'])
+
+    def test_domain_scope_follows_subdomains(self, user, steps):
+        crawl = start_crawl('https://site.com/', user.id, max_depth=2, max_pages=100, scope=Crawl.Scope.DOMAIN)
+        self.run(steps)
+
+        assert 'https://blog.site.com/' in self.crawled_urls(crawl)
+        assert not crawl.urls.filter(url__startswith='https://other.com').exists()
+
+    def test_stops_at_max_pages(self, user, steps, settings):
+        settings.SCRAPER_CRAWL_BATCH_SIZE = 1
+        crawl = start_crawl('https://site.com/', user.id, max_depth=5, max_pages=3)
+        self.run(steps)
+
+        crawl.refresh_from_db()
+        assert crawl.status == Crawl.Status.DONE
+        assert crawl.pages_crawled == 3
+        assert crawl.urls.count() == 3
+
+    def test_runs_steps_in_parallel(self, user, steps, settings):
+        settings.SCRAPER_CRAWL_BATCH_SIZE = 1
+        settings.SCRAPER_CRAWL_CONCURRENCY = 2
+        crawl = start_crawl('https://site.com/', user.id, max_depth=1, max_pages=100)
+        assert steps.call_count == 1
+
+        crawl_step_task(steps.call_args_list.pop(0).args[0])
+
+        # The seed linked to two in-scope pages, one batch each
+        assert len(steps.call_args_list) == 2
+        self.run(steps)
+        assert self.crawled_urls(crawl) == {'https://site.com/', 'https://site.com/a', 'https://site.com/b'}
+
+    def test_resumes_after_lost_workers(self, user, steps):
+        crawl = start_crawl('https://site.com/', user.id, max_depth=1, max_pages=100)
+        # The worker running the first step died after claiming the seed
+        steps.reset_mock()
+        crawl_module.claim_urls(crawl, 10)
+
+        assert resume_crawl(crawl.id, timeout=0) == 1
+        self.run(steps)
+
+        crawl.refresh_from_db()
+        assert crawl.status == Crawl.Status.DONE
+        assert crawl.pages_crawled == 3
+
+    def test_resume_keeps_steps_in_flight(self, user, steps):
+        crawl = start_crawl('https://site.com/', user.id, max_depth=1, max_pages=100)
+        steps.reset_mock()
+
+        # The first step is still queued, e.g. delivered again to a restarted worker
+        resume_crawl(crawl.id)
+
+        assert steps.call_count == 0
+        crawl.refresh_from_db()
+        assert crawl.active_steps == 1
+
+    def test_failed_step_keeps_crawl_going(self, user, steps):
+        crawl = start_crawl('https://site.com/', user.id, max_depth=1, max_pages=100)
+
+        with patch('scraper.crawl.claim_urls', side_effect=OperationalError):
+            with pytest.raises(OperationalError):
+                self.run(steps)
+        self.run(steps)
+
+        crawl.refresh_from_db()
+        assert crawl.status == Crawl.Status.DONE
+        assert crawl.pages_crawled == 3
+
+    def test_failed_batch_fails_its_urls(self, user, steps):
+        crawl = start_crawl('https://site.com/', user.id, max_depth=1, max_pages=100)
+
+        with patch('scraper.batch.scrape_pages_cached', side_effect=redis.ConnectionError):
+            self.run(steps)
+
+        crawl.refresh_from_db()
+        assert crawl.status == Crawl.Status.DONE
+        assert crawl.pages_failed == 1
+        assert ScrapedPage.objects.get(user=user, url='https://site.com/').status == ScrapedPage.Status.FAILED
+
+    def test_records_failed_pages(self, user, steps):
+        self.SITE = {**self.SITE, 'https://site.com/b': ['https://site.com/missing']}
+        crawl = start_crawl('https://site.com/', user.id, max_depth=2, max_pages=100)
+        self.run(steps)
+
+        crawl.refresh_from_db()
+        assert crawl.pages_failed == 1
+        assert crawl.urls.get(url='https://site.com/missing').state == CrawlURL.State.FAILED
+
+    def test_crawl_views(self, client, user, steps):
+        client.force_login(user)
+
+        response = client.post('/crawl/', {'url': 'https://site.com/', 'max_depth': 1, 'max_pages': 10, 'scope': 'host'})
+        self.run(steps)
+        status = client.get(f"/crawl/{response.json()['crawl_id']}/").json()
+
+        assert status['status'] == Crawl.Status.DONE
+        assert status['pages_crawled'] == 3
+
+    def test_bloom_filter_screens_seen_urls(self, user, settings):
+        settings.SCRAPER_CRAWL_BLOOM_MIN_PAGES = 10
+        crawl = Crawl.objects.create(user=user, seed_url='https://site.com/', max_depth=1, max_pages=10)
+
+        with patch('scraper.crawl.get_redis', return_value=FakeRedis()):
+            assert crawl_module.enqueue_urls(crawl, ['https://site.com/a', 'https://site.com/b'], 1) == 2
+            assert crawl_module.enqueue_urls(crawl, ['https://site.com/a', 'https://site.com/c'], 1) == 1
+
+        assert crawl.urls.count() == 3
+
+    def test_bloom_filter(self):
+        bloom = crawl_module.BloomFilter(FakeRedis(), 'seen', capacity=1000, error_rate=0.01)
+
+        assert bloom.add(['a', 'b', 'a']) == [True, True, False]
+        assert bloom.add(['b', 'c']) == [False, True]
+        assert bloom.hashes == 7
+
+
+def allow_all_robots():
+    robots = RobotFileParser()
+    robots.parse([])
+    return robots
+
+
+class TestPoliteness:
+
+    ROBOTS = 'User-agent: *\nDisallow: /private\nCrawl-delay: 2\n'
+
+    @pytest.fixture(autouse=True)
+    def politeness_on(self, settings):
+        settings.SCRAPER_POLITENESS = True
+
+    @pytest.fixture
+    def script(self):
+        with patch('scraper.politeness.get_acquire_script') as mock_get_script:
+            mock_get_script.return_value.return_value = [1, b'0']
+            yield mock_get_script.return_value
+
+    @patch('scraper.client.get_session')
+    def test_honours_robots_rules_and_crawl_delay(self, mock_session, script, settings):
+        mock_get = mock_session.return_value.get
+        mock_get.return_value = make_response(self.ROBOTS)
+
+        with pytest.raises(politeness.RobotsDisallowed):
+            politeness.acquire('https://a.com/private/page')
+        lease = politeness.acquire('https://a.com/public')
+
+        assert mock_get.call_args.args == ('https://a.com/robots.txt',)
+        mock_get.assert_called_once()
+        assert lease.host == 'a.com'
+        keys, args = script.call_args.kwargs['keys'], script.call_args.kwargs['args']
+        assert keys == ['scraper:host:a.com:bucket', 'scraper:host:a.com:leases']
+        assert args[:3] == [0.5, settings.SCRAPER_HOST_BURST, settings.SCRAPER_HOST_CONCURRENCY]
+
+    @pytest.mark.parametrize('status_code', [404, 503])
+    @patch('scraper.client.get_session')
+    def test_missing_robots_allows_everything(self, mock_session, script, status_code):
+        mock_session.return_value.get.return_value = make_response('', status_code=status_code)
+
+        assert politeness.acquire('https://a.com/private') is not None
+
+    @patch('scraper.politeness.get_robots', side_effect=lambda url: allow_all_robots())
+    def test_busy_host(self, mock_robots, script):
+        script.return_value = [0, b'1.5']
+
+        with pytest.raises(politeness.HostBusy) as excinfo:
+            politeness.acquire('https://a.com/')
+
+        assert excinfo.value.retry_after == 1.5
+
+    @patch('scraper.politeness.get_robots', side_effect=lambda url: allow_all_robots())
+    def test_limiter_unavailable(self, mock_robots, script):
+        script.side_effect = redis.ConnectionError()
+
+        assert politeness.acquire('https://a.com/') is None
+
+    def test_batch_waits_for_reserved_turn(self):
+        lease = politeness.Lease(host='a.com', lease_id='x')
+
+        with patch('scraper.politeness.acquire', side_effect=[politeness.HostBusy(0.01), lease]) as mock_acquire:
+            assert asyncio.run(batch.acquire_host_slot('https://a.com/')) is lease
+
+        assert mock_acquire.call_args_list == [call('https://a.com/', False), call('https://a.com/', True)]
+
+
+@pytest.mark.django_db
+class TestScrapeTaskPoliteness:
+
+    @pytest.fixture
+    def scraped_page(self):
+        user = User.objects.create_user(username='testuser', password='12345')
+        return ScrapedPage.objects.create(user=user, url='https://test.com', title='')
+
+    @patch('scraper.politeness.acquire', side_effect=politeness.HostBusy(3))
+    def test_reschedules_when_host_is_busy(self, mock_acquire, scraped_page):
+        with patch.object(create_scraped_page_task, 'apply_async') as mock_apply_async:
+            create_scraped_page_task.apply(args=(scraped_page.id,), retries=2)
+
+        assert mock_apply_async.call_args.kwargs == {
+            'args': (scraped_page.id,),
+            'kwargs': {'on_existing': 'replace', 'reserved': True},
+            'countdown': 3,
+            'retries': 2,
+        }
+        scraped_page.refresh_from_db()
+        assert scraped_page.status == ScrapedPage.Status.PENDING
+
+    @patch('scraper.politeness.acquire', side_effect=politeness.RobotsDisallowed())
+    def test_fails_page_disallowed_by_robots(self, mock_acquire, scraped_page):
+        with pytest.raises(politeness.RobotsDisallowed):
+            create_scraped_page_task(scraped_page.id)
+
+        scraped_page.refresh_from_db()
+        assert scraped_page.status == ScrapedPage.Status.FAILED
+
+    @patch('scraper.politeness.release')
+    @patch('scraper.politeness.acquire')
+    @patch('scraper.client.get_session')
+    def test_releases_host_slot(self, mock_session, mock_acquire, mock_release, scraped_page):
+        mock_session.return_value.get.return_value = make_response('<title>T</title>')
+
+        create_scraped_page_task(scraped_page.id)
+
+        mock_release.assert_called_once_with(mock_acquire.return_value)
+
+
+class TestErrorClassification:
+
+    @pytest.mark.parametrize('error', [
+        requests.ConnectionError(),
+        requests.ReadTimeout(),
+        httpx.ConnectTimeout('timed out'),
+        requests.HTTPError(response=make_response('', status_code=503)),
+        requests.HTTPError(response=make_response('', status_code=429)),
+    ])
+    def test_transient_errors(self, error):
+        classified = exceptions.classify(error)
+
+        assert isinstance(classified, TransientScrapeError)
+        assert classified.__cause__ is error
+
+    @pytest.mark.parametrize('error', [
+        requests.HTTPError(response=make_response('', status_code=404)),
+        client.ResponseTooLarge('too large', response=make_response('')),
+        politeness.RobotsDisallowed('disallowed'),
+        ValueError('bad markup'),
+    ])
+    def test_permanent_errors(self, error):
+        assert isinstance(exceptions.classify(error), PermanentScrapeError)
+
+
+@pytest.mark.django_db
+class TestScrapeRetries:
+
+    @pytest.fixture
+    def scraped_page(self):
+        user = User.objects.create_user(username='testuser', password='12345')
+        return ScrapedPage.objects.create(user=user, url='https://test.com', title='')
+
+    @patch('scraper.client.get_session')
+    def test_retries_transient_errors_with_backoff(self, mock_session, scraped_page, settings):
+        mock_session.return_value.get.side_effect = requests.ReadTimeout()
+        settings.SCRAPER_TASK_RETRY_BACKOFF = 2
+
+        with patch.object(create_scraped_page_task, 'retry', side_effect=Retry()) as mock_retry:
+            with pytest.raises(Retry):
+                create_scraped_page_task.apply(args=(scraped_page.id,), retries=3, throw=True)
+
+        kwargs = mock_retry.call_args.kwargs
+        assert isinstance(kwargs['exc'], TransientScrapeError)
+        assert kwargs['kwargs'] == {'on_existing': 'replace'}
+        assert 0 <= kwargs['countdown'] <= 2 ** 3 * 2
+        scraped_page.refresh_from_db()
+        assert scraped_page.status == ScrapedPage.Status.PENDING
+        assert not FailedScrape.objects.exists()
+
+    @patch('scraper.client.get_session')
+    def test_dead_letters_page_after_last_retry(self, mock_session, scraped_page):
+        mock_session.return_value.get.return_value = make_response('', status_code=502)
+
+        with patch.object(create_scraped_page_task, 'max_retries', 2):
+            result = create_scraped_page_task.apply(args=(scraped_page.id,))
+
+        assert isinstance(result.result, TransientScrapeError)
+        assert mock_session.return_value.get.call_count == 3
+        scraped_page.refresh_from_db()
+        assert scraped_page.status == ScrapedPage.Status.FAILED
+        assert scraped_page.failure.kind == FailedScrape.Kind.TRANSIENT
+        assert scraped_page.failure.attempts == 3
+        assert '502' in scraped_page.failure.error
+
+    @patch('scraper.client.get_session')
+    def test_permanent_errors_are_not_retried(self, mock_session, scraped_page):
+        mock_session.return_value.get.return_value = make_response('Gone', status_code=410)
+
+        result = create_scraped_page_task.apply(args=(scraped_page.id,))
+
+        assert isinstance(result.result, PermanentScrapeError)
+        mock_session.return_value.get.assert_called_once()
+        assert scraped_page.failure.kind == FailedScrape.Kind.PERMANENT
+        assert scraped_page.failure.attempts == 1
+
+    def test_records_failed_batch_pages(self, scraped_page):
+        save_scraped_pages(scraped_page.user_id, [
+            PageResult(url=scraped_page.url, error=httpx.ConnectError('refused'))
+        ])
+        save_scraped_pages(scraped_page.user_id, [
+            PageResult(url=scraped_page.url, error=client.ResponseTooLarge('too large'))
+        ])
+
+        failure = FailedScrape.objects.get()
+        assert failure.page_id == scraped_page.id
+        assert failure.kind == FailedScrape.Kind.PERMANENT
+
+    @patch('scraper.tasks.create_scraped_page_task.delay')
+    def test_redrive(self, mock_task, scraped_page):
+        user = scraped_page.user
+        pages = [
+            ScrapedPage.objects.create(user=user, url=f'https://test.com/{i}', title='', status=ScrapedPage.Status.FAILED)
+            for i in range(3)
+        ]
+        FailedScrape.objects.create(page=pages[0], kind=FailedScrape.Kind.TRANSIENT, error='timeout')
+        FailedScrape.objects.create(page=pages[1], kind=FailedScrape.Kind.PERMANENT, error='404')
+        FailedScrape.objects.create(page=pages[2], kind=FailedScrape.Kind.TRANSIENT, error='503')
+        # Scraped since it failed
+        FailedScrape.objects.create(page=scraped_page, kind=FailedScrape.Kind.TRANSIENT, error='timeout')
+
+        assert redrive_failed_scrapes(kind=FailedScrape.Kind.TRANSIENT, limit=1) == 1
+        mock_task.assert_called_once_with(str(pages[0].id))
+        assert ScrapedPage.objects.get(id=pages[0].id).status == ScrapedPage.Status.PENDING
+        assert set(FailedScrape.objects.values_list('page_id', flat=True)) == {pages[1].id, pages[2].id}
+
+        assert redrive_failed_scrapes() == 2
+        assert not FailedScrape.objects.exists()
+
+
+class TestTaskRoutes:
+
+    @pytest.mark.parametrize('task, queue', [
+        (create_scraped_page_task, 'fetch'),
+        (scrape_pages_batch_task, 'parse'),
+        (crawl_step_task, 'parse'),
+    ])
+    def test_routes_tasks_by_workload(self, task, queue):
+        route = task.app.amqp.router.route({}, task.name, args=(), kwargs={})
+
+        assert route['queue'].name == queue
+
+
+@pytest.mark.django_db
+class TestScheduledRescrapes:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='testuser', password='12345')
+
+    @pytest.fixture
+    def scraped_page(self, user):
+        page = ScrapedPage.objects.create(user=user, url='https://test.com', title='')
+        assert set_scrape_interval(page.id, user.id, 3600)
+        return ScrapedPage.objects.get(id=page.id)
+
+    @pytest.fixture(autouse=True)
+    def intervals(self, settings):
+        settings.SCRAPER_RESCRAPE_MIN_INTERVAL = 900
+        settings.SCRAPER_RESCRAPE_MAX_INTERVAL = 4 * 3600
+        settings.SCRAPER_RESCRAPE_BACKOFF = 2
+
+    @patch('scraper.tasks.create_scraped_page_task.delay')
+    def test_queues_due_pages(self, mock_task, user, scraped_page, settings):
+        settings.SCRAPER_RESCRAPE_CLAIM_TIMEOUT = 600
+        due = ScrapedPage.objects.create(user=user, url='https://due.com', title='')
+        overdue = ScrapedPage.objects.create(user=user, url='https://overdue.com', title='')
+        ScrapedPage.objects.create(user=user, url='https://unmonitored.com', title='')
+        now = timezone.now()
+        ScrapedPage.objects.filter(id=due.id).update(scrape_interval=900, next_scrape_at=now - timedelta(minutes=1))
+        ScrapedPage.objects.filter(id=overdue.id).update(scrape_interval=900, next_scrape_at=now - timedelta(hours=1))
+
+        assert queue_due_rescrapes(limit=10) == 2
+
+        assert mock_task.call_args_list == [call(str(overdue.id)), call(str(due.id))]
+        due.refresh_from_db()
+        assert due.next_scrape_at > now + timedelta(seconds=590)
+        assert queue_due_rescrapes(limit=10) == 0
+
+    @patch('scraper.client.get_session')
+    def test_backs_off_unchanged_pages(self, mock_session, scraped_page):
+        mock_session.return_value.get.return_value = make_response('', status_code=304)
+
+        for interval in (7200, 14400, 14400):
+            create_scraped_page_task(scraped_page.id)
+            scraped_page.refresh_from_db()
+            assert scraped_page.scrape_interval == interval
+
+        assert scraped_page.next_scrape_at > timezone.now() + timedelta(seconds=14000)
+
+    @patch('scraper.client.get_session')
+    def test_tightens_pages_whose_links_change(self, mock_session, scraped_page):
+        for i, interval in enumerate((1800, 900, 900)):
+            mock_session.return_value.get.return_value = make_response(f'<a href="/{i}">{i}</a>')
+            create_scraped_page_task(scraped_page.id)
+            scraped_page.refresh_from_db()
+            assert scraped_page.scrape_interval == interval
+
+    @patch('scraper.client.get_session')
+    def test_backs_off_pages_whose_links_did_not_change(self, mock_session, scraped_page):
+        mock_session.return_value.get.return_value = make_response('<a href="/a">A</a>')
+        create_scraped_page_task(scraped_page.id)
+        mock_session.return_value.get.return_value = make_response('<p>New text</p><a href="/a">A</a>')
+        create_scraped_page_task(scraped_page.id)
+
+        scraped_page.refresh_from_db()
+        assert scraped_page.scrape_interval == 3600
+        assert scraped_page.links.count() == 1
+
+    def test_unmonitor(self, user, scraped_page):
+        assert set_scrape_interval(scraped_page.id, user.id, None)
+
+        scraped_page.refresh_from_db()
+        assert (scraped_page.scrape_interval, scraped_page.next_scrape_at) == (None, None)
+
+    def test_schedule_page_view(self, client, user, scraped_page, settings):
+        client.force_login(user)
+
+        response = client.post(f'/schedule_page/{scraped_page.id}/', {'interval': 60})
+        assert response.status_code == 400
+
+        response = client.post(f'/schedule_page/{scraped_page.id}/', {'interval': 1800})
+        assert response.json() == {'status': 'success'}
+        scraped_page.refresh_from_db()
+        assert scraped_page.scrape_interval == 1800
+
+        client.force_login(User.objects.create_user(username='other', password='12345'))
+        response = client.post(f'/schedule_page/{scraped_page.id}/', {'interval': 0})
+        assert response.status_code == 404
+
+    @patch('scraper.tasks.create_scraped_page_task.delay')
+    def test_refresh_page_view(self, mock_task, client, user, scraped_page):
+        response = client.post(f'/refresh_page/{scraped_page.id}/')
+        assert response.status_code == 302
+
+        client.force_login(User.objects.create_user(username='other', password='12345'))
+        response = client.post(f'/refresh_page/{scraped_page.id}/')
+        assert response.status_code == 404
+
+        client.force_login(user)
+        response = client.post(f'/refresh_page/{scraped_page.id}/')
+        assert response.json() == {'status': 'success'}
+        mock_task.assert_called_once_with(str(scraped_page.id))
+
+    def test_link_count_view(self, client, user, scraped_page):
+        response = client.get(f'/get_link_count/{scraped_page.id}/')
+        assert response.status_code == 302
+
+        client.force_login(User.objects.create_user(username='other', password='12345'))
+        response = client.get(f'/get_link_count/{scraped_page.id}/')
+        assert response.json() == {'count': 0, 'status': None}
+
+        client.force_login(user)
+        response = client.get(f'/get_link_count/{scraped_page.id}/')
+        assert response.json() == {'count': scraped_page.link_count, 'status': scraped_page.status}
+
+    @pytest.mark.parametrize('pagination', ['cursor', 'offset'])
+    def test_page_detail_view_hides_other_users_pages(self, client, user, scraped_page, settings, pagination):
+        settings.SCRAPER_PAGINATION = pagination
+
+        client.force_login(User.objects.create_user(username='other', password='12345'))
+        assert client.get(f'/page-detail/{scraped_page.id}/').status_code == 302
+
+        client.force_login(user)
+        assert client.get(f'/page-detail/{scraped_page.id}/').status_code == 200
+
+    def test_delete_page_view(self, client, user, scraped_page):
+        response = client.post(f'/delete_page/{scraped_page.id}/')
+        assert response.status_code == 302
+
+        client.force_login(User.objects.create_user(username='other', password='12345'))
+        response = client.post(f'/delete_page/{scraped_page.id}/')
+        assert response.status_code == 404
+        assert ScrapedPage.objects.filter(id=scraped_page.id).exists()
+
+        client.force_login(user)
+        response = client.post(f'/delete_page/{scraped_page.id}/')
+        assert response.json() == {'status': 'success'}
+        assert not ScrapedPage.objects.filter(id=scraped_page.id).exists()
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.django_db
+class TestMetrics:
+
+    @pytest.fixture
+    def scraped_page(self):
+        user = User.objects.create_user(username='testuser', password='12345')
+        return ScrapedPage.objects.create(user=user, url='https://test.com', title='')
+
+    @patch('scraper.client.get_session')
+    def test_scrape_task_records_stages(self, mock_session, scraped_page):
+        html = '<title>T</title><a href="/a">A</a><a href="/b">B</a>'
+        mock_session.return_value.get.return_value = make_response(html)
+        stages = ('fetch', 'download', 'parse', 'persist')
+        counts = {stage: sample('scraper_stage_duration_seconds_count', stage=stage) for stage in stages}
+        downloaded = sample('scraper_downloaded_bytes_total')
+        done = sample('scraper_scrape_outcomes_total', outcome='done')
+        links = sample('scraper_page_links_sum')
+
+        create_scraped_page_task(scraped_page.id)
+
+        for stage in stages:
+            assert sample('scraper_stage_duration_seconds_count', stage=stage) == counts[stage] + 1
+        assert sample('scraper_downloaded_bytes_total') == downloaded + len(html)
+        assert sample('scraper_scrape_outcomes_total', outcome='done') == done + 1
+        assert sample('scraper_page_links_sum') == links + 2
+
+    @patch('scraper.politeness.acquire', side_effect=politeness.HostBusy(3))
+    def test_counts_throttled_scrapes(self, mock_acquire, scraped_page):
+        throttled = sample('scraper_scrape_outcomes_total', outcome='throttled')
+
+        with patch.object(create_scraped_page_task, 'apply_async'):
+            create_scraped_page_task(scraped_page.id)
+
+        assert sample('scraper_scrape_outcomes_total', outcome='throttled') == throttled + 1
+
+    def test_counts_cache_lookups(self):
+        misses = sample('scraper_cache_lookups_total', result='miss')
+        hits = sample('scraper_cache_lookups_total', result='hit')
+        cache.set_cached_page(PageResult(url='https://a.com/', title='A'))
+
+        cache.get_cached_page('https://a.com/')
+        cache.get_cached_page('https://b.com/')
+
+        assert sample('scraper_cache_lookups_total', result='hit') == hits + 1
+        assert sample('scraper_cache_lookups_total', result='miss') == misses + 1
+
+    def test_records_queue_wait(self):
+        headers = {}
+        metrics.stamp_published_at(headers=headers)
+        published_at = headers[metrics.PUBLISHED_AT_HEADER] - 2
+        request = SimpleNamespace(headers=None, eta=None, **{metrics.PUBLISHED_AT_HEADER: published_at})
+        task = SimpleNamespace(name='scraper.tasks.test_task', request=request)
+
+        metrics.observe_queue_wait(task_id='1', task=task)
+        metrics.observe_task_duration(task_id='1', task=task, state='SUCCESS')
+
+        assert sample('scraper_task_queue_wait_seconds_sum', task=task.name) >= 2
+        assert sample('scraper_task_duration_seconds_count', task=task.name, state='SUCCESS') == 1
+
+    def test_records_view_latency(self, client):
+        client.get('/users/login/')
+
+        assert sample('scraper_http_request_duration_seconds_count', view='login', status='200') >= 1
+
+    def test_metrics_endpoint(self, client, settings):
+        settings.SCRAPER_METRICS_TOKEN = 'secret'
+
+        assert client.get('/metrics/').status_code == 401
+        response = client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+
+        assert response.status_code == 200
+        assert b'scraper_stage_duration_seconds' in response.content
+
+    def test_tracing_requires_opentelemetry(self, settings):
+        settings.SCRAPER_TRACING = False
+        with tracing.span('scrape.fetch'):
+            pass
+
+        settings.SCRAPER_TRACING = True
+        with patch.dict('sys.modules', {'opentelemetry': None}):
+            with pytest.raises(ImproperlyConfigured):
+                tracing.span('scrape.fetch')
+
+
+def read_chunks(response):
+    async def collect():
+        return [chunk async for chunk in response.streaming_content]
+
+    return async_to_sync(collect)()
+
+
+@pytest.mark.django_db
+class TestExportLinks:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='testuser', password='12345')
+
+    @pytest.fixture
+    def pages(self, user):
+        first = ScrapedPage.objects.create(url='https://example.com/a', title='A', user=user)
+        second = ScrapedPage.objects.create(url='https://example.com/b', title='B', user=user)
+        other = ScrapedPage.objects.create(
+            url='https://example.com/c', title='C', user=User.objects.create_user(username='other', password='12345')
+        )
+        create_link(first, 'https://example.com/1', 'One')
+        create_link(first, 'https://example.com/2', '=HYPERLINK("https://evil.example")')
+        create_link(second, 'https://example.com/3', 'Three')
+        create_link(other, 'https://example.com/4', 'Four')
+        return first, second
+
+    def test_exports_page_links_as_csv(self, client, user, pages):
+        client.force_login(user)
+
+        response = client.get(f'/api/pages/{pages[0].id}/links/export/')
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/csv; charset=utf-8'
+        assert response['Content-Disposition'] == f'attachment; filename="links-{pages[0].id}.csv"'
+        rows = list(csv.reader(b''.join(read_chunks(response)).decode().splitlines()))
+        assert rows[0] == ['page_url', 'url', 'name', 'created_at']
+        assert [row[1:3] for row in rows[1:]] == [
+            ['https://example.com/1', 'One'],
+            ['https://example.com/2', '\'=HYPERLINK("https://evil.example")'],
+        ]
+
+    def test_exports_all_user_links_as_gzipped_ndjson(self, client, user, pages):
+        client.force_login(user)
+
+        response = client.get('/api/links/export/', {'format': 'ndjson', 'compression': 'gzip'})
+
+        assert response['Content-Type'] == 'application/gzip'
+        assert response['Content-Disposition'] == 'attachment; filename="links.ndjson.gz"'
+        lines = gzip.decompress(b''.join(read_chunks(response))).decode().splitlines()
+        assert sorted(json.loads(line)['url'] for line in lines) == [
+            'https://example.com/1', 'https://example.com/2', 'https://example.com/3'
+        ]
+        assert json.loads(lines[0])['name'] in ('One', '=HYPERLINK("https://evil.example")', 'Three')
+
+    def test_streams_in_blocks(self, client, user, pages, settings):
+        settings.SCRAPER_EXPORT_CHUNK_SIZE = 1
+        client.force_login(user)
+
+        with patch.object(export, 'BLOCK_SIZE', 1):
+            response = client.get('/api/links/export/')
+
+            chunks = read_chunks(response)
+
+        assert response.streaming
+        assert chunks[0].startswith(b'page_url,url,name,created_at')
+        assert len(chunks) == 3
+
+    def test_rejects_other_users_pages(self, client, pages):
+        client.force_login(User.objects.get(username='other'))
+
+        assert client.get(f'/api/pages/{pages[0].id}/links/export/').status_code == 404
+
+    def test_validates_options(self, client, user, pages):
+        assert client.get('/api/links/export/').status_code == 401
+
+        client.force_login(user)
+
+        assert client.get('/api/links/export/', {'format': 'xml'}).status_code == 400
+        assert client.get('/api/links/export/', {'compression': 'brotli'}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestRestApi:
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='testuser', password='12345')
+
+    @pytest.fixture
+    def api_client(self, user):
+        api_client = APIClient()
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+        return api_client
+
+    @pytest.fixture
+    def pages(self, user):
+        base = timezone.now()
+        pages = []
+        for i in range(3):
+            page = ScrapedPage.objects.create(url=f'https://example.com/{i}', title=f'Page {i}', user=user)
+            ScrapedPage.objects.filter(id=page.id).update(created_at=base + timedelta(seconds=i))
+            pages.append(page)
+        for i in range(3):
+            create_link(pages[0], f'https://example.com/link/{i}', f'Link {i}')
+        return pages
+
+    def test_requires_authentication(self, pages):
+        response = APIClient().get('/api/v1/pages/')
+
+        assert response.status_code == 401
+
+    def test_lists_pages_by_cursor(self, api_client, pages):
+        response = api_client.get('/api/v1/pages/', {'limit': 2})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [page['url'] for page in data['results']] == ['https://example.com/2', 'https://example.com/1']
+        assert set(data['results'][0]) == {'id', 'url', 'title', 'status', 'link_count', 'created_at'}
+        assert data['previous'] is None
+
+        data = api_client.get(data['next']).json()
+        assert [page['url'] for page in data['results']] == ['https://example.com/0']
+        assert data['next'] is None
+
+    def test_list_lookups_are_constant(self, api_client, pages, django_assert_num_queries):
+        # Session-less token lookup, then the page of rows
+        with django_assert_num_queries(2):
+            api_client.get('/api/v1/pages/', {'limit': 50})
+        with django_assert_num_queries(3):
+            api_client.get(f'/api/v1/pages/{pages[0].id}/links/')
+
+    def test_conditional_get(self, api_client, pages):
+        response = api_client.get('/api/v1/pages/')
+        etag = response['ETag']
+
+        assert api_client.get('/api/v1/pages/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        ScrapedPage.objects.filter(id=pages[0].id).update(title='Changed')
+        response = api_client.get('/api/v1/pages/', HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_invalid_cursor_or_limit(self, api_client, pages):
+        assert api_client.get('/api/v1/pages/', {'cursor': 'nope'}).status_code == 404
+        assert api_client.get('/api/v1/pages/', {'limit': 'many'}).status_code == 400
+
+    @patch('scraper.tasks.create_scraped_page_task.delay')
+    def test_submits_a_page(self, mock_task, api_client, user):
+        response = api_client.post('/api/v1/pages/', {'url': 'https://example.com/new'}, format='json')
+
+        assert response.status_code == 202
+        page = ScrapedPage.objects.get(url='https://example.com/new', user=user)
+        assert response.json() == {'id': str(page.id)}
+        mock_task.assert_called_once_with(str(page.id))
+
+    @patch('scraper.tasks.scrape_pages_batch_task.delay')
+    def test_submits_pages_in_bulk(self, mock_task, api_client, user):
+        urls = ['https://example.com/a', 'https://example.com/b']
+
+        response = api_client.post('/api/v1/pages/', {'urls': urls}, format='json')
+
+        assert response.status_code == 202
+        assert response.json() == {'created': 2}
+        mock_task.assert_called_once_with(urls, user.id)
+
+    def test_rejects_invalid_submissions(self, api_client):
+        assert api_client.post('/api/v1/pages/', {'url': 'not a url'}, format='json').status_code == 400
+        assert api_client.post('/api/v1/pages/', {'url': 'ftp://example.com/x'}, format='json').status_code == 400
+        assert api_client.post('/api/v1/pages/', {'urls': ['ftp://example.com/x']}, format='json').status_code == 400
+        assert api_client.post('/api/v1/pages/', {}, format='json').status_code == 400
+        response = api_client.post(
+            '/api/v1/pages/', {'url': 'https://example.com/', 'urls': ['https://example.com/']}, format='json'
+        )
+        assert response.status_code == 400
+
+    @patch('scraper.tasks.create_scraped_page_task.delay')
+    def test_throttles_submissions(self, mock_task, api_client):
+        caches['default'].clear()
+        with patch.object(api.SubmitRateThrottle, 'rate', '1/minute', create=True):
+            first = api_client.post('/api/v1/pages/', {'url': 'https://example.com/a'}, format='json')
+            second = api_client.post('/api/v1/pages/', {'url': 'https://example.com/b'}, format='json')
+            listing = api_client.get('/api/v1/pages/')
+
+        assert first.status_code == 202
+        assert second.status_code == 429
+        assert listing.status_code == 200
+
+    def test_page_detail(self, api_client, pages):
+        response = api_client.get(f'/api/v1/pages/{pages[0].id}/')
+
+        assert response.status_code == 200
+        assert response.json()['url'] == 'https://example.com/0'
+        assert response.json()['scrape_interval'] is None
+        assert 'ETag' in response
+
+    def test_page_links(self, api_client, pages):
+        response = api_client.get(f'/api/v1/pages/{pages[0].id}/links/', {'limit': 2})
+
+        data = response.json()
+        assert [link['name'] for link in data['results']] == ['Link 0', 'Link 1']
+        assert data['results'][0]['url'] == 'https://example.com/link/0'
+        assert [link['name'] for link in api_client.get(data['next']).json()['results']] == ['Link 2']
+
+    @patch('scraper.tasks.create_scraped_page_task.delay')
+    def test_other_users_pages_are_hidden(self, mock_task, pages):
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='12345'))
+
+        assert other.get(f'/api/v1/pages/{pages[0].id}/').status_code == 404
+        assert other.get(f'/api/v1/pages/{pages[0].id}/links/').status_code == 404
+        assert other.delete(f'/api/v1/pages/{pages[0].id}/').status_code == 404
+        assert ScrapedPage.objects.filter(id=pages[0].id).exists()
+
+    def test_deletes_page(self, api_client, pages):
+        response = api_client.delete(f'/api/v1/pages/{pages[0].id}/')
+
+        assert response.status_code == 204
+        assert not ScrapedPage.objects.filter(id=pages[0].id).exists()
+        assert not ScrapedLink.objects.filter(page_id=pages[0].id).exists()
+
+
+@pytest.mark.django_db
+class TestBenchmarkPipeline:
+
+    def test_records_and_checks_baseline(self, tmp_path):
+        baseline = tmp_path / 'pipeline.json'
+        options = {'profiles': ['small', 'deep'], 'scale': 0.05, 'baseline': str(baseline)}
+
+        call_command('benchmark_pipeline', save=True, stdout=StringIO(), **options)
+
+        results = json.loads(baseline.read_text())['eager']
+        assert results['environment']['scale'] == 0.05
+        assert results['profiles']['small']['pages'] == 10
+        assert results['profiles']['small']['failed'] == 0
+        assert results['profiles']['deep']['queries_per_page'] > 0
+        assert not ScrapedPage.objects.exists()
+
+        results['profiles']['small']['queries_per_page'] -= 1
+        baseline.write_text(json.dumps({'eager': results}))
+        with pytest.raises(CommandError, match='1 regressions'):
+            call_command('benchmark_pipeline', check=True, tolerance=100, stdout=StringIO(), **options)
+
+        results['environment']['database'] = 'other'
+        baseline.write_text(json.dumps({'eager': results}))
+        with pytest.raises(CommandError, match='No eager baseline'):
+            call_command('benchmark_pipeline', check=True, tolerance=100, stdout=StringIO(), **options)
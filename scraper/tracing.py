@@ -0,0 +1,72 @@
+"""
+Optional OpenTelemetry spans for the scrape pipeline, enabled by
+SCRAPER_TRACING and requiring the opentelemetry-api package.
+
+The trace context of the code calling `.delay()` travels in the task's
+message headers, and the task runs in a child span of it, with a span per
+scrape stage inside (see `scraper.metrics.timed`). Exporting the spans is
+left to the OpenTelemetry SDK setup of each process, e.g. running it under
+`opentelemetry-instrument` with the OTEL_* environment variables.
+"""
+from contextlib import nullcontext
+
+from celery import signals
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+_task_spans = {}
+
+
+def get_opentelemetry():
+    try:
+        from opentelemetry import context, propagate, trace
+    except ImportError:
+        raise ImproperlyConfigured("SCRAPER_TRACING requires the opentelemetry-api package")
+    return context, propagate, trace
+
+
+def get_tracer():
+    _, _, trace = get_opentelemetry()
+    return trace.get_tracer('scraper')
+
+
+def span(name: str):
+    if not settings.SCRAPER_TRACING:
+        return nullcontext()
+    return get_tracer().start_as_current_span(name)
+
+
+@signals.before_task_publish.connect
+def inject_trace_context(headers=None, **kwargs):
+    if not settings.SCRAPER_TRACING:
+        return
+    _, propagate, _ = get_opentelemetry()
+    propagate.inject(headers)
+
+
+@signals.task_prerun.connect
+def start_task_span(task_id=None, task=None, **kwargs):
+    if not settings.SCRAPER_TRACING:
+        return
+    context, propagate, trace = get_opentelemetry()
+
+    # Custom headers end up on the request, or in its `headers` with older
+    # message protocols
+    carrier = {**(task.request.headers or {}), **vars(task.request)}
+    parent = propagate.extract(carrier)
+    task_span = get_tracer().start_span(task.name, context=parent, kind=trace.SpanKind.CONSUMER)
+    token = context.attach(trace.set_span_in_context(task_span, parent))
+    _task_spans[task_id] = (task_span, token)
+
+
+@signals.task_postrun.connect
+def end_task_span(task_id=None, state=None, **kwargs):
+    entry = _task_spans.pop(task_id, None)
+    if entry is None:
+        return
+    context, _, _ = get_opentelemetry()
+    task_span, token = entry
+    task_span.set_attribute('celery.state', state or '')
+    task_span.end()
+    context.detach(token)
@@ -1,12 +1,25 @@
 from django.urls import path
-from scraper import views
+from scraper import api, views
 
 
 urlpatterns = [
     path('', views.page_list, name='page_list'),
     path('page/<int:page_id>/', views.page_detail, name='page_detail'),
     path('add/', views.add_page, name='add_page'),
+    path('add/bulk/', views.add_pages, name='add_pages'),
     path('page-detail/<uuid:page_id>/', views.page_detail, name='page_detail'),
     path('get_link_count/<uuid:page_id>/', views.get_link_count, name='get_link_count'),
+    path('crawl/', views.start_crawl, name='start_crawl'),
+    path('crawl/<uuid:crawl_id>/', views.crawl_status, name='crawl_status'),
+    path('events/', views.page_events, name='page_events'),
+    path('refresh_page/<uuid:page_id>/', views.refresh_page, name='refresh_page'),
+    path('schedule_page/<uuid:page_id>/', views.schedule_page, name='schedule_page'),
     path('delete_page/<uuid:page_id>/', views.delete_page, name='delete_page'),
+    path('api/pages/<uuid:page_id>/links/export/', views.export_links, name='export_page_links'),
+    path('api/links/export/', views.export_links, name='export_links'),
+    path('api/v1/pages/', api.pages, name='api_v1_pages'),
+    path('api/v1/pages/<uuid:page_id>/', api.page_detail, name='api_v1_page_detail'),
+    path('api/v1/pages/<uuid:page_id>/links/', api.page_links, name='api_v1_page_links'),
+    path('cache_stats/', views.cache_stats, name='cache_stats'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
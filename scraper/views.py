@@ -1,10 +1,20 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
+from scraper import cache as scraper_cache
+from scraper import events as scraper_events
+from scraper import export as scraper_export
+from scraper import metrics as scraper_metrics
 from scraper import services as scraper_services
-from scraper.forms import URLForm
-from scraper.models import ScrapedPage
+from scraper.forms import BulkURLForm, CrawlForm, ScheduleForm, URLForm
+from scraper.pagination import InvalidCursor
 
 
 @login_required
@@ -12,6 +22,13 @@ def page_list(request):
     """
     View for displaying a list of the user's scraped pages.
     """
+    if settings.SCRAPER_PAGINATION == 'cursor':
+        try:
+            scraped_pages = scraper_services.get_scraped_pages_by_cursor(request.user.id, request.GET.get('cursor'))
+        except InvalidCursor:
+            scraped_pages = scraper_services.get_scraped_pages_by_cursor(request.user.id)
+        return render(request, 'scraper/page_list.html', {'pages': scraped_pages, 'cursor_pagination': True})
+
     page_number = request.GET.get('page', 1)
     scraped_pages = scraper_services.get_scraped_pages_by_user_id(
         request.user.id,
@@ -26,9 +43,29 @@ def page_detail(request, page_id):
     """
     View for displaying the details of a specific scraped page.
     """
-    page_number = request.GET.get('page', 1)
     items_per_page = 5
-    links, page = scraper_services.get_scraped_links_and_page_by_page_id(page_id, page_number, items_per_page)
+    if settings.SCRAPER_PAGINATION == 'cursor':
+        try:
+            links, page = scraper_services.get_scraped_links_and_page_by_cursor(
+                page_id, request.GET.get('cursor'), items_per_page, user_id=request.user.id
+            )
+        except InvalidCursor:
+            links, page = scraper_services.get_scraped_links_and_page_by_cursor(
+                page_id, None, items_per_page, user_id=request.user.id
+            )
+        if not page:
+            return redirect('page_list')
+        return render(request, 'scraper/page_detail.html', {
+            'page': page,
+            'links': links,
+            'page_obj': links,
+            'cursor_pagination': True,
+        })
+
+    page_number = request.GET.get('page', 1)
+    links, page = scraper_services.get_scraped_links_and_page_by_page_id(
+        page_id, page_number, items_per_page, user_id=request.user.id
+    )
     if not page:
         return redirect('page_list')
     return render(request, 'scraper/page_detail.html', {
@@ -48,7 +85,10 @@ def add_page(request):
         form = URLForm(request.POST)
         if form.is_valid():
             url = form.cleaned_data['url']
-            scraper_services.create_scraped_page(url, user_id=request.user.id)
+            try:
+                scraper_services.create_scraped_page(url, user_id=request.user.id)
+            except ValidationError as e:
+                return JsonResponse({'status': 'error', 'message': e.messages[0]}, status=400)
             return JsonResponse({'status': 'success'})
         else:
             return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
@@ -56,29 +96,199 @@ def add_page(request):
         return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
 
 
+@login_required
+def add_pages(request):
+    """
+    Endpoint for adding many pages at once, as a JSON list of URLs, a
+    newline-separated `urls` field or an uploaded text file.
+    """
+    if request.method == 'POST':
+        if request.content_type == 'application/json':
+            try:
+                urls = json.loads(request.body).get('urls', [])
+            except (ValueError, AttributeError):
+                return JsonResponse({'status': 'error', 'message': 'Invalid JSON body'}, status=400)
+            form = BulkURLForm({'urls': '\n'.join(map(str, urls))})
+        else:
+            form = BulkURLForm(request.POST, request.FILES)
+
+        if form.is_valid():
+            try:
+                created = scraper_services.create_scraped_pages(form.cleaned_data['url_list'], user_id=request.user.id)
+            except ValidationError as e:
+                return JsonResponse({'status': 'error', 'message': e.messages[0]}, status=400)
+            return JsonResponse({'status': 'success', 'created': created})
+        else:
+            return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    else:
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
+
+
+@login_required
+def start_crawl(request):
+    """
+    Endpoint for starting a recursive crawl from a seed URL.
+    """
+    if request.method == 'POST':
+        form = CrawlForm(request.POST)
+        if form.is_valid():
+            try:
+                crawl = scraper_services.start_crawl(
+                    form.cleaned_data['url'],
+                    user_id=request.user.id,
+                    max_depth=form.cleaned_data['max_depth'],
+                    max_pages=form.cleaned_data['max_pages'],
+                    scope=form.cleaned_data['scope']
+                )
+            except ValidationError as e:
+                return JsonResponse({'status': 'error', 'message': e.messages[0]}, status=400)
+            return JsonResponse({'status': 'success', 'crawl_id': crawl.id})
+        else:
+            return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    else:
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
+
+
+@login_required
+def crawl_status(request, crawl_id):
+    """
+    Endpoint for following the progress of one of the user's crawls.
+    """
+    crawl = scraper_services.get_crawl_by_id_and_user_id(crawl_id, request.user.id)
+    if crawl is None:
+        return JsonResponse({'status': 'error', 'message': 'Crawl not found'}, status=404)
+    return JsonResponse({
+        'status': crawl.status,
+        'seed_url': crawl.seed_url,
+        'pages_crawled': crawl.pages_crawled,
+        'pages_failed': crawl.pages_failed,
+        'max_pages': crawl.max_pages,
+        'finished_at': crawl.finished_at,
+    })
+
+
+async def page_events(request):
+    """
+    Server-Sent Events stream of the user's scrape progress (see scraper/events.py).
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'Authentication required'}, status=401)
+
+    response = StreamingHttpResponse(
+        scraper_events.iter_user_events(user.id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def export_links(request, page_id=None):
+    """
+    Streams the links of one of the user's pages, or of all their pages, as
+    `?format=csv` (default) or `ndjson`, gzipped with `?compression=gzip`.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'Authentication required'}, status=401)
+
+    export_format = request.GET.get('format', 'csv')
+    compression = request.GET.get('compression')
+    if export_format not in scraper_export.CONTENT_TYPES:
+        return JsonResponse({'status': 'error', 'message': 'Invalid export format'}, status=400)
+    if compression not in (None, 'gzip'):
+        return JsonResponse({'status': 'error', 'message': 'Invalid compression'}, status=400)
+    if page_id is not None and not await scraper_services.ascraped_page_exists(page_id, user.id):
+        return JsonResponse({'status': 'error', 'message': 'Page not found'}, status=404)
+
+    rows = scraper_services.get_export_links(user.id, page_id).aiterator(
+        chunk_size=settings.SCRAPER_EXPORT_CHUNK_SIZE
+    )
+    content = scraper_export.iter_blocks(rows, export_format)
+    if compression == 'gzip':
+        content = scraper_export.gzip_blocks(content)
+        content_type = 'application/gzip'
+    else:
+        content_type = scraper_export.CONTENT_TYPES[export_format]
+
+    filename = scraper_export.get_filename(f'links-{page_id}' if page_id else 'links', export_format, compression)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
 def get_link_count(request, page_id):
     """
-    Endpoint for getting the count of links for a specific scraped page.
+    Endpoint for getting the count of links and the scrape status of a
+    specific scraped page.
     """
-    page = scraper_services.get_scraped_page_by_id(page_id)
-    if not page:
-        count = 0
+    progress = scraper_services.get_scraped_page_progress(page_id, request.user.id)
+    if not progress:
+        return JsonResponse({'count': 0, 'status': None})
+    return JsonResponse({'count': progress['link_count'], 'status': progress['status']})
+
+
+@login_required
+def refresh_page(request, page_id):
+    """
+    Endpoint for re-scraping a specific page. The fetch is conditional, so an
+    unchanged page is neither parsed nor rewritten.
+    """
+    if request.method == 'POST':
+        if not scraper_services.refresh_scraped_page(page_id, request.user.id):
+            return JsonResponse({'status': 'error', 'message': 'Page not found'}, status=404)
+        return JsonResponse({'status': 'success'})
+    else:
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
+
+
+@login_required
+def schedule_page(request, page_id):
+    """
+    Endpoint for monitoring a page with scheduled re-scrapes, or for stopping
+    it with an interval of 0.
+    """
+    if request.method == 'POST':
+        form = ScheduleForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+        if not scraper_services.set_scrape_interval(page_id, request.user.id, form.cleaned_data['interval']):
+            return JsonResponse({'status': 'error', 'message': 'Page not found'}, status=404)
+        return JsonResponse({'status': 'success'})
     else:
-        count = page.links.count()
-    return JsonResponse({'count': count})
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
 
 
+@login_required
 def delete_page(request, page_id):
     """
     Endpoint for deleting a specific scraped page with their links.
     """
     if request.method == 'POST':
-        try:
-            page = scraper_services.get_scraped_page_by_id(page_id)
-            page.delete()
-            return JsonResponse({'status': 'success'})
-        except ScrapedPage.DoesNotExist:
+        if not scraper_services.delete_scraped_page(page_id, request.user.id):
             return JsonResponse({'status': 'error', 'message': 'Page not found'}, status=404)
+        return JsonResponse({'status': 'success'})
     else:
         return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=400)
-    
\ No newline at end of file
+
+
+@staff_member_required
+def cache_stats(request):
+    """
+    Endpoint for monitoring the shared fetch cache hit/miss counters.
+    """
+    return JsonResponse(scraper_cache.get_cache_stats())
+
+
+def metrics(request):
+    """
+    Endpoint for Prometheus to scrape the metrics of the web processes.
+    """
+    if not settings.SCRAPER_METRICS:
+        return JsonResponse({'status': 'error', 'message': 'Metrics are disabled'}, status=404)
+    token = settings.SCRAPER_METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return JsonResponse({'status': 'error', 'message': 'Invalid metrics token'}, status=401)
+    return HttpResponse(generate_latest(scraper_metrics.get_registry()), content_type=CONTENT_TYPE_LATEST)